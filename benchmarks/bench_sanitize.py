@@ -0,0 +1,124 @@
+"""
+Micro-benchmarks for sanitising the filtered email fields.
+
+Compares the original clean_json_data + truncation pipeline against
+sanitize_email_fields over realistic email bodies and checks both produce
+the same output.
+
+Usage:
+    python benchmarks/bench_sanitize.py [--repeat 5] [--number 0]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import unicodedata
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sanitizer import clean_json_data, sanitize_email_fields, MAX_MESSAGE_LENGTH, TRUNCATION_MARKER
+
+
+def legacy_sanitize(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The sanitisation steps as originally done in the webhook handler"""
+    data = clean_json_data(data)
+    if len(data.get("messageText", "")) > MAX_MESSAGE_LENGTH:
+        data["messageText"] = data["messageText"][:MAX_MESSAGE_LENGTH] + TRUNCATION_MARKER
+    return data
+
+
+def make_email(message_text: str, subject: str = "Re: Quarterly planning") -> Dict[str, Any]:
+    return {
+        "to": "agent@example.com",
+        "sender": "Jane Doe <jane.doe@example.com>",
+        "subject": subject,
+        "messageText": message_text,
+        "messageTimestamp": "2025-03-14T09:26:53Z",
+        "threadId": "18e3c0f2a9b4d7e1",
+        "messageId": "18e3c0f2a9b4d7e2"
+    }
+
+
+def build_corpus(seed: int = 42) -> List[Tuple[str, Dict[str, Any]]]:
+    """Realistic email bodies: plain ASCII, CJK, emoji-heavy, decomposed accents and a 1 MB HTML mail"""
+    rng = random.Random(seed)
+
+    words = "the meeting agenda project update please review attached notes thanks regards".split()
+    ascii_text = "\r\n".join(
+        " ".join(rng.choice(words) for _ in range(12)) for _ in range(40)
+    )
+
+    cjk_chars = [chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(3000)]
+    cjk_text = "\n".join("".join(cjk_chars[i:i + 30]) + "。" for i in range(0, 3000, 30))
+
+    emoji = ["\U0001F600", "\U0001F44D\U0001F3FD", "\U0001F389", "❤️", "\U0001F468‍\U0001F4BB"]
+    emoji_text = " ".join(rng.choice(words) + rng.choice(emoji) for _ in range(2000))
+
+    decomposed_text = unicodedata.normalize("NFD", "Café résumé naïve façade Ångström coöperate. " * 200)
+
+    row = "<tr><td class=\"cell\">{}</td><td>&nbsp;</td></tr>\n"
+    html_rows = []
+    size = 0
+    while size < 1024 * 1024:
+        chunk = row.format(" ".join(rng.choice(words) for _ in range(8)))
+        html_rows.append(chunk)
+        size += len(chunk)
+    html_text = "<html><body><table>\n" + "".join(html_rows) + "</table></body></html>"
+
+    return [
+        ("ascii", make_email(ascii_text)),
+        ("cjk", make_email(cjk_text, subject="回复：季度计划")),
+        ("emoji", make_email(emoji_text, subject="Launch \U0001F680\U0001F389")),
+        ("nfd-accents", make_email(decomposed_text, subject=unicodedata.normalize("NFD", "Réunion"))),
+        ("html-1mb", make_email(html_text)),
+    ]
+
+
+def time_call(func: Callable, data: Dict[str, Any], repeat: int, number: int) -> float:
+    """Best-of-repeat mean time per call in microseconds"""
+    if number <= 0:
+        # Pick a loop count that runs for roughly 0.2s
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func(data)
+            if time.perf_counter() - start >= 0.2:
+                break
+            number *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(data)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark email field sanitisation")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats per case (best is reported)")
+    parser.add_argument("--number", type=int, default=0, help="Calls per repeat (0 = calibrate automatically)")
+    args = parser.parse_args()
+
+    print(f"{'case':<14}{'text chars':>12}{'legacy us':>14}{'fast us':>12}{'speedup':>10}  match")
+    mismatches = 0
+    for name, email in build_corpus():
+        matches = legacy_sanitize(dict(email)) == sanitize_email_fields(email)
+        mismatches += not matches
+        legacy = time_call(lambda d: legacy_sanitize(dict(d)), email, args.repeat, args.number)
+        fast = time_call(sanitize_email_fields, email, args.repeat, args.number)
+        print(
+            f"{name:<14}{len(email['messageText']):>12}{legacy:>14.1f}{fast:>12.1f}"
+            f"{legacy / fast:>9.1f}x  {'yes' if matches else 'NO'}"
+        )
+
+    if mismatches:
+        print(f"{mismatches} case(s) produced different output")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+A local stand-in for the Langflow webhook endpoint, used by the load test.
+
+Responds to POST /api/v1/webhook/{flow} after a configurable latency with
+jitter, failing a configurable fraction of requests with HTTP 500.
+
+Usage:
+    python benchmarks/langflow_stub.py --port 7861 --latency-ms 50 --jitter-ms 20 --error-rate 0.01
+"""
+import random
+import asyncio
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0) -> FastAPI:
+    """
+    Create the stub Langflow app.
+
+    Args:
+        latency_ms: Base response latency in milliseconds
+        jitter_ms: Uniform random latency added on top, in milliseconds
+        error_rate: Fraction of requests answered with HTTP 500
+
+    Returns:
+        The FastAPI app
+    """
+    app = FastAPI(title="Langflow stub")
+    stats = {"received": 0, "errors": 0, "bytes": 0}
+
+    @app.post("/api/v1/webhook/{flow}")
+    async def webhook(flow: str, request: Request):
+        body = await request.body()
+        stats["received"] += 1
+        stats["bytes"] += len(body)
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"detail": "stub error"})
+        return {"message": "Task started in the background", "status": "in progress"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Langflow webhook endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Load test for the webhook handler against a local Langflow stand-in.
+
+Starts benchmarks/langflow_stub.py and webhook_handler:app as subprocesses,
+replays a corpus of synthetic Gmail webhook payloads (well-formed, malformed
+JSON that needs repair_json, huge bodies and unicode-heavy text) at each
+concurrency level, and reports latency percentiles, requests/sec and the
+handler's memory use.
+
+Usage:
+    python benchmarks/loadtest.py --concurrency 1,8,32,128 --requests 500 --latency-ms 50
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB = os.path.join(ROOT, "benchmarks", "langflow_stub.py")
+
+# Relative frequency of each payload kind in the replayed corpus
+DEFAULT_MIX = "normal=70,malformed=10,unicode=15,huge=5"
+
+
+def gmail_payload(message_id: str, thread_id: str, message_text: str, attachment_bytes: int = 0) -> Dict:
+    """Build a Composio-style Gmail trigger payload"""
+    parts = [
+        {
+            "partId": "0",
+            "mimeType": "text/plain",
+            "headers": [{"name": "Content-Type", "value": "text/plain; charset=UTF-8"}],
+            "body": {"size": len(message_text), "data": base64.urlsafe_b64encode(message_text.encode()).decode()}
+        }
+    ]
+    if attachment_bytes:
+        parts.append({
+            "partId": "1",
+            "mimeType": "application/pdf",
+            "filename": "report.pdf",
+            "headers": [{"name": "Content-Disposition", "value": "attachment; filename=\"report.pdf\""}],
+            "body": {"size": attachment_bytes, "data": base64.urlsafe_b64encode(os.urandom(attachment_bytes)).decode()}
+        })
+    return {
+        "type": "gmail_new_gmail_message",
+        "data": {
+            "messageId": message_id,
+            "threadId": thread_id,
+            "messageTimestamp": "2025-03-14T09:26:53Z",
+            "labelIds": ["INBOX", "UNREAD"],
+            "sender": "Jane Doe <jane.doe@example.com>",
+            "to": "agent@example.com",
+            "subject": "Re: Quarterly planning",
+            "messageText": message_text,
+            "payload": {
+                "mimeType": "multipart/mixed",
+                "headers": [{"name": f"X-Header-{i}", "value": "v" * 40} for i in range(30)],
+                "parts": parts
+            }
+        }
+    }
+
+
+def build_corpus(size: int, mix: Dict[str, int], seed: int = 7) -> List[Tuple[str, bytes]]:
+    """
+    Generate the replay corpus as (kind, body) pairs.
+
+    Args:
+        size: Number of distinct bodies to generate
+        mix: Relative weights of 'normal', 'malformed', 'unicode' and 'huge' payloads
+        seed: Random seed
+
+    Returns:
+        List of (kind, raw body) tuples
+    """
+    rng = random.Random(seed)
+    words = "the meeting agenda project update please review attached notes thanks regards".split()
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=size)
+    corpus = []
+    for i, kind in enumerate(kinds):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(50, 400)))
+        message_id = f"msg-{i:06d}"
+        thread_id = f"thread-{i:06d}"
+        if kind == "unicode":
+            cjk = "".join(chr(rng.randint(0x4E00, 0x9FFF)) for _ in range(500))
+            emoji = "".join(rng.choice(["\U0001F600", "\U0001F44D\U0001F3FD", "\U0001F389", "❤️"]) for _ in range(200))
+            text = f"{cjk} {emoji} Café résumé naïve {text}"
+            body = json.dumps(gmail_payload(message_id, thread_id, text), ensure_ascii=False).encode()
+        elif kind == "huge":
+            payload = gmail_payload(message_id, thread_id, text * 20, attachment_bytes=2 * 1024 * 1024)
+            body = json.dumps(payload).encode()
+        elif kind == "malformed":
+            # A trailing comma and a junk prefix defeat the fast path and json.loads; repair_json fixes them
+            body = json.dumps(gmail_payload(message_id, thread_id, text)).encode()
+            body = b"payload=" + body[:-2] + b",}}"
+        else:
+            body = json.dumps(gmail_payload(message_id, thread_id, text)).encode()
+        corpus.append((kind, body))
+    return corpus
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def process_memory_kb(pid: int) -> Dict[str, int]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process, Linux only"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    memory[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return memory
+
+
+def wait_until_up(url: str, timeout: float = 15) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def run_level(url: str, corpus: List[Tuple[str, bytes]], concurrency: int, total: int) -> Dict:
+    """Send total requests with the given number of concurrent clients and collect timings"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    by_kind: Dict[str, List[float]] = {}
+    next_index = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal next_index
+            while next_index < total:
+                kind, body = corpus[next_index % len(corpus)]
+                next_index += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, content=body, headers={"Content-Type": "application/json"})
+                    status = response.json().get("status", response.status_code) if response.status_code == 200 else response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                by_kind.setdefault(kind, []).append(elapsed)
+                statuses[status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "duration_s": duration,
+        "rps": len(latencies) / duration if duration else float("nan"),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "statuses": dict(statuses),
+        "p95_ms_by_kind": {k: percentile(sorted(v), 95) * 1000 for k, v in sorted(by_kind.items())},
+    }
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for item in text.split(","):
+        kind, weight = item.split("=")
+        mix[kind.strip()] = int(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the webhook handler against a Langflow stub")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--corpus-size", type=int, default=200, help="Distinct payloads to generate")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Payload mix, e.g. normal=70,malformed=10,unicode=15,huge=5")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Stub Langflow base latency")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Stub Langflow latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub responses that are HTTP 500")
+    parser.add_argument("--handler-port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=7861)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the handler, e.g. --env INGEST_MODE=queue")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    corpus = build_corpus(args.corpus_size, parse_mix(args.mix))
+    print(f"Corpus: {len(corpus)} payloads, {sum(len(b) for _, b in corpus) / 1e6:.1f} MB, "
+          f"mix {dict(Counter(kind for kind, _ in corpus))}")
+
+    workdir = tempfile.mkdtemp(prefix="webhook-loadtest-")
+    handler_env = dict(
+        os.environ,
+        LANGFLOW_API_URL=f"http://127.0.0.1:{args.stub_port}",
+        WEBHOOK_LOG_FILE=os.path.join(workdir, "webhook.log"),
+        WEBHOOK_LOG_LEVEL="WARNING",
+        INGEST_QUEUE_PATH=os.path.join(workdir, "ingest_queue.db"),
+        # The corpus is replayed, so deduplication would drop most requests
+        DEDUP_ENABLED="false",
+    )
+    for item in args.env:
+        key, value = item.split("=", 1)
+        handler_env[key] = value
+
+    stub = subprocess.Popen(
+        [sys.executable, STUB, "--port", str(args.stub_port), "--latency-ms", str(args.latency_ms),
+         "--jitter-ms", str(args.jitter_ms), "--error-rate", str(args.error_rate)],
+        cwd=ROOT
+    )
+    handler = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "webhook_handler:app", "--host", "127.0.0.1",
+         "--port", str(args.handler_port), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=handler_env
+    )
+    results = []
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.stub_port}/health")
+        wait_until_up(f"http://127.0.0.1:{args.handler_port}/health")
+        url = f"http://127.0.0.1:{args.handler_port}/webhook"
+
+        print(f"{'conc':>6}{'reqs':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rss MB':>9}{'peak MB':>9}  statuses")
+        for level in levels:
+            result = asyncio.run(run_level(url, corpus, level, args.requests))
+            memory = process_memory_kb(handler.pid)
+            result["rss_mb"] = memory.get("VmRSS", 0) / 1024
+            result["peak_rss_mb"] = memory.get("VmHWM", 0) / 1024
+            results.append(result)
+            print(f"{level:>6}{result['requests']:>7}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}"
+                  f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['rss_mb']:>9.1f}"
+                  f"{result['peak_rss_mb']:>9.1f}  {result['statuses']}")
+
+        stub_stats = httpx.get(f"http://127.0.0.1:{args.stub_port}/stats").json()
+        print(f"Langflow stub received {stub_stats['received']} forwards ({stub_stats['errors']} errors)")
+        print("p95 by payload kind (ms), last level:",
+              {k: round(v, 1) for k, v in results[-1]["p95_ms_by_kind"].items()} if results else {})
+    finally:
+        for process in (handler, stub):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+A local stand-in for the OpenAI chat completions API, used by offline evaluations.
+
+Answers POST /v1/chat/completions deterministically after a configurable
+latency with jitter. Plain requests get a canned answer derived from the last
+user message. Structured-output requests (response_format json_schema, as sent
+by chat.completions.create and beta.chat.completions.parse) get an instance of
+the requested schema, with grades decided by a hash of the prompt. A
+configurable fraction of requests is answered with HTTP 429 and Retry-After.
+
+Usage:
+    python benchmarks/openai_stub.py --port 7862 --latency-ms 200 --jitter-ms 100 --rate-limit-rate 0.01
+"""
+import re
+import time
+import json
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _digest(text: str) -> int:
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def schema_instance(schema: Dict[str, Any], seed: str, definitions: Dict[str, Any] = None) -> Any:
+    """
+    Build a deterministic instance of a JSON schema.
+
+    Booleans are derived from seed so grades vary between prompts but not between runs.
+    """
+    definitions = definitions if definitions is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return schema_instance(definitions[schema["$ref"].split("/")[-1]], seed, definitions)
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: schema_instance(prop, f"{seed}/{name}", definitions)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [schema_instance(schema.get("items", {}), f"{seed}/0", definitions)]
+    if kind == "boolean":
+        return _digest(seed) % 4 != 0
+    if kind in ("integer", "number"):
+        return 0
+    if "enum" in schema:
+        return schema["enum"][0]
+    return "stub"
+
+
+def create_app(latency_ms: float = 0, jitter_ms: float = 0, rate_limit_rate: float = 0) -> FastAPI:
+    """
+    Create the stub OpenAI app.
+
+    Args:
+        latency_ms: Base response latency in milliseconds
+        jitter_ms: Uniform random latency added on top, in milliseconds
+        rate_limit_rate: Fraction of requests answered with HTTP 429
+
+    Returns:
+        The FastAPI app
+    """
+    app = FastAPI(title="OpenAI stub")
+    stats = {"received": 0, "rate_limited": 0, "structured": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        start = time.perf_counter()
+        body = await request.json()
+        stats["received"] += 1
+        delay = latency_ms + random.uniform(0, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if random.random() < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "stub rate limit", "type": "requests", "code": "rate_limit_exceeded"}},
+                headers={"retry-after": "0.1"}
+            )
+
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content") or "") for m in messages)
+        question = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            stats["structured"] += 1
+            json_schema = response_format["json_schema"]
+            instance = schema_instance(json_schema["schema"], prompt)
+            if json_schema.get("name") == "BatchGrade":
+                # One grade per numbered pair, as the batch judge expects
+                pairs = re.findall(r"Pair (\d+):", prompt)
+                instance = {"grades": [
+                    {"index": int(i), "score": _digest(f"{prompt}/{i}") % 4 != 0} for i in pairs
+                ]}
+            content = json.dumps(instance)
+        else:
+            content = f"Stub answer to: {question}"
+
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        service_ms = (time.perf_counter() - start) * 1000
+        return JSONResponse(
+            content={
+                "id": f"chatcmpl-stub-{stats['received']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content, "refusal": None}
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            },
+            headers={
+                "x-ratelimit-remaining-requests": "10000",
+                "x-ratelimit-remaining-tokens": "10000000",
+                # Time the stub spent on the request, so clients can subtract it from call latency
+                "x-stub-service-ms": f"{service_ms:.3f}",
+            }
+        )
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7862)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.rate_limit_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
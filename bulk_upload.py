@@ -0,0 +1,182 @@
+import json
+import time
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# Chunk bounds for bulk example uploads
+UPLOAD_CHUNK_SIZE = 500
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+UPLOAD_WORKERS = 4
+UPLOAD_MAX_RETRIES = 3
+UPLOAD_RETRY_BASE_DELAY = 1.0
+# Seconds between progress reports
+PROGRESS_INTERVAL = 2.0
+
+
+def chunked(
+        items: Iterable[Any],
+        max_items: int = UPLOAD_CHUNK_SIZE,
+        max_bytes: int = UPLOAD_CHUNK_BYTES
+    ) -> Iterator[List[Any]]:
+    """
+    Split items into chunks bounded by count and by estimated JSON size, consuming them lazily.
+
+    Args:
+        items: Any iterable of JSON-serializable items, e.g. a generator
+        max_items: Maximum items per chunk
+        max_bytes: Maximum estimated JSON bytes per chunk; a larger item gets a chunk of its own
+
+    Returns:
+        Iterator of chunks
+    """
+    chunk: List[Any] = []
+    size = 0
+    for item in items:
+        item_size = len(json.dumps(item, ensure_ascii=False, default=str).encode("utf-8"))
+        if chunk and (len(chunk) >= max_items or size + item_size > max_bytes):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(item)
+        size += item_size
+    if chunk:
+        yield chunk
+
+
+class UploadError(RuntimeError):
+    """
+    Raised when chunks still fail after their retries; the other chunks were uploaded.
+    """
+
+    def __init__(self, failed: List[List[Any]], uploaded: int, last_error: Exception):
+        self.failed = failed
+        self.uploaded = uploaded
+        super().__init__(
+            f"{len(failed)} chunks ({sum(len(c) for c in failed)} items) failed to upload "
+            f"after retries; {uploaded} items uploaded. Last error: {last_error}"
+        )
+
+
+class ChunkedUploader:
+    """
+    Uploads an iterable in chunks from a bounded thread pool.
+
+    Chunks are read from the iterable only as workers free up: at most two
+    chunks per worker (one being sent, one queued) are in flight, so memory
+    stays bounded regardless of the iterable's length. A failed chunk is
+    retried on its own with jittered exponential backoff, and progress and
+    throughput are reported as chunks complete.
+    """
+
+    def __init__(
+            self,
+            send: Callable[[List[Any]], Any],
+            workers: int = UPLOAD_WORKERS,
+            max_retries: int = UPLOAD_MAX_RETRIES,
+            retry_base_delay: float = UPLOAD_RETRY_BASE_DELAY,
+            progress: Optional[Callable[[int, float], None]] = None,
+            label: str = "items",
+            already_sent: Optional[Callable[[Exception], bool]] = None
+        ):
+        """
+        Initialize the ChunkedUploader.
+
+        Args:
+            send: Uploads one chunk, e.g. a create_examples call
+            workers: Chunks uploaded concurrently
+            max_retries: Retries of a failed chunk
+            retry_base_delay: Backoff ceiling in seconds for a chunk's first retry
+            progress: Called with (items uploaded, items per second); prints a line if None
+            label: Name of the items in progress lines
+            already_sent: Tells whether an error raised by a retry means an earlier attempt
+                of the chunk reached the server, e.g. a conflict on client-assigned IDs;
+                the chunk then counts as uploaded
+        """
+        self.send = send
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.progress = progress or self._print_progress
+        self.label = label
+        self.already_sent = already_sent
+        self._lock = threading.Lock()
+        self._uploaded = 0
+        self._start = 0.0
+        self._last_report = 0.0
+
+
+    def _print_progress(self, uploaded: int, rate: float) -> None:
+        print(f"Uploaded {uploaded} {self.label} ({rate:.0f}/s)")
+
+
+    def _send_with_retries(self, chunk: List[Any]) -> int:
+        attempt = 0
+        while True:
+            try:
+                self.send(chunk)
+                break
+            except Exception as e:
+                if self.already_sent is not None and self.already_sent(e):
+                    if attempt:
+                        # An earlier attempt was applied before it failed on the client
+                        break
+                    # The first attempt conflicted, so the IDs clash with existing items
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                time.sleep(random.uniform(0, self.retry_base_delay * 2 ** (attempt - 1)))
+
+        with self._lock:
+            self._uploaded += len(chunk)
+            now = time.perf_counter()
+            if now - self._last_report >= PROGRESS_INTERVAL:
+                self._last_report = now
+                self.progress(self._uploaded, self._uploaded / max(now - self._start, 1e-9))
+        return len(chunk)
+
+
+    def upload(self, chunks: Iterable[List[Any]]) -> int:
+        """
+        Upload every chunk.
+
+        Args:
+            chunks: Chunks to upload, e.g. from chunked()
+
+        Returns:
+            Number of items uploaded
+
+        Raises:
+            UploadError: If some chunks failed after their retries
+        """
+        self._uploaded = 0
+        self._start = self._last_report = time.perf_counter()
+        failed: List[List[Any]] = []
+        last_error: Optional[Exception] = None
+        in_flight = {}
+
+        def collect(done: Iterable[Future]) -> None:
+            nonlocal last_error
+            for future in done:
+                chunk = in_flight.pop(future)
+                error = future.exception()
+                if error is not None:
+                    failed.append(chunk)
+                    last_error = error
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for chunk in chunks:
+                # Keep one chunk queued per busy worker; at most two per worker in memory
+                if len(in_flight) >= 2 * self.workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(self._send_with_retries, chunk)] = chunk
+            collect(wait(in_flight).done)
+
+        elapsed = time.perf_counter() - self._start
+        if self._uploaded:
+            self.progress(self._uploaded, self._uploaded / max(elapsed, 1e-9))
+        if failed:
+            raise UploadError(failed, self._uploaded, last_error)
+        return self._uploaded
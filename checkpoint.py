@@ -0,0 +1,312 @@
+import os
+import json
+import asyncio
+import inspect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langsmith import Client
+from langsmith.schemas import Example, Run, TracerSession
+
+# Directory holding one JSONL journal per evaluation run
+EVAL_RUNS_DIR = os.getenv("EVAL_RUNS_DIR", ".eval_runs")
+# Runs whose feedback is listed per request when reconciling a resumed run
+FEEDBACK_PAGE_SIZE = 100
+
+
+class RunJournal:
+    """
+    An append-only JSONL journal of the examples an evaluation run has finished.
+
+    The first record names the run's LangSmith experiment; every later record is
+    one graded example, written as soon as its evaluator returns. Re-opening the
+    journal of an interrupted run lets the run continue in the same experiment.
+
+    LangSmith logs feedback after the evaluator returns and uploads runs in the
+    background, so after a crash the journal and the experiment can disagree.
+    A resumed run therefore trusts the experiment: examples whose run has
+    feedback are done, runs without feedback are graded without running the
+    target again, and only examples with no run are evaluated again.
+    """
+
+    def __init__(self, run_id: str, directory: str = EVAL_RUNS_DIR):
+        """
+        Initialize the RunJournal.
+
+        Args:
+            run_id: Identifier of the run; reusing it resumes the run
+            directory: Directory holding the journals
+        """
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self.header: Optional[Dict[str, Any]] = None
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        # Model usage per model of each process that worked on the run
+        self.usage: List[Dict[str, Dict[str, int]]] = []
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted write; that example is redone
+                    continue
+                if record.get("type") == "run":
+                    self.header = record
+                elif record.get("type") == "example":
+                    self.completed[record["example_id"]] = record
+                elif record.get("type") == "usage":
+                    self.usage.append(record["usage"])
+            # Start appending on a fresh line after a torn write
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+
+
+    @property
+    def resumed(self) -> bool:
+        return self.header is not None
+
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+
+    def start(self, experiment_name: str, dataset_name: str) -> None:
+        """
+        Record the run's experiment, unless the journal already has it.
+
+        Args:
+            experiment_name: Name of the LangSmith experiment
+            dataset_name: Name of the evaluated dataset
+        """
+        if self.header is None:
+            self.header = {"type": "run", "run_id": self.run_id, "experiment": experiment_name, "dataset": dataset_name}
+            self._append(self.header)
+
+
+    def record(self, example_id: Any, outputs: Optional[dict], result: Any, run: Optional[Run] = None) -> None:
+        """
+        Record a finished example.
+
+        Args:
+            example_id: ID of the dataset example
+            outputs: Target outputs for the example
+            result: Evaluator result for the example
+            run: The example's target run, whose latency and error are recorded
+        """
+        record = {"type": "example", "example_id": str(example_id), "outputs": outputs, "result": result}
+        if run is not None:
+            record["error"] = run.error
+            if run.start_time and run.end_time:
+                record["latency_s"] = (run.end_time - run.start_time).total_seconds()
+        self._append(record)
+        self.completed[record["example_id"]] = record
+
+
+    def record_usage(self, usage: Dict[str, Dict[str, int]]) -> None:
+        """
+        Record the model usage of this process, so a resumed run's totals include it.
+
+        Args:
+            usage: Totals per model, as in UsageMeter.usage
+        """
+        if usage:
+            self._append({"type": "usage", "usage": usage})
+            self.usage.append(usage)
+
+
+    def remaining(self, examples: Iterable[Example]) -> List[Example]:
+        """
+        Filter out the examples this run has already finished.
+
+        Args:
+            examples: Examples of the dataset
+
+        Returns:
+            Examples without a journal record
+        """
+        return [example for example in examples if str(example.id) not in self.completed]
+
+
+    def reconcile(
+            self,
+            client: Client,
+            experiment: TracerSession,
+            examples: Iterable[Example],
+            feedback_key: str = "accuracy"
+        ) -> Tuple[List[Example], List[Tuple[Run, Example]]]:
+        """
+        Compare the examples with the runs and feedback the experiment holds, and correct the journal.
+
+        Examples whose run has feedback are journaled if they weren't yet.
+        Journaled examples missing from the experiment are dropped from the journal.
+
+        Args:
+            client: LangSmith client
+            experiment: The run's experiment
+            examples: Examples of the dataset
+            feedback_key: Key of the feedback that marks an example as graded
+
+        Returns:
+            (examples with no run, (run, example) pairs whose run has no feedback)
+        """
+        runs: Dict[str, List[Run]] = {}
+        for run in client.list_runs(project_id=experiment.id, is_root=True):
+            if run.reference_example_id is not None:
+                runs.setdefault(str(run.reference_example_id), []).append(run)
+
+        run_ids = [run.id for example_runs in runs.values() for run in example_runs]
+        feedback = {}
+        for start in range(0, len(run_ids), FEEDBACK_PAGE_SIZE):
+            page = run_ids[start:start + FEEDBACK_PAGE_SIZE]
+            for item in client.list_feedback(run_ids=page, feedback_key=[feedback_key]):
+                feedback[str(item.run_id)] = item
+
+        remaining, ungraded = [], []
+        for example in examples:
+            example_id = str(example.id)
+            example_runs = runs.get(example_id, [])
+            graded = next((run for run in example_runs if str(run.id) in feedback), None)
+            if graded is not None:
+                if example_id not in self.completed:
+                    item = feedback[str(graded.id)]
+                    self.record(example_id, graded.outputs, {"key": item.key, "score": item.score}, graded)
+                continue
+            self.completed.pop(example_id, None)
+            if example_runs:
+                ungraded.append((example_runs[0], example))
+            else:
+                remaining.append(example)
+        return remaining, ungraded
+
+
+    def prepare(
+            self,
+            client: Client,
+            dataset_name: str,
+            experiment_prefix: str
+        ) -> Tuple[TracerSession, List[Example], List[Tuple[Run, Example]]]:
+        """
+        Create the run's experiment, or look it up and reconcile it when resuming.
+
+        Args:
+            client: LangSmith client
+            dataset_name: Name of the dataset to evaluate
+            experiment_prefix: Prefix of a new experiment's name; the run ID is appended
+
+        Returns:
+            (experiment, examples left to evaluate, (run, example) pairs left to grade)
+        """
+        if self.resumed:
+            experiment = client.read_project(project_name=self.header["experiment"])
+            examples = client.list_examples(dataset_name=self.header["dataset"])
+            remaining, ungraded = self.reconcile(client, experiment, examples)
+            return experiment, remaining, ungraded
+
+        dataset = client.read_dataset(dataset_name=dataset_name)
+        experiment = client.create_project(
+            f"{experiment_prefix}-{self.run_id}",
+            reference_dataset_id=dataset.id,
+            metadata={"run_id": self.run_id}
+        )
+        self.start(experiment.name, dataset_name)
+        return experiment, self.remaining(client.list_examples(dataset_name=dataset_name)), []
+
+
+    def checkpointed(self, evaluator: Callable) -> Callable:
+        """
+        Wrap an evaluator so each example it grades is recorded in the journal.
+
+        Args:
+            evaluator: Sync or async evaluator taking any of inputs, outputs, reference_outputs, run and example
+
+        Returns:
+            Evaluator with the same name taking (run, example)
+        """
+        parameters = inspect.signature(evaluator).parameters
+
+        def arguments(run, example) -> Dict[str, Any]:
+            available = {
+                "run": run,
+                "example": example,
+                "inputs": example.inputs,
+                "outputs": run.outputs or {},
+                "reference_outputs": example.outputs or {},
+            }
+            return {name: available[name] for name in parameters if name in available}
+
+        if inspect.iscoroutinefunction(evaluator):
+            async def checkpointed_evaluator(run, example):
+                result = await evaluator(**arguments(run, example))
+                self.record(example.id, run.outputs, result, run)
+                return result
+        else:
+            def checkpointed_evaluator(run, example):
+                result = evaluator(**arguments(run, example))
+                self.record(example.id, run.outputs, result, run)
+                return result
+
+        # LangSmith names the feedback after the evaluator
+        checkpointed_evaluator.__name__ = evaluator.__name__
+        return checkpointed_evaluator
+
+
+    def _log_feedback(self, client: Client, run: Run, name: str, result: Any) -> None:
+        if isinstance(result, dict) and "results" in result:
+            items = result["results"]
+        elif isinstance(result, dict):
+            items = [dict(result, key=result.get("key", name))]
+        else:
+            items = [{"key": name, "score": result}]
+        for item in items:
+            client.create_feedback(
+                run.id,
+                key=item["key"],
+                score=item.get("score"),
+                value=item.get("value"),
+                comment=item.get("comment"),
+                trace_id=run.trace_id
+            )
+
+
+    def grade_ungraded(self, client: Client, evaluator: Callable, ungraded: List[Tuple[Run, Example]]) -> None:
+        """
+        Grade runs that reached the experiment without feedback, and log their feedback.
+
+        Args:
+            client: LangSmith client
+            evaluator: Sync evaluator, as passed to checkpointed()
+            ungraded: (run, example) pairs from prepare()
+        """
+        graded = self.checkpointed(evaluator)
+        for run, example in ungraded:
+            self._log_feedback(client, run, evaluator.__name__, graded(run, example))
+
+
+    async def agrade_ungraded(self, client: Client, evaluator: Callable, ungraded: List[Tuple[Run, Example]]) -> None:
+        """
+        Async version of grade_ungraded() for async evaluators.
+        """
+        graded = self.checkpointed(evaluator)
+        results = await asyncio.gather(*(graded(run, example) for run, example in ungraded))
+        for (run, _), result in zip(ungraded, results):
+            self._log_feedback(client, run, evaluator.__name__, result)
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,156 @@
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sanitizer import MAX_MESSAGE_LENGTH, TRUNCATION_MARKER
+
+logger = logging.getLogger("webhook_handler")
+
+# Thread coalescing settings; a window of 0 disables coalescing
+COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "0"))
+COALESCE_MAX_MESSAGES = int(os.getenv("COALESCE_MAX_MESSAGES", "20"))
+
+DeliverCallback = Callable[[Dict[str, Any], List[Dict[str, Any]]], Awaitable[None]]
+
+
+def merge_thread_messages(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge messages from one thread into a single payload for the agent.
+
+    The latest message provides the top-level fields. messageText holds every
+    message, newest first, so truncation drops the oldest text. messageIds
+    lists every merged message in arrival order.
+
+    Args:
+        messages: Sanitised email payloads in arrival order
+
+    Returns:
+        The merged payload, or the only message unchanged
+    """
+    if len(messages) == 1:
+        return messages[0]
+
+    merged = dict(messages[-1])
+    # Messages are already sanitised, so the separators avoid control characters too
+    message_text = " ".join(
+        f"[Message {m.get('messageId')} from {m.get('sender')} at {m.get('messageTimestamp')}] "
+        f"{m.get('messageText') or ''}"
+        for m in reversed(messages)
+    )
+    if len(message_text) > MAX_MESSAGE_LENGTH:
+        message_text = message_text[:MAX_MESSAGE_LENGTH] + TRUNCATION_MARKER
+    merged["messageText"] = message_text
+    merged["messageIds"] = [m.get("messageId") for m in messages]
+    merged["messageCount"] = len(messages)
+    return merged
+
+
+class ThreadCoalescer:
+    """
+    Buffers messages per threadId for a short window and delivers them as one merged payload.
+    """
+
+    def __init__(
+            self,
+            deliver: DeliverCallback,
+            window: float = COALESCE_WINDOW_SECONDS,
+            max_messages: int = COALESCE_MAX_MESSAGES
+        ):
+        """
+        Initialize the ThreadCoalescer.
+
+        Args:
+            deliver: Coroutine called with (merged payload, original messages) when a thread is flushed
+            window: Seconds to wait after a thread's first message before flushing it
+            max_messages: Flush a thread immediately once it has this many messages
+        """
+        self.deliver = deliver
+        self.window = window
+        self.max_messages = max_messages
+        self.coalesced = 0
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._deliveries = set()
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of messages currently buffered.
+        """
+        return sum(len(messages) for messages in self._buffers.values())
+
+
+    def add(self, data: Dict[str, Any]) -> bool:
+        """
+        Buffer a message with the rest of its thread.
+
+        Args:
+            data: Sanitised email payload
+
+        Returns:
+            True if the message was buffered, False if it has no threadId and should be forwarded directly
+        """
+        thread_id = data.get("threadId")
+        if not self.enabled or not thread_id:
+            return False
+
+        messages = self._buffers.setdefault(thread_id, [])
+        messages.append(data)
+        if len(messages) > 1:
+            self.coalesced += 1
+
+        if len(messages) >= self.max_messages:
+            self._start_flush(thread_id)
+        elif thread_id not in self._timers:
+            self._timers[thread_id] = asyncio.create_task(self._flush_after(thread_id))
+        return True
+
+
+    async def flush_all(self) -> None:
+        """
+        Deliver every buffered thread now and wait for in-progress deliveries, e.g. at shutdown.
+        """
+        for thread_id in list(self._buffers):
+            self._start_flush(thread_id)
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+
+
+    async def _flush_after(self, thread_id: str) -> None:
+        await asyncio.sleep(self.window)
+        self._timers.pop(thread_id, None)
+        self._spawn_flush(thread_id)
+
+
+    def _start_flush(self, thread_id: str) -> None:
+        timer = self._timers.pop(thread_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._spawn_flush(thread_id)
+
+
+    def _spawn_flush(self, thread_id: str) -> None:
+        # Deliveries are tracked so flush_all() can wait for them at shutdown
+        task = asyncio.create_task(self._flush(thread_id))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+
+    async def _flush(self, thread_id: str) -> None:
+        messages = self._buffers.pop(thread_id, None)
+        if not messages:
+            return
+        merged = merge_thread_messages(messages)
+        if len(messages) > 1:
+            logger.info("Coalesced %d messages from thread %s", len(messages), thread_id)
+        try:
+            await self.deliver(merged, messages)
+        except Exception as e:
+            logger.error("Error delivering coalesced thread %s: %s", thread_id, str(e), exc_info=True)
@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+# Dataset metadata cache settings
+DATASET_CACHE_PATH = os.getenv("DATASET_CACHE_PATH", ".dataset_cache.db")
+# Seconds a cached entry is trusted before the API is asked again; 0 disables the cache
+DATASET_CACHE_TTL = float(os.getenv("DATASET_CACHE_TTL", "3600"))
+
+
+def client_namespace(client: Any) -> str:
+    """
+    Namespace for the datasets a client can see, so workspaces and offline clients don't share entries.
+
+    Args:
+        client: LangSmith client
+
+    Returns:
+        Short hash of the client's API URL and key
+    """
+    identity = f"{getattr(client, 'api_url', '')}\n{getattr(client, 'api_key', '') or ''}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+
+class DatasetMetadataCache:
+    """
+    A local cache of dataset metadata by name, backed by SQLite.
+
+    Each entry holds a dataset's ID, description and creation time, its example
+    count, and the content hash of the examples it was last synced with. Entries
+    older than the TTL are treated as missing, so the API is asked again; entries
+    are also dropped explicitly with invalidate().
+    """
+
+    def __init__(self, path: str = DATASET_CACHE_PATH, ttl: float = DATASET_CACHE_TTL):
+        """
+        Initialize the DatasetMetadataCache.
+
+        Args:
+            path: Path of the SQLite database file
+            ttl: Seconds an entry stays fresh
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS datasets (
+                namespace TEXT NOT NULL,
+                name TEXT NOT NULL,
+                id TEXT NOT NULL,
+                description TEXT,
+                created_at TEXT NOT NULL,
+                example_count INTEGER,
+                content_hash TEXT,
+                cached_at REAL NOT NULL,
+                PRIMARY KEY (namespace, name)
+            )
+        """)
+
+
+    def get(self, namespace: str, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a dataset.
+
+        Args:
+            namespace: Namespace from client_namespace()
+            name: Name of the dataset
+
+        Returns:
+            The entry as a dictionary, or None on a miss or when the entry is stale
+        """
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, description, created_at, example_count, content_hash, cached_at "
+                "FROM datasets WHERE namespace = ? AND name = ?",
+                (namespace, name)
+            ).fetchone()
+        if row is None or time.time() - row[5] > self.ttl:
+            return None
+        return {
+            "name": name,
+            "id": row[0],
+            "description": row[1],
+            "created_at": row[2],
+            "example_count": row[3],
+            "content_hash": row[4],
+        }
+
+
+    def set(
+            self,
+            namespace: str,
+            dataset: Any,
+            example_count: Optional[int] = None,
+            content_hash: Optional[str] = None
+        ) -> None:
+        """
+        Store a dataset's metadata, refreshing its age.
+
+        Without a content hash, the previous entry's hash is kept as long as the
+        dataset's ID and example count still match it; otherwise the next sync
+        of the dataset can't be skipped.
+
+        Args:
+            namespace: Namespace from client_namespace()
+            dataset: Dataset object as returned by the API
+            example_count: Number of examples; defaults to the dataset's own count
+            content_hash: Hash of the examples the dataset was synced with
+        """
+        if example_count is None:
+            example_count = getattr(dataset, "example_count", None)
+        with self._lock:
+            if content_hash is None:
+                row = self._conn.execute(
+                    "SELECT id, example_count, content_hash FROM datasets WHERE namespace = ? AND name = ?",
+                    (namespace, dataset.name)
+                ).fetchone()
+                if row is not None and row[0] == str(dataset.id) and example_count in (None, row[1]):
+                    example_count, content_hash = row[1], row[2]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO datasets "
+                "(namespace, name, id, description, created_at, example_count, content_hash, cached_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, dataset.name, str(dataset.id), dataset.description,
+                 dataset.created_at.isoformat(), example_count, content_hash, time.time())
+            )
+
+
+    def invalidate(self, namespace: Optional[str] = None, name: Optional[str] = None) -> None:
+        """
+        Remove cached entries.
+
+        Args:
+            namespace: Only remove entries of this namespace; None removes every namespace
+            name: Only remove the entry of this dataset; None removes every dataset
+        """
+        clauses, params = [], []
+        if namespace is not None:
+            clauses.append("namespace = ?")
+            params.append(namespace)
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM datasets{where}", params)
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -5,6 +5,9 @@ class DatasetDefinitions:
     A class that defines various example datasets for evaluation.
     """
 
+    # Predefined categories; each is built by the static method of the same name
+    CATEGORIES = ("general_knowledge", "math", "coding", "science", "history", "literature")
+
     @classmethod
     def get_all_datasets(cls) -> Dict[str, List[Tuple[str, str]]]:
         """
@@ -13,14 +16,7 @@ class DatasetDefinitions:
         Returns:
             Dictionary mapping dataset types to lists of (question, answer) tuples
         """
-        return {
-            "general_knowledge": cls.general_knowledge(),
-            "math": cls.math(),
-            "coding": cls.coding(),
-            "science": cls.science(),
-            "history": cls.history(),
-            "literature": cls.literature()
-        }
+        return {name: getattr(cls, name)() for name in cls.CATEGORIES}
 
     @staticmethod
     def general_knowledge() -> List[Tuple[str, str]]:
@@ -1,21 +1,148 @@
-from typing import List, Any, Tuple
+import json
+import uuid
+import hashlib
+import datetime
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple, Union
 from langsmith import Client
-from dataset_definitions import DatasetDefinitions
+from langsmith.schemas import Dataset
+from langsmith.utils import LangSmithConflictError
+from bulk_upload import UPLOAD_CHUNK_BYTES, UPLOAD_CHUNK_SIZE, UPLOAD_WORKERS, ChunkedUploader, chunked
+from dataset_cache import DatasetMetadataCache, client_namespace
+from dataset_sources import DatasetRegistry, DatasetSource, default_registry
+
+# Examples fetched per list_examples page when diffing a dataset
+EXAMPLE_PAGE_SIZE = 100
+
+
+def content_hash(input_text: str, output_text: str) -> str:
+    """
+    Hash of a (question, answer) pair, stored in example metadata to detect edits.
+    
+    Args:
+        input_text: The example's input
+        output_text: The example's output
+        
+    Returns:
+        Hex SHA-256 of the pair
+    """
+    encoded = json.dumps([input_text, output_text], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ExamplesDigest:
+    """
+    Order-independent hash of a stream of (question, answer) pairs, keyed by question.
+    
+    Pairs are added one at a time. Only the first pair of each question counts;
+    later duplicates are ignored, as in sync_examples(). The hash is the sum of
+    the pairs' content hashes, so no pair has to be kept to compute it; only a
+    16-byte digest of each question is remembered to recognise duplicates.
+    """
+
+    def __init__(self):
+        self._total = 0
+        self._seen = set()
+
+
+    def add(self, input_text: str, output_text: str) -> Optional[str]:
+        """
+        Add a pair.
+        
+        Returns:
+            The pair's content hash, or None if its question was already added
+        """
+        key = hashlib.blake2b(input_text.encode("utf-8"), digest_size=16).digest()
+        if key in self._seen:
+            return None
+        self._seen.add(key)
+        digest = content_hash(input_text, output_text)
+        self._total = (self._total + int(digest, 16)) % 2 ** 256
+        return digest
+
+
+    @property
+    def count(self) -> int:
+        """Number of distinct questions added."""
+        return len(self._seen)
+
+
+    def hexdigest(self) -> str:
+        return f"{self._total:064x}"
+
+
+def examples_hash(examples: Iterable[Tuple[str, str]]) -> Tuple[str, int]:
+    """
+    Order-independent hash of a set of (question, answer) pairs, keyed by question as sync_examples() is.
+    
+    The pairs are streamed, not collected.
+    
+    Args:
+        examples: (input, output) pairs
+        
+    Returns:
+        (hex hash over the pairs' content hashes, number of distinct inputs)
+    """
+    digest = ExamplesDigest()
+    for input_text, output_text in examples:
+        digest.add(input_text, output_text)
+    return digest.hexdigest(), digest.count
+
 
 class DatasetManager:
     """
     A class to manage LangSmith datasets.
     """
 
-    def __init__(self, client: Client = None):
+    def __init__(
+            self,
+            client: Client = None,
+            metadata_cache: DatasetMetadataCache = None,
+            registry: DatasetRegistry = None
+        ):
         """
         Initialize the DatasetManager with a LangSmith client.
         
         Args:
             client: LangSmith client. If None, a new client will be created.
+            metadata_cache: Local cache of dataset IDs, counts and content hashes.
+                If None, one is opened at DATASET_CACHE_PATH.
+            registry: Sources of the example datasets. If None, the predefined
+                categories are registered; each is built when first used.
         """
         self.client = client or Client()
-        self.example_datasets = DatasetDefinitions.get_all_datasets()
+        self.metadata_cache = metadata_cache if metadata_cache is not None else DatasetMetadataCache()
+        self.namespace = client_namespace(self.client)
+        self.example_datasets = registry if registry is not None else default_registry()
+
+
+    def _cached_dataset(self, dataset_name: str) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Look up a dataset in the metadata cache.
+        
+        Returns:
+            (dataset object, cache entry), or (None, None) on a miss or a stale entry
+        """
+        entry = self.metadata_cache.get(self.namespace, dataset_name)
+        if entry is None:
+            return None, None
+        dataset = Dataset(
+            id=entry["id"],
+            name=dataset_name,
+            description=entry["description"],
+            created_at=datetime.datetime.fromisoformat(entry["created_at"]),
+            example_count=entry["example_count"]
+        )
+        return dataset, entry
+
+
+    def invalidate_cache(self, dataset_name: str = None) -> None:
+        """
+        Forget cached metadata so the next lookup asks the API.
+        
+        Args:
+            dataset_name: Only forget this dataset; None forgets every dataset of this client
+        """
+        self.metadata_cache.invalidate(self.namespace, dataset_name)
 
 
     def get_or_create_dataset(
@@ -33,9 +160,15 @@ class DatasetManager:
         Returns:
             Tuple of (dataset object, is_new flag)
         """
+        dataset, _ = self._cached_dataset(dataset_name)
+        if dataset:
+            print(f"Using cached dataset: {dataset.name} (ID: {dataset.id})")
+            return dataset, False
+
         dataset = next((ds for ds in self.client.list_datasets(dataset_name=dataset_name)), None)
         if dataset:
             print(f"Using existing dataset: {dataset.name} (ID: {dataset.id})")
+            self.metadata_cache.set(self.namespace, dataset)
             return dataset, False
         else:
             dataset = self.client.create_dataset(
@@ -43,30 +176,199 @@ class DatasetManager:
                 description=description or f"Dataset: {dataset_name}"
             )
             print(f"Created new dataset: {dataset.name} (ID: {dataset.id})")
+            self.metadata_cache.set(self.namespace, dataset, example_count=0)
             return dataset, True
 
 
     def add_examples(
             self,
             dataset_id: str,
-            examples: List[Tuple[str, str]],
+            examples: Iterable[Tuple[str, str]],
             input_key: str = "question",
-            output_key: str = "answer"
-        ) -> None:
+            output_key: str = "answer",
+            chunk_size: int = UPLOAD_CHUNK_SIZE,
+            chunk_bytes: int = UPLOAD_CHUNK_BYTES,
+            workers: int = UPLOAD_WORKERS
+        ) -> int:
         """
         Add examples to a dataset.
         
+        Examples are read lazily and uploaded in chunks bounded by count and size
+        from a pool of workers, so any iterable, including a generator over a
+        large file, can be uploaded without holding it in memory. Each example
+        gets its ID on the client, so retrying a chunk the server already
+        accepted can't create duplicates.
+        
         Args:
             dataset_id: ID of the dataset to add examples to
-            examples: List of (input, output) tuples
+            examples: Iterable of (input, output) tuples
             input_key: Key for the input in the dataset
             output_key: Key for the output in the dataset
+            chunk_size: Maximum examples per create_examples call
+            chunk_bytes: Maximum estimated JSON bytes per create_examples call
+            workers: Chunks uploaded concurrently
+            
+        Returns:
+            Number of examples added
         """
-        inputs = [{input_key: input_text} for input_text, _ in examples]
-        outputs = [{output_key: output_text} for _, output_text in examples]
+        items = (
+            {
+                "id": str(uuid.uuid4()),
+                "inputs": {input_key: input_text},
+                "outputs": {output_key: output_text},
+                "metadata": {"content_hash": content_hash(input_text, output_text)},
+            }
+            for input_text, output_text in examples
+        )
+        count = self._upload_chunks(
+            lambda chunk: self.client.create_examples(dataset_id=dataset_id, examples=chunk),
+            chunked(items, chunk_size, chunk_bytes),
+            workers,
+            idempotent_ids=True
+        )
+        print(f"Added {count} examples to dataset")
+        return count
+
 
-        self.client.create_examples(inputs=inputs, outputs=outputs, dataset_id=dataset_id)
-        print(f"Added {len(examples)} examples to dataset")
+    def _upload_chunks(self, send, chunks: Iterable[List[Any]], workers: int = UPLOAD_WORKERS,
+                       label: str = "examples", idempotent_ids: bool = False) -> int:
+        # Creates carry client-assigned IDs, so a retry that conflicts was already applied
+        already_sent = (lambda e: isinstance(e, LangSmithConflictError)) if idempotent_ids else None
+        return ChunkedUploader(send, workers=workers, label=label, already_sent=already_sent).upload(chunks)
+
+
+    def iter_remote_examples(
+            self,
+            dataset_id: str,
+            page_size: int = EXAMPLE_PAGE_SIZE
+        ) -> Iterator[Any]:
+        """
+        Iterate over a dataset's examples one page at a time.
+        
+        Args:
+            dataset_id: ID of the dataset
+            page_size: Examples fetched per request
+            
+        Returns:
+            Iterator of example objects
+        """
+        offset = 0
+        while True:
+            page = list(self.client.list_examples(dataset_id=dataset_id, offset=offset, limit=page_size))
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
+
+    def sync_examples(
+            self,
+            dataset_id: str,
+            examples: Iterable[Tuple[str, str]],
+            input_key: str = "question",
+            output_key: str = "answer",
+            delete_missing: bool = False,
+            chunk_size: int = UPLOAD_CHUNK_SIZE
+        ) -> Dict[str, Any]:
+        """
+        Make a dataset match a local set of examples, uploading only the differences.
+        
+        Examples are matched by input. Local examples missing remotely are created,
+        ones whose output changed are updated, and remote examples with no local
+        counterpart are deleted if delete_missing is set. Each example stores the
+        content hash of its pair in its metadata, so unchanged examples are
+        recognised without comparing their content.
+        
+        The remote examples' IDs and hashes are indexed first. The local examples
+        are then read in a single streaming pass that hashes them, diffs them
+        against the index and feeds new examples to the uploader as they are
+        found, so the local examples are never held in memory. Only the first
+        example of each input is synced.
+        
+        Args:
+            dataset_id: ID of the dataset to sync
+            examples: (input, output) pairs
+            input_key: Key for the input in the dataset
+            output_key: Key for the output in the dataset
+            delete_missing: Delete remote examples that are not in examples
+            chunk_size: Examples per create, update or delete call
+            
+        Returns:
+            Counts of created, updated, deleted and unchanged examples, the
+            dataset's total example count after the sync, and the examples'
+            content_hash as computed by examples_hash()
+        """
+        remote: Dict[str, Tuple[Any, str, Dict[str, Any]]] = {}
+        deletes = []
+        for example in self.iter_remote_examples(dataset_id):
+            input_text = (example.inputs or {}).get(input_key)
+            if input_text is None or input_text in remote:
+                # Not an example of this key, or a duplicate of an input already indexed
+                deletes.append(example.id)
+                continue
+            remote_digest = (example.metadata or {}).get("content_hash")
+            if remote_digest is None:
+                remote_digest = content_hash(input_text, (example.outputs or {}).get(output_key))
+            remote[input_text] = (example.id, remote_digest, example.metadata or {})
+
+        digest = ExamplesDigest()
+        updates = []
+        counts = {"created": 0, "unchanged": 0}
+
+        def creates() -> Iterator[Dict[str, Any]]:
+            for input_text, output_text in examples:
+                pair_digest = digest.add(input_text, output_text)
+                if pair_digest is None:
+                    continue
+                match = remote.pop(input_text, None)
+                if match is None:
+                    counts["created"] += 1
+                    yield {
+                        "id": str(uuid.uuid4()),
+                        "inputs": {input_key: input_text},
+                        "outputs": {output_key: output_text},
+                        "metadata": {"content_hash": pair_digest},
+                    }
+                elif match[1] != pair_digest:
+                    updates.append({
+                        "id": match[0],
+                        "inputs": {input_key: input_text},
+                        "outputs": {output_key: output_text},
+                        "metadata": dict(match[2], content_hash=pair_digest),
+                    })
+                else:
+                    counts["unchanged"] += 1
+
+        self._upload_chunks(
+            lambda chunk: self.client.create_examples(dataset_id=dataset_id, examples=chunk),
+            chunked(creates(), chunk_size),
+            idempotent_ids=True
+        )
+        # Remote examples left unmatched are no longer local
+        deletes.extend(example_id for example_id, _, _ in remote.values())
+        if updates:
+            self._upload_chunks(
+                lambda chunk: self.client.update_examples(dataset_id=dataset_id, updates=chunk),
+                chunked(updates, chunk_size),
+                label="example updates"
+            )
+        if delete_missing and deletes:
+            self._upload_chunks(
+                lambda chunk: self.client.delete_examples(example_ids=chunk),
+                chunked([str(example_id) for example_id in deletes], chunk_size),
+                label="example deletions"
+            )
+
+        result = {
+            "created": counts["created"],
+            "updated": len(updates),
+            "deleted": len(deletes) if delete_missing else 0,
+            "unchanged": counts["unchanged"],
+            "total": digest.count + (0 if delete_missing else len(deletes)),
+        }
+        print(f"Synced dataset {dataset_id}: {result}")
+        result["content_hash"] = digest.hexdigest()
+        return result
 
 
     def list_datasets(
@@ -76,28 +378,38 @@ class DatasetManager:
         """
         List all datasets, optionally filtered by name.
         
+        A lookup by name is answered from the metadata cache while its entry is
+        fresh. Datasets listed from the API refresh their cache entries.
+        
         Args:
             name_filter: Optional string to filter dataset names
             
         Returns:
             List of dataset objects
         """
+        if name_filter is not None:
+            dataset, _ = self._cached_dataset(name_filter)
+            if dataset:
+                return [dataset]
         datasets = list(self.client.list_datasets(dataset_name=name_filter))
+        for dataset in datasets:
+            self.metadata_cache.set(self.namespace, dataset)
         return datasets
 
 
-    def get_example_dataset(
+    def get_example_source(
             self,
             dataset_type: str
-        ) -> List[Tuple[str, str]]:
+        ) -> DatasetSource:
         """
-        Get a predefined example dataset by type.
+        Get the source of an example dataset by type, without loading it.
         
         Args:
             dataset_type: Type of dataset to retrieve (e.g., "general_knowledge", "math", "coding")
             
         Returns:
-            List of (input, output) tuples for the requested dataset type
+            Re-iterable source of (input, output) tuples for the requested dataset type;
+            its examples are loaded or streamed when it is iterated
         """
         if dataset_type not in self.example_datasets:
             available_types = ", ".join(self.example_datasets.keys())
@@ -108,43 +420,66 @@ class DatasetManager:
         return self.example_datasets[dataset_type]
 
 
+    def get_example_dataset(
+            self,
+            dataset_type: str
+        ) -> List[Tuple[str, str]]:
+        """
+        Get a predefined example dataset by type.
+        
+        Args:
+            dataset_type: Type of dataset to retrieve (e.g., "general_knowledge", "math", "coding")
+            
+        Returns:
+            List of (input, output) tuples for the requested dataset type
+        """
+        return list(self.get_example_source(dataset_type))
+
+
     def create_dataset_from_examples(
             self,
             dataset_name: str,
             dataset_type: str,
-            description: str = None
+            description: str = None,
+            delete_missing: bool = False
         ) -> Any:
         """
-        Create a dataset using predefined examples.
+        Create a dataset using predefined examples, or bring an existing one up to date.
+        
+        The sync is skipped, without any API call, while the metadata cache has a
+        fresh entry recording that the dataset was synced with the same examples.
+        Without such an entry the examples are read once, by the sync itself.
         
         Args:
             dataset_name: Name for the dataset
             dataset_type: Type of predefined examples to use
             description: Optional description for the dataset
+            delete_missing: Delete remote examples that are no longer predefined
             
         Returns:
             The created dataset object
         """
+        examples = self.get_example_source(dataset_type)
+        dataset, entry = self._cached_dataset(dataset_name)
+        if dataset and entry["content_hash"] is not None:
+            digest, count = examples_hash(examples)
+            if entry["content_hash"] == digest and (not delete_missing or entry["example_count"] == count):
+                print(f"Dataset {dataset_name} is up to date (cached)")
+                return dataset
+
         # Get the dataset or create it if it doesn't exist
         dataset, is_new = self.get_or_create_dataset(dataset_name, description)
 
-        # Check if the dataset has examples
-        examples_count = 0
+        # Upload only what changed since the last sync
         try:
-            # Try to get the first example to check if the dataset has any
-            examples_list = list(self.client.list_examples(dataset_id=dataset.id, limit=1))
-            examples_count = len(examples_list)
+            result = self.sync_examples(dataset.id, examples, delete_missing=delete_missing)
         except Exception:
-            # If there's an error, assume there are no examples
-            examples_count = 0
-
-        # Add examples if the dataset is new or has no examples
-        if is_new or examples_count == 0:
-            examples = self.get_example_dataset(dataset_type)
-            self.add_examples(dataset.id, examples)
-            print(f"Added {len(examples)} examples from '{dataset_type}' to dataset '{dataset_name}'")
-        else:
-            print(f"Dataset '{dataset_name}' already exists with examples. Skipping adding examples to avoid duplicates.")
+            # The dataset may be partly synced, or gone if the cached ID was stale
+            self.invalidate_cache(dataset_name)
+            raise
+        self.metadata_cache.set(
+            self.namespace, dataset, example_count=result["total"], content_hash=result["content_hash"]
+        )
         
         return dataset
 
@@ -152,14 +487,16 @@ class DatasetManager:
     def add_custom_example_dataset(
             self,
             dataset_type: str,
-            examples: List[Tuple[str, str]]
+            examples: Union[List[Tuple[str, str]], DatasetSource, str]
         ) -> None:
         """
         Add a custom example dataset to the available example datasets.
         
         Args:
             dataset_type: Name/type for the custom dataset
-            examples: List of (input, output) tuples
+            examples: List of (input, output) tuples, a DatasetSource, or the path of a
+                .jsonl or .csv file with question and answer fields, which is streamed
+                rather than loaded
         """
-        self.example_datasets[dataset_type] = examples
-        print(f"Added custom example dataset '{dataset_type}' with {len(examples)} examples")
+        source = self.example_datasets.register(dataset_type, examples)
+        print(f"Added custom example dataset '{dataset_type}' from {source}")
@@ -0,0 +1,258 @@
+import os
+import csv
+import json
+import mmap
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from dataset_definitions import DatasetDefinitions
+
+# Extra categories backed by local files, e.g. "support=data/support.jsonl,legal=data/legal.csv"
+EVAL_DATASET_FILES = os.getenv("EVAL_DATASET_FILES", "")
+
+
+class DatasetSource(ABC):
+    """
+    A re-iterable source of (question, answer) pairs.
+
+    Iterating a source yields its pairs; every iteration starts from the
+    beginning, so a source can be read again on every sync.
+    """
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate over the pairs from the beginning.
+        """
+
+
+class StaticSource(DatasetSource):
+    """
+    Pairs held in memory.
+    """
+
+    def __init__(self, examples: Iterable[Tuple[str, str]]):
+        self.examples = list(examples)
+
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self.examples)
+
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+
+    def __repr__(self) -> str:
+        return f"{len(self.examples)} in-memory examples"
+
+
+class CallableSource(DatasetSource):
+    """
+    Pairs built by a function on first iteration, then kept in memory.
+    """
+
+    def __init__(self, load: Callable[[], Iterable[Tuple[str, str]]]):
+        """
+        Initialize the CallableSource.
+
+        Args:
+            load: Returns the pairs, e.g. DatasetDefinitions.coding
+        """
+        self.load = load
+        self._examples: Optional[List[Tuple[str, str]]] = None
+        self._lock = threading.Lock()
+
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        if self._examples is None:
+            with self._lock:
+                if self._examples is None:
+                    self._examples = list(self.load())
+        return iter(self._examples)
+
+
+    def __repr__(self) -> str:
+        return getattr(self.load, "__qualname__", repr(self.load))
+
+
+class FileSource(DatasetSource):
+    """
+    Pairs streamed from a local file, one record at a time.
+
+    The file is reopened on every iteration and never held in memory as a
+    whole. With use_mmap the file is memory-mapped, so its pages are read
+    through the OS page cache rather than a Python buffer.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            question_key: str = "question",
+            answer_key: str = "answer",
+            use_mmap: bool = False
+        ):
+        """
+        Initialize the FileSource.
+
+        Args:
+            path: Path of the file
+            question_key: Field or column holding the question
+            answer_key: Field or column holding the answer
+            use_mmap: Memory-map the file instead of reading it through a buffer
+        """
+        self.path = path
+        self.question_key = question_key
+        self.answer_key = answer_key
+        self.use_mmap = use_mmap
+
+
+    def _lines(self) -> Iterator[str]:
+        if not self.use_mmap:
+            with open(self.path, encoding="utf-8", newline="") as f:
+                yield from f
+            return
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # An empty file can't be mapped
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for line in iter(mapped.readline, b""):
+                    yield line.decode("utf-8")
+
+
+    def _pair(self, record: dict, location: str) -> Tuple[str, str]:
+        try:
+            return record[self.question_key], record[self.answer_key]
+        except KeyError as e:
+            raise ValueError(f"{location}: missing field {e}") from None
+
+
+    def __repr__(self) -> str:
+        return self.path
+
+
+class JsonlSource(FileSource):
+    """
+    Pairs streamed from a JSON Lines file with one object per line.
+    """
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for number, line in enumerate(self._lines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{self.path}:{number}: invalid JSON: {e}") from None
+            yield self._pair(record, f"{self.path}:{number}")
+
+
+class CsvSource(FileSource):
+    """
+    Pairs streamed from a CSV file with a header row.
+    """
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        reader = csv.DictReader(self._lines())
+        for record in reader:
+            yield self._pair(record, f"{self.path}:{reader.line_num}")
+
+
+def file_source(path: str, **kwargs) -> FileSource:
+    """
+    Create the source for a file from its extension.
+
+    Args:
+        path: Path of a .jsonl or .csv file
+        kwargs: Arguments of FileSource
+
+    Returns:
+        JsonlSource or CsvSource
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return JsonlSource(path, **kwargs)
+    if extension == ".csv":
+        return CsvSource(path, **kwargs)
+    raise ValueError(f"Unsupported dataset file '{path}'; expected .jsonl or .csv")
+
+
+def as_source(examples: Union[DatasetSource, str, Iterable[Tuple[str, str]]]) -> DatasetSource:
+    """
+    Turn a source, a file path or in-memory pairs into a source.
+    """
+    if isinstance(examples, DatasetSource):
+        return examples
+    if isinstance(examples, (str, os.PathLike)):
+        return file_source(os.fspath(examples))
+    return StaticSource(examples)
+
+
+class DatasetRegistry(MutableMapping):
+    """
+    Dataset sources by category name.
+
+    Registering a category only records its source; nothing is loaded until
+    the category's pairs are iterated. Looking up a category returns its source.
+    Assigning a category, as with a dictionary, registers it.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, DatasetSource] = {}
+
+
+    def register(self, name: str, source: Union[DatasetSource, str, Iterable[Tuple[str, str]]]) -> DatasetSource:
+        """
+        Register or replace a category.
+
+        Args:
+            name: Category name
+            source: A DatasetSource, a path of a .jsonl or .csv file, or (question, answer) pairs
+
+        Returns:
+            The registered source
+        """
+        self._sources[name] = as_source(source)
+        return self._sources[name]
+
+
+    def __getitem__(self, name: str) -> DatasetSource:
+        return self._sources[name]
+
+
+    def __setitem__(self, name: str, source: Union[DatasetSource, str, Iterable[Tuple[str, str]]]) -> None:
+        self.register(name, source)
+
+
+    def __delitem__(self, name: str) -> None:
+        del self._sources[name]
+
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sources)
+
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+
+def default_registry() -> DatasetRegistry:
+    """
+    Registry of the predefined categories, plus the files listed in EVAL_DATASET_FILES.
+
+    Returns:
+        A new registry; predefined categories are built on first use
+    """
+    registry = DatasetRegistry()
+    for name in DatasetDefinitions.CATEGORIES:
+        registry.register(name, CallableSource(getattr(DatasetDefinitions, name)))
+    for entry in EVAL_DATASET_FILES.split(","):
+        if entry.strip():
+            name, _, path = entry.partition("=")
+            if not path:
+                raise ValueError(f"EVAL_DATASET_FILES entry '{entry}' is not name=path")
+            registry.register(name.strip(), file_source(path.strip()))
+    return registry
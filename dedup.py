@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("webhook_handler")
+
+# Deduplication settings; an empty store path keeps the cache in memory only
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "10000"))
+DEDUP_TTL_SECONDS = float(os.getenv("DEDUP_TTL_SECONDS", "86400"))
+DEDUP_STORE_PATH = os.getenv("DEDUP_STORE_PATH", "")
+
+# Prune expired rows from the persistent store after this many inserts
+PRUNE_EVERY = 1000
+
+
+def dedup_key(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Build the deduplication key for an email.
+
+    Args:
+        data: The email fields from the webhook payload
+
+    Returns:
+        The messageId, or a hash of sender, subject and timestamp when there is
+        no messageId, or None if none of those fields are present
+    """
+    message_id = data.get("messageId")
+    if message_id:
+        return f"id:{message_id}"
+
+    fields = [data.get("sender"), data.get("subject"), data.get("messageTimestamp")]
+    if all(field is None for field in fields):
+        return None
+    digest = hashlib.sha256(json.dumps(fields, ensure_ascii=False, default=str).encode("utf-8"))
+    return f"hash:{digest.hexdigest()}"
+
+
+class DedupCache:
+    """
+    A bounded LRU of recently seen webhook keys with a TTL, optionally backed by
+    a SQLite store so deduplication survives restarts.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = DEDUP_MAX_ENTRIES,
+            ttl: float = DEDUP_TTL_SECONDS,
+            store_path: Optional[str] = DEDUP_STORE_PATH or None
+        ):
+        """
+        Initialize the DedupCache.
+
+        Args:
+            max_entries: Maximum number of keys kept in memory
+            ttl: Seconds after which a key is forgotten
+            store_path: Optional path of a SQLite file used to persist keys
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store_path = store_path
+        self.duplicates = 0
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._inserts = 0
+
+
+    def open(self) -> None:
+        """
+        Open the persistent store, if configured, and drop expired keys from it.
+        """
+        if not self.store_path or self._conn is not None:
+            return
+        self._conn = sqlite3.connect(self.store_path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_messages (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM seen_messages WHERE expires_at <= ?", (time.time(),))
+        logger.info("Dedup store opened at %s", self.store_path)
+
+
+    def close(self) -> None:
+        """
+        Close the persistent store.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+    def claim(self, key: str) -> bool:
+        """
+        Record a key as seen, unless it already was.
+
+        The check and insert happen under one lock so concurrent copies of the
+        same delivery can't both be claimed.
+
+        Args:
+            key: Deduplication key from dedup_key()
+
+        Returns:
+            True if this is the first delivery, False if it is a duplicate
+        """
+        now = time.time()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT expires_at FROM seen_messages WHERE key = ?", (key,)
+                ).fetchone()
+                expires_at = row[0] if row else None
+
+            if expires_at is not None and expires_at > now:
+                self._entries[key] = expires_at
+                self._entries.move_to_end(key)
+                self._evict()
+                self.duplicates += 1
+                return False
+
+            expires_at = now + self.ttl
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            self._evict()
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO seen_messages (key, expires_at) VALUES (?, ?)",
+                    (key, expires_at)
+                )
+                self._inserts += 1
+                if self._inserts % PRUNE_EVERY == 0:
+                    self._conn.execute("DELETE FROM seen_messages WHERE expires_at <= ?", (now,))
+            return True
+
+
+    def release(self, key: str) -> None:
+        """
+        Forget a key so a redelivery is processed again, e.g. after forwarding failed.
+
+        Args:
+            key: Deduplication key to forget
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM seen_messages WHERE key = ?", (key,))
+
+
+    async def aclaim(self, key: str) -> bool:
+        """
+        claim() for the event loop: with a persistent store, the SQLite I/O runs
+        in the default executor so a webhook never blocks the loop on disk.
+
+        Args:
+            key: Deduplication key from dedup_key()
+
+        Returns:
+            True if this is the first delivery, False if it is a duplicate
+        """
+        if self._conn is None:
+            return self.claim(key)
+        return await asyncio.get_running_loop().run_in_executor(None, self.claim, key)
+
+
+    async def arelease(self, key: str) -> None:
+        """
+        release() for the event loop, running the store I/O in the default executor.
+
+        Args:
+            key: Deduplication key to forget
+        """
+        if self._conn is None:
+            self.release(key)
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self.release, key)
+
+
+    def _evict(self) -> None:
+        """
+        Drop least recently used keys beyond max_entries.
+        """
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Deduplication counters.
+
+        Returns:
+            Dictionary with the number of cached keys and duplicates dropped
+        """
+        return {"entries": len(self._entries), "duplicates": self.duplicates}
@@ -0,0 +1,391 @@
+import os
+import json
+import math
+import time
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# USD per million (prompt, completion) tokens, used to estimate run cost
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+# Overrides or extends MODEL_PRICES, e.g. '{"my-model": [1.0, 2.0]}'
+EVAL_MODEL_PRICES = json.loads(os.getenv("EVAL_MODEL_PRICES", "{}"))
+# Directory of per-call reports; empty keeps the report in memory only
+EVAL_REPORT_DIR = os.getenv("EVAL_REPORT_DIR", ".eval_reports")
+# Characters of an example's input kept in each call record
+REPORT_INPUT_CHARS = 200
+
+
+def model_price(model: str) -> Optional[tuple]:
+    prices = dict(MODEL_PRICES, **EVAL_MODEL_PRICES)
+    if model in prices:
+        return tuple(prices[model])
+    # Dated snapshots such as gpt-4o-mini-2024-07-18 are priced like their base model
+    for name in sorted(prices, key=len, reverse=True):
+        if model.startswith(name):
+            return tuple(prices[name])
+    return None
+
+
+class UsageMeter:
+    """
+    Accumulates token usage of model calls per model and estimates their cost.
+
+    With a CallLog, each call passed to record_call() is also written to the
+    log under the meter's dataset.
+    """
+
+    def __init__(self, dataset: str = None, call_log: "CallLog" = None):
+        """
+        Initialize the UsageMeter.
+
+        Args:
+            dataset: Dataset the metered calls belong to, used to label call records
+            call_log: Optional CallLog receiving a record per call
+        """
+        self.dataset = dataset
+        self.call_log = call_log
+        self._lock = threading.Lock()
+        self.usage: Dict[str, Dict[str, int]] = {}
+
+
+    def add(self, model: str, usage: Any) -> None:
+        """
+        Add the usage of one completion.
+
+        Args:
+            model: Model that served the call
+            usage: The completion's usage object, or None if the provider sent none
+        """
+        if usage is None:
+            return
+        with self._lock:
+            totals = self.usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            totals["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+
+    def record_call(
+            self,
+            stage: str,
+            model: str,
+            latency_s: float,
+            usage: Any = None,
+            cache_hit: bool = False,
+            call_stats: Optional[Dict[str, Any]] = None,
+            input_text: str = None,
+            **fields: Any
+        ) -> None:
+        """
+        Record one target or judge call, or a cache hit that replaced it.
+
+        Args:
+            stage: Stage of the call, e.g. "target" or "judge"
+            model: Model of the call
+            latency_s: Seconds the call took, including rate limiting and retries
+            usage: The completion's usage object; None for a cache hit
+            cache_hit: Whether the result came from the response cache
+            call_stats: Retries and wait_s filled in by RateLimiter.call(), if it scheduled the call
+            input_text: Text identifying the example, e.g. its question
+            fields: Extra fields for the record, e.g. batch_size
+        """
+        self.add(model, usage)
+        if self.call_log is None:
+            return
+        call_stats = call_stats or {}
+        self.call_log.record(dict(
+            {
+                "dataset": self.dataset,
+                "stage": stage,
+                "model": model,
+                "latency_s": latency_s,
+                "wait_s": call_stats.get("wait_s"),
+                "retries": call_stats.get("retries"),
+                "cache_hit": cache_hit,
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+                "input": (input_text or "")[:REPORT_INPUT_CHARS],
+            },
+            **fields
+        ))
+
+
+    def cost(self) -> Optional[float]:
+        """
+        Estimated cost in USD, or None if a model has no known price.
+        """
+        total = 0.0
+        with self._lock:
+            for model, totals in self.usage.items():
+                price = model_price(model)
+                if price is None:
+                    return None
+                total += (totals["prompt_tokens"] * price[0] + totals["completion_tokens"] * price[1]) / 1e6
+        return total
+
+
+    def merge(self, usage: Dict[str, Dict[str, int]]) -> None:
+        """
+        Add usage accumulated elsewhere, e.g. by an earlier process of a resumed run.
+
+        Args:
+            usage: Totals per model, as in UsageMeter.usage
+        """
+        with self._lock:
+            for model, counts in usage.items():
+                totals = self.usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+                for name in totals:
+                    totals[name] += counts.get(name, 0)
+
+
+    def tokens(self) -> int:
+        with self._lock:
+            return sum(t["prompt_tokens"] + t["completion_tokens"] for t in self.usage.values())
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    # Nearest rank: the smallest value with at least pct% of the values at or below it
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct * len(sorted_values) / 100) - 1))
+    return sorted_values[index]
+
+
+class CallLog:
+    """
+    A report of every target and judge call, kept per dataset and stage.
+
+    Each record is appended to a JSONL file and flushed as it is made, so slow
+    or expensive examples can be found afterwards, even if the run crashed. Latencies and totals are also accumulated
+    per (dataset, stage) for summary percentiles.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the CallLog.
+
+        Args:
+            path: Path of the JSONL report; None keeps only the summary
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._groups: Dict[tuple, Dict[str, Any]] = {}
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """
+        Add one call record.
+
+        Args:
+            record: Record from UsageMeter.record_call()
+        """
+        record = dict(record, time=time.time())
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            group = self._groups.setdefault((record["dataset"], record["stage"]), {
+                "latencies": [], "waits": [], "cache_hits": 0, "retries": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+            })
+            group["latencies"].append(record["latency_s"])
+            if record["wait_s"] is not None:
+                group["waits"].append(record["wait_s"])
+            group["cache_hits"] += bool(record["cache_hit"])
+            group["retries"] += record["retries"] or 0
+            group["prompt_tokens"] += record["prompt_tokens"]
+            group["completion_tokens"] += record["completion_tokens"]
+            if self._file is not None:
+                self._file.write(line)
+                self._file.flush()
+
+
+    def summarize(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Summarize the calls per dataset and stage.
+
+        Returns:
+            Nested dictionary dataset -> stage -> calls, cache hit rate, latency
+            percentiles, p95 of the wait for quota, retries and tokens
+        """
+        summary: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        with self._lock:
+            for (dataset, stage), group in sorted(self._groups.items(), key=lambda item: str(item[0])):
+                latencies = sorted(group["latencies"])
+                calls = len(latencies)
+                summary.setdefault(str(dataset), {})[stage] = {
+                    "calls": calls,
+                    "cache_hit_rate": group["cache_hits"] / calls if calls else 0.0,
+                    "p50_s": _percentile(latencies, 50),
+                    "p90_s": _percentile(latencies, 90),
+                    "p95_s": _percentile(latencies, 95),
+                    "p99_s": _percentile(latencies, 99),
+                    "max_s": latencies[-1] if latencies else float("nan"),
+                    "wait_p95_s": _percentile(sorted(group["waits"]), 95),
+                    "retries": group["retries"],
+                    "prompt_tokens": group["prompt_tokens"],
+                    "completion_tokens": group["completion_tokens"],
+                }
+        return summary
+
+
+    def write_summary(self, path: str) -> None:
+        # NaN percentiles, e.g. the wait of unscheduled calls, are written as null
+        summary = {
+            dataset: {
+                stage: {key: None if value != value else value for key, value in values.items()}
+                for stage, values in stages.items()
+            }
+            for dataset, stages in self.summarize().items()
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def format_call_summary(summary: Dict[str, Dict[str, Dict[str, Any]]]) -> str:
+    """
+    Format a CallLog summary as a table with one row per dataset and stage.
+
+    Args:
+        summary: Summary from CallLog.summarize()
+
+    Returns:
+        The table as text
+    """
+    lines = [
+        f"{'dataset':<20}{'stage':<8}{'calls':>7}{'hit %':>7}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}"
+        f"{'wait p95':>10}{'retries':>9}{'prompt tok':>12}{'compl tok':>11}"
+    ]
+    for dataset, stages in summary.items():
+        for stage, s in stages.items():
+            lines.append(
+                f"{dataset:<20}{stage:<8}{s['calls']:>7}{s['cache_hit_rate']:>7.0%}{s['p50_s']:>8.2f}"
+                f"{s['p95_s']:>8.2f}{s['p99_s']:>8.2f}{s['wait_p95_s']:>10.2f}{s['retries']:>9}"
+                f"{s['prompt_tokens']:>12}{s['completion_tokens']:>11}"
+            )
+    return "\n".join(lines)
+
+
+def summarize_results(rows: Iterable[dict], meter: UsageMeter = None, key: str = "accuracy") -> Dict[str, Any]:
+    """
+    Summarize the rows of an experiment's results.
+
+    Args:
+        rows: Rows from ExperimentResults, each with a "run" and "evaluation_results"
+        meter: Usage of the experiment's model calls
+        key: Feedback key holding the accuracy score
+
+    Returns:
+        Dictionary with example count, accuracy, latency percentiles, tokens and cost
+    """
+    latencies: List[float] = []
+    scores: List[float] = []
+    errors = 0
+    for row in rows:
+        run = row["run"]
+        if run.error:
+            errors += 1
+        if run.start_time and run.end_time:
+            latencies.append((run.end_time - run.start_time).total_seconds())
+        for result in row["evaluation_results"]["results"]:
+            if result.key == key and result.score is not None:
+                scores.append(float(result.score))
+    latencies.sort()
+    return {
+        "examples": len(latencies) or len(scores),
+        "errors": errors,
+        "accuracy": sum(scores) / len(scores) if scores else float("nan"),
+        "p50_s": _percentile(latencies, 50),
+        "p95_s": _percentile(latencies, 95),
+        "tokens": meter.tokens() if meter else 0,
+        "cost_usd": meter.cost() if meter else None,
+    }
+
+
+def _score(result: Any, key: str) -> Optional[float]:
+    """
+    Score of the feedback named key in an evaluator result as journaled.
+    """
+    if isinstance(result, dict) and "results" in result:
+        return next((_score(item, key) for item in result["results"] if item.get("key") == key), None)
+    if isinstance(result, dict):
+        result = result.get("score")
+    return None if result is None else float(result)
+
+
+def summarize_records(records: Iterable[dict], meter: UsageMeter = None, key: str = "accuracy") -> Dict[str, Any]:
+    """
+    Summarize the journaled examples of a run, across every process that worked on it.
+
+    Args:
+        records: Example records from a RunJournal
+        meter: Usage of every process of the run
+        key: Feedback key holding the accuracy score
+
+    Returns:
+        Dictionary with the same fields as summarize_results()
+    """
+    latencies: List[float] = []
+    scores: List[float] = []
+    errors = examples = 0
+    for record in records:
+        examples += 1
+        if record.get("error"):
+            errors += 1
+        if record.get("latency_s") is not None:
+            latencies.append(record["latency_s"])
+        score = _score(record.get("result"), key)
+        if score is not None:
+            scores.append(score)
+    latencies.sort()
+    return {
+        "examples": examples,
+        "errors": errors,
+        "accuracy": sum(scores) / len(scores) if scores else float("nan"),
+        "p50_s": _percentile(latencies, 50),
+        "p95_s": _percentile(latencies, 95),
+        "tokens": meter.tokens() if meter else 0,
+        "cost_usd": meter.cost() if meter else None,
+    }
+
+
+def format_summary(summaries: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Format per-category summaries, plus a total row, as a table.
+
+    Args:
+        summaries: Summary from summarize_results() per category
+
+    Returns:
+        The table as text
+    """
+    lines = [f"{'category':<20}{'examples':>9}{'errors':>8}{'accuracy':>10}{'p50 s':>8}{'p95 s':>8}{'tokens':>10}{'cost $':>10}"]
+    for category, s in summaries.items():
+        cost = "n/a" if s["cost_usd"] is None else f"{s['cost_usd']:.4f}"
+        lines.append(
+            f"{category:<20}{s['examples']:>9}{s['errors']:>8}{s['accuracy']:>10.1%}{s['p50_s']:>8.2f}"
+            f"{s['p95_s']:>8.2f}{s['tokens']:>10}{cost:>10}"
+        )
+    examples = sum(s["examples"] for s in summaries.values())
+    if len(summaries) > 1 and examples:
+        scored = [(s["accuracy"], s["examples"]) for s in summaries.values() if s["accuracy"] == s["accuracy"]]
+        accuracy = sum(a * n for a, n in scored) / sum(n for _, n in scored) if scored else float("nan")
+        costs = [s["cost_usd"] for s in summaries.values()]
+        cost = "n/a" if None in costs else f"{sum(costs):.4f}"
+        lines.append(
+            f"{'total':<20}{examples:>9}{sum(s['errors'] for s in summaries.values()):>8}{accuracy:>10.1%}"
+            f"{'':>8}{'':>8}{sum(s['tokens'] for s in summaries.values()):>10}{cost:>10}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langflow_client import LangflowClient
+from resilience import CircuitOpen, Overloaded
+
+logger = logging.getLogger("webhook_handler")
+
+# Ingest queue settings
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "ingest_queue.db")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "8"))
+INGEST_BACKOFF_BASE = float(os.getenv("INGEST_BACKOFF_BASE", "1"))
+INGEST_BACKOFF_MAX = float(os.getenv("INGEST_BACKOFF_MAX", "300"))
+INGEST_LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "60"))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "1"))
+
+# Langflow status codes that are worth retrying; other 4xx responses are dead-lettered
+RETRYABLE_CLIENT_ERRORS = {408, 409, 425, 429}
+
+DeadLetterCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class IngestQueue:
+    """
+    A durable local queue of filtered email payloads backed by SQLite in WAL mode.
+
+    Items are leased to a worker by pushing their next_attempt_at into the future,
+    so anything claimed by a process that dies becomes visible again once the lease expires.
+    """
+
+    def __init__(
+            self,
+            path: str = INGEST_QUEUE_PATH,
+            max_attempts: int = INGEST_MAX_ATTEMPTS,
+            backoff_base: float = INGEST_BACKOFF_BASE,
+            backoff_max: float = INGEST_BACKOFF_MAX,
+            lease_seconds: float = INGEST_LEASE_SECONDS
+        ):
+        """
+        Initialize the IngestQueue.
+
+        Args:
+            path: Path of the SQLite database file
+            max_attempts: Number of delivery attempts before an item is dead-lettered
+            backoff_base: Delay in seconds before the first retry
+            backoff_max: Upper bound on the retry delay in seconds
+            lease_seconds: How long a claimed item stays invisible to other workers
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+
+    def open(self) -> None:
+        """
+        Open the database, enable WAL mode and create the tables if needed.
+        """
+        if self._conn is not None:
+            return
+        self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ingest_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ingest_queue_next_attempt
+                ON ingest_queue (next_attempt_at);
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                failed_at REAL NOT NULL
+            );
+        """)
+        logger.info("Ingest queue opened at %s with %d pending items", self.path, self.depth())
+
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+    def put(self, payload: Dict[str, Any]) -> int:
+        """
+        Durably append a payload to the queue.
+
+        Args:
+            payload: Filtered email data to forward
+
+        Returns:
+            ID of the queued item
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO ingest_queue (payload, created_at, next_attempt_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            return cursor.lastrowid
+
+
+    def claim(self) -> Optional[Tuple[int, Dict[str, Any], int]]:
+        """
+        Lease the next item that is due for delivery.
+
+        Returns:
+            Tuple of (item ID, payload, attempts so far), or None if nothing is due
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload, attempts FROM ingest_queue "
+                    "WHERE next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE ingest_queue SET next_attempt_at = ? WHERE id = ?",
+                        (now + self.lease_seconds, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+
+    def ack(self, item_id: int) -> None:
+        """
+        Remove a successfully delivered item from the queue.
+
+        Args:
+            item_id: ID of the delivered item
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM ingest_queue WHERE id = ?", (item_id,))
+
+
+    def defer(self, item_id: int, delay: float) -> None:
+        """
+        Push an item back without counting an attempt, e.g. while Langflow's circuit is open.
+
+        Args:
+            item_id: ID of the item to defer
+            delay: Seconds before the item is due again
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_queue SET next_attempt_at = ? WHERE id = ?",
+                (time.time() + delay, item_id)
+            )
+
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        Exponential backoff with jitter for the given attempt count.
+
+        Args:
+            attempts: Number of attempts made so far
+
+        Returns:
+            Delay in seconds before the next attempt
+        """
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(attempts - 1, 0)))
+        return random.uniform(delay / 2, delay)
+
+
+    def fail(self, item_id: int, attempts: int, error: str, retryable: bool = True) -> bool:
+        """
+        Record a failed delivery, scheduling a retry or moving the item to the dead-letter table.
+
+        Args:
+            item_id: ID of the failed item
+            attempts: Number of attempts made so far, including this one
+            error: Description of the failure
+            retryable: Whether the failure is worth retrying
+
+        Returns:
+            True if the item was dead-lettered
+        """
+        now = time.time()
+        with self._lock:
+            if retryable and attempts < self.max_attempts:
+                self._conn.execute(
+                    "UPDATE ingest_queue SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                    (attempts, error, now + self.retry_delay(attempts), item_id)
+                )
+                return False
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead_letter (id, payload, attempts, last_error, created_at, failed_at) "
+                    "SELECT id, payload, ?, ?, created_at, ? FROM ingest_queue WHERE id = ?",
+                    (attempts, error, now, item_id)
+                )
+                self._conn.execute("DELETE FROM ingest_queue WHERE id = ?", (item_id,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return True
+
+
+    def depth(self) -> int:
+        """
+        Number of items waiting in the queue, including leased ones.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ingest_queue").fetchone()[0]
+
+
+    def dead_letter_count(self) -> int:
+        """
+        Number of items in the dead-letter table.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+
+    def requeue_dead_letters(self) -> int:
+        """
+        Move every dead-lettered item back onto the queue with a fresh attempt count.
+
+        Returns:
+            Number of items requeued
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO ingest_queue (payload, created_at, next_attempt_at) "
+                    "SELECT payload, created_at, ? FROM dead_letter ORDER BY id",
+                    (now,)
+                )
+                self._conn.execute("DELETE FROM dead_letter")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+
+class QueueForwarder:
+    """
+    A pool of background asyncio workers that drain the IngestQueue to Langflow.
+    """
+
+    def __init__(
+            self,
+            queue: IngestQueue,
+            langflow_client: LangflowClient,
+            workers: int = INGEST_WORKERS,
+            poll_interval: float = INGEST_POLL_INTERVAL,
+            on_dead_letter: Optional[DeadLetterCallback] = None
+        ):
+        """
+        Initialize the QueueForwarder.
+
+        Args:
+            queue: Queue to drain
+            langflow_client: Pooled client used to forward payloads
+            workers: Number of concurrent worker tasks
+            poll_interval: Seconds an idle worker waits before polling for due retries
+            on_dead_letter: Coroutine called with the payload of an item once it is dead-lettered,
+                e.g. to release its dedup key
+        """
+        self.queue = queue
+        self.langflow_client = langflow_client
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.on_dead_letter = on_dead_letter
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks: List[asyncio.Task] = []
+
+
+    def start(self) -> None:
+        """
+        Start the worker tasks on the running event loop.
+        """
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._run(i), name=f"ingest-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Started %d ingest queue workers", self.workers)
+
+
+    async def stop(self) -> None:
+        """
+        Stop the worker tasks. Items being delivered are left leased and will be retried after restart.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Stopped ingest queue workers")
+
+
+    def notify(self) -> None:
+        """
+        Wake idle workers because a new item was queued.
+        """
+        self._wakeup.set()
+
+
+    async def enqueue(self, payload: Dict[str, Any]) -> int:
+        """
+        Durably queue a payload without blocking the event loop and wake the workers.
+
+        Args:
+            payload: Filtered email data to forward
+
+        Returns:
+            ID of the queued item
+        """
+        loop = asyncio.get_running_loop()
+        item_id = await loop.run_in_executor(None, self.queue.put, payload)
+        self.notify()
+        return item_id
+
+
+    async def _run(self, worker_id: int) -> None:
+        """
+        Worker loop: claim due items and deliver them until stopped.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                item = await loop.run_in_executor(None, self.queue.claim)
+            except Exception as e:
+                logger.error("Ingest worker %d failed to claim an item: %s", worker_id, str(e), exc_info=True)
+                item = None
+
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._deliver(loop, *item)
+
+
+    async def _deliver(self, loop, item_id: int, payload: Dict[str, Any], attempts: int) -> None:
+        """
+        Forward a single item to Langflow and record the outcome in the queue.
+        """
+        try:
+            response = await self.langflow_client.forward(payload)
+        except (CircuitOpen, Overloaded) as e:
+            # Langflow wasn't called, so this doesn't count as an attempt
+            await loop.run_in_executor(None, self.queue.defer, item_id, e.retry_after)
+            logger.info("Deferred queued item %d for %ds: %s", item_id, e.retry_after, str(e))
+            return
+        except Exception as e:
+            attempts += 1
+            error, retryable = f"{type(e).__name__}: {e}", True
+        else:
+            attempts += 1
+            if response.status_code < 400:
+                await loop.run_in_executor(None, self.queue.ack, item_id)
+                logger.info("Forwarded queued item %d to Langflow, status: %d", item_id, response.status_code)
+                return
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            retryable = response.status_code >= 500 or response.status_code in RETRYABLE_CLIENT_ERRORS
+
+        dead = await loop.run_in_executor(None, self.queue.fail, item_id, attempts, error, retryable)
+        if dead:
+            logger.error("Dead-lettered queued item %d after %d attempts: %s", item_id, attempts, error)
+            if self.on_dead_letter is not None:
+                try:
+                    await self.on_dead_letter(payload)
+                except Exception as e:
+                    logger.error("Dead-letter callback failed for item %d: %s", item_id, str(e), exc_info=True)
+        else:
+            logger.warning("Delivery of queued item %d failed (attempt %d), will retry: %s", item_id, attempts, error)
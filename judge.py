@@ -0,0 +1,539 @@
+import os
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+from langsmith import wrappers
+from pydantic import BaseModel, Field
+from openai import AsyncOpenAI, OpenAI
+
+from eval_report import UsageMeter
+from rate_limit import RateLimiter, estimate_tokens
+from response_cache import ResponseCache, cache_key
+
+JUDGE_MODEL = "gpt-4o-mini"
+
+# Batch judging settings
+JUDGE_BATCHING = os.getenv("JUDGE_BATCHING", "false").lower() in ("1", "true", "yes")
+# Estimated prompt tokens per batched request; decides how many pairs share a call
+JUDGE_BATCH_TOKEN_BUDGET = int(os.getenv("JUDGE_BATCH_TOKEN_BUDGET", "8000"))
+JUDGE_BATCH_MAX_SIZE = int(os.getenv("JUDGE_BATCH_MAX_SIZE", "25"))
+# Seconds to wait for more pairs before sending a partial batch
+JUDGE_BATCH_WAIT = float(os.getenv("JUDGE_BATCH_WAIT", "0.05"))
+# Completion tokens allowed per graded pair
+GRADE_OUTPUT_TOKENS = 16
+
+# Define instructions for the LLM judge evaluator
+JUDGE_INSTRUCTIONS = """
+    Evaluate Student Answer against Ground Truth for conceptual similarity and classify true or false:
+    - False: No conceptual match and similarity
+    - True: Most or full conceptual match and similarity
+    - Key criteria: Concept should match, not exact wording.
+    """
+
+
+# Appended to the instructions when several pairs are graded in one request
+BATCH_INSTRUCTIONS = """
+    You will be given several numbered pairs. Grade each pair independently and
+    return exactly one grade per pair, with the pair's index.
+    """
+
+
+# Define output schema for the LLM judge
+class Grade(BaseModel):
+    score: bool = Field(
+        description="Boolean that indicates whether the response is accurate relative to the reference answer"
+    )
+
+
+class IndexedGrade(BaseModel):
+    index: int = Field(description="Index of the graded pair")
+    score: bool = Field(
+        description="Boolean that indicates whether the response is accurate relative to the reference answer"
+    )
+
+
+class BatchGrade(BaseModel):
+    grades: List[IndexedGrade] = Field(description="One grade for every pair, by index")
+
+
+def _strict_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Make a pydantic JSON schema acceptable for OpenAI strict structured outputs:
+    every object forbids extra properties and requires all of its properties.
+    """
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema["properties"])
+    for value in schema.values():
+        if isinstance(value, dict):
+            _strict_schema(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    _strict_schema(item)
+    return schema
+
+
+def response_format_for(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Build the structured-output response_format for a pydantic model once,
+    instead of having the client regenerate it on every request.
+
+    Args:
+        model: Pydantic model describing the expected output
+
+    Returns:
+        A response_format parameter for chat.completions.create
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": _strict_schema(model.model_json_schema()),
+            "strict": True
+        }
+    }
+
+
+class AccuracyJudge:
+    """
+    An LLM judge that grades responses against reference answers.
+
+    One judge owns a single pooled OpenAI client, a prebuilt response schema and
+    preformatted instructions, and is meant to be shared by every evaluation in a run.
+    """
+
+    def __init__(
+            self,
+            openai_client: Union[OpenAI, AsyncOpenAI] = None,
+            model: str = JUDGE_MODEL,
+            instructions: str = JUDGE_INSTRUCTIONS,
+            cache: ResponseCache = None,
+            limiter: RateLimiter = None,
+            meter: UsageMeter = None
+        ):
+        """
+        Initialize the AccuracyJudge.
+
+        Args:
+            openai_client: OpenAI client, or AsyncOpenAI client for agrade(). If None,
+                a new wrapped OpenAI client will be created.
+            model: Model used for grading
+            instructions: System prompt for the judge
+            cache: Optional cache of verdicts keyed by model, instructions, reference and response
+            limiter: Optional RateLimiter that schedules and retries agrade() calls
+            meter: Optional UsageMeter that accumulates the judge's token usage and records its calls
+        """
+        self.openai_client = openai_client or wrappers.wrap_openai(OpenAI())
+        self.model = model
+        self.instructions = instructions
+        self.cache = cache
+        self.limiter = limiter
+        self.meter = meter
+        self.response_format = response_format_for(Grade)
+        self.batch_response_format = response_format_for(BatchGrade)
+        self._system_message = {"role": "system", "content": instructions}
+        self._batch_system_message = {"role": "system", "content": instructions + BATCH_INSTRUCTIONS}
+        self.batch_calls = 0
+        self.batch_fallbacks = 0
+
+
+    def build_messages(self, reference: str, response: str) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for grading one response.
+
+        Args:
+            reference: Ground truth answer
+            response: Student's answer
+
+        Returns:
+            List of chat messages
+        """
+        return [
+            self._system_message,
+            {"role": "user", "content": f"""Ground Truth answer: {reference};
+            Student's Answer: {response}"""}
+        ]
+
+
+    def _cache_key(self, reference: str, response: str, batched: bool = False) -> str:
+        # Batched verdicts come from a different prompt, so they are never mixed with single ones
+        system_message = self._batch_system_message if batched else self._system_message
+        return cache_key("judge", self.model, system_message["content"], reference, response)
+
+
+    def _cached(self, reference: str, response: str, batched: bool = False) -> Optional[bool]:
+        if self.cache is None:
+            return None
+        return self.cache.get("judge", self._cache_key(reference, response, batched))
+
+
+    def _record(self, start: float, completion=None, reference: str = None, call_stats=None, **fields) -> None:
+        """
+        Record a judge call, or a cache hit when there is no completion, in the meter.
+        """
+        if self.meter is not None:
+            self.meter.record_call(
+                "judge", self.model, time.perf_counter() - start,
+                completion.usage if completion is not None else None,
+                cache_hit=completion is None, call_stats=call_stats, input_text=reference, **fields
+            )
+
+
+    def _parse(self, completion, reference: str, response: str) -> bool:
+        content = completion.choices[0].message.content
+        if not content:
+            raise ValueError(f"Judge returned no grade: {completion.choices[0].message.refusal}")
+        score = Grade.model_validate_json(content).score
+
+        if self.cache is not None:
+            self.cache.set("judge", self._cache_key(reference, response), score)
+        return score
+
+
+    def grade(self, outputs: dict, reference_outputs: dict) -> bool:
+        """
+        Grade a model response against the reference answer.
+
+        Args:
+            outputs: Output from the target function
+            reference_outputs: Reference outputs from the dataset
+
+        Returns:
+            Boolean indicating whether the response is accurate
+        """
+        start = time.perf_counter()
+        reference, response = reference_outputs["answer"], outputs["response"]
+        cached = self._cached(reference, response)
+        if cached is not None:
+            self._record(start, reference=reference)
+            return cached
+
+        completion = self.openai_client.chat.completions.create(
+            model=self.model,
+            messages=self.build_messages(reference, response),
+            response_format=self.response_format
+        )
+        self._record(start, completion, reference)
+        return self._parse(completion, reference, response)
+
+
+    async def agrade(self, outputs: dict, reference_outputs: dict) -> bool:
+        """
+        Grade a model response with the judge's AsyncOpenAI client.
+
+        Args:
+            outputs: Output from the target function
+            reference_outputs: Reference outputs from the dataset
+
+        Returns:
+            Boolean indicating whether the response is accurate
+        """
+        start = time.perf_counter()
+        reference, response = reference_outputs["answer"], outputs["response"]
+        cached = self._cached(reference, response)
+        if cached is not None:
+            self._record(start, reference=reference)
+            return cached
+
+        messages = self.build_messages(reference, response)
+
+        def create():
+            return self.openai_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format=self.response_format
+            )
+
+        call_stats = {}
+        if self.limiter is not None:
+            tokens = estimate_tokens(messages, max_output_tokens=GRADE_OUTPUT_TOKENS)
+            completion = await self.limiter.call(create, tokens, call_stats)
+        else:
+            completion = await create()
+        self._record(start, completion, reference, call_stats)
+        return self._parse(completion, reference, response)
+
+
+    def _format_pair(self, index: int, reference: str, response: str) -> str:
+        return f"""Pair {index}:
+            Ground Truth answer: {reference};
+            Student's Answer: {response}"""
+
+
+    def build_batch_messages(self, pairs: Sequence[Tuple[str, str]]) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for grading several pairs in one request.
+
+        Args:
+            pairs: (reference, response) pairs, graded by their position
+
+        Returns:
+            List of chat messages
+        """
+        return [
+            self._batch_system_message,
+            {"role": "user", "content": "\n\n".join(
+                self._format_pair(i, reference, response) for i, (reference, response) in enumerate(pairs)
+            )}
+        ]
+
+
+    def plan_batches(
+            self,
+            pairs: Sequence[Tuple[str, str]],
+            token_budget: int = JUDGE_BATCH_TOKEN_BUDGET,
+            max_size: int = JUDGE_BATCH_MAX_SIZE
+        ) -> List[List[int]]:
+        """
+        Split pairs into batches whose estimated prompt fits the token budget.
+
+        Args:
+            pairs: (reference, response) pairs
+            token_budget: Estimated prompt tokens allowed per request
+            max_size: Maximum pairs per request
+
+        Returns:
+            Lists of pair indices, one per request; a pair larger than the budget gets its own
+        """
+        base = estimate_tokens([self._batch_system_message], max_output_tokens=0)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        used = base
+        for i, (reference, response) in enumerate(pairs):
+            size = estimate_tokens([{"content": self._format_pair(i, reference, response)}], max_output_tokens=0)
+            if current and (used + size > token_budget or len(current) >= max_size):
+                batches.append(current)
+                current, used = [], base
+            current.append(i)
+            used += size
+        if current:
+            batches.append(current)
+        return batches
+
+
+    async def _agrade_one_batch(self, pairs: Sequence[Tuple[str, str]]) -> List[Optional[bool]]:
+        """
+        Grade pairs in one request; pairs missing from the response come back as None.
+        """
+        start = time.perf_counter()
+        messages = self.build_batch_messages(pairs)
+
+        def create():
+            return self.openai_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format=self.batch_response_format
+            )
+
+        tokens = estimate_tokens(messages, max_output_tokens=GRADE_OUTPUT_TOKENS * len(pairs))
+        call_stats = {}
+        completion = await (self.limiter.call(create, tokens, call_stats) if self.limiter is not None else create())
+        self.batch_calls += 1
+        self._record(start, completion, call_stats=call_stats, batch_size=len(pairs))
+        scores: List[Optional[bool]] = [None] * len(pairs)
+        content = completion.choices[0].message.content
+        try:
+            grades = BatchGrade.model_validate_json(content or "").grades
+        except ValueError:
+            return scores
+        for grade in grades:
+            if 0 <= grade.index < len(pairs):
+                scores[grade.index] = grade.score
+        return scores
+
+
+    async def agrade_batch(self, pairs: Sequence[Tuple[str, str]]) -> List[bool]:
+        """
+        Grade many (reference, response) pairs with as few requests as the token budget allows.
+
+        Pairs with a cached batch verdict are not sent. Pairs the batch response
+        leaves out or fails to parse are graded concurrently with agrade().
+
+        Args:
+            pairs: (reference, response) pairs
+
+        Returns:
+            Scores in the order of pairs
+        """
+        scores: List[Optional[bool]] = []
+        for reference, response in pairs:
+            start = time.perf_counter()
+            scores.append(self._cached(reference, response, batched=True))
+            if scores[-1] is not None:
+                self._record(start, reference=reference)
+        pending = [i for i, score in enumerate(scores) if score is None]
+        pending_pairs = [pairs[i] for i in pending]
+
+        batches = self.plan_batches(pending_pairs)
+        results = await asyncio.gather(
+            *(self._agrade_one_batch([pending_pairs[i] for i in batch]) for batch in batches),
+            return_exceptions=True
+        )
+        fallbacks = []
+        for batch, batch_scores in zip(batches, results):
+            if isinstance(batch_scores, BaseException):
+                batch_scores = [None] * len(batch)
+            for i, score in zip(batch, batch_scores):
+                reference, response = pending_pairs[i]
+                if score is None:
+                    fallbacks.append(i)
+                    continue
+                if self.cache is not None:
+                    self.cache.set("judge", self._cache_key(reference, response, batched=True), score)
+                scores[pending[i]] = score
+
+        self.batch_fallbacks += len(fallbacks)
+        fallback_scores = await asyncio.gather(*(
+            self.agrade({"response": pending_pairs[i][1]}, {"answer": pending_pairs[i][0]}) for i in fallbacks
+        ))
+        for i, score in zip(fallbacks, fallback_scores):
+            scores[pending[i]] = score
+        return scores
+
+
+    def evaluator(self):
+        """
+        Get a LangSmith evaluator function backed by this judge.
+
+        Returns:
+            Evaluator function named 'accuracy'
+        """
+        def accuracy(outputs: dict, reference_outputs: dict) -> bool:
+            return self.grade(outputs, reference_outputs)
+
+        return accuracy
+
+
+    def async_evaluator(self):
+        """
+        Get an async LangSmith evaluator function backed by this judge, for aevaluate.
+
+        Returns:
+            Async evaluator function named 'accuracy'
+        """
+        async def accuracy(outputs: dict, reference_outputs: dict) -> bool:
+            return await self.agrade(outputs, reference_outputs)
+
+        return accuracy
+
+
+class BatchingJudge:
+    """
+    Collects concurrent agrade() calls into batched judge requests.
+
+    Each call waits until its batch is full, by size or token budget, or until
+    max_wait has passed since the batch's first pair. It is meant for aevaluate,
+    where many examples are graded at once. grade() is not batched.
+    """
+
+    def __init__(
+            self,
+            judge: AccuracyJudge,
+            max_wait: float = JUDGE_BATCH_WAIT,
+            token_budget: int = JUDGE_BATCH_TOKEN_BUDGET,
+            max_size: int = JUDGE_BATCH_MAX_SIZE
+        ):
+        """
+        Initialize the BatchingJudge.
+
+        Args:
+            judge: Judge with an AsyncOpenAI client that grades the batches
+            max_wait: Seconds to wait for more pairs before sending a partial batch
+            token_budget: Estimated prompt tokens allowed per request
+            max_size: Maximum pairs per request
+        """
+        self.judge = judge
+        self.max_wait = max_wait
+        self.token_budget = token_budget
+        self.max_size = max_size
+        self._pending: List[Tuple[Tuple[str, str], asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches = set()
+
+
+    def grade(self, outputs: dict, reference_outputs: dict) -> bool:
+        return self.judge.grade(outputs, reference_outputs)
+
+
+    async def agrade(self, outputs: dict, reference_outputs: dict) -> bool:
+        """
+        Grade a model response as part of the next batch.
+
+        Args:
+            outputs: Output from the target function
+            reference_outputs: Reference outputs from the dataset
+
+        Returns:
+            Boolean indicating whether the response is accurate
+        """
+        start = time.perf_counter()
+        pair = (reference_outputs["answer"], outputs["response"])
+        cached = self.judge._cached(*pair, batched=True)
+        if cached is not None:
+            self.judge._record(start, reference=pair[0])
+            return cached
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((pair, future))
+        self._pending_tokens += estimate_tokens([{"content": self.judge._format_pair(0, *pair)}], max_output_tokens=0)
+        if len(self._pending) >= self.max_size or self._pending_tokens >= self.token_budget:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        if batch:
+            # Batches are tracked so they are not garbage collected while in flight
+            task = asyncio.ensure_future(self._grade(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+
+    async def _grade(self, batch: List[Tuple[Tuple[str, str], asyncio.Future]]) -> None:
+        try:
+            scores = await self.judge.agrade_batch([pair for pair, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Batch statistics for this process.
+
+        Returns:
+            Dictionary with batched requests sent and pairs that fell back to single grading
+        """
+        return {"batch_calls": self.judge.batch_calls, "fallbacks": self.judge.batch_fallbacks}
+
+
+    def evaluator(self):
+        return self.judge.evaluator()
+
+
+    def async_evaluator(self):
+        """
+        Get an async LangSmith evaluator function that grades in batches, for aevaluate.
+
+        Returns:
+            Async evaluator function named 'accuracy'
+        """
+        async def accuracy(outputs: dict, reference_outputs: dict) -> bool:
+            return await self.agrade(outputs, reference_outputs)
+
+        return accuracy
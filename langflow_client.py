@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from metrics import LANGFLOW_FORWARD_SECONDS, LANGFLOW_RESPONSES
+from resilience import ForwardLimiter, CircuitBreaker
+
+logger = logging.getLogger("webhook_handler")
+
+# Langflow API details
+LANGFLOW_API_URL = os.getenv("LANGFLOW_API_URL", "http://localhost:7860")  # Change to your Langflow URL
+LANGFLOW_INGEST_PATH = "/api/v1/webhook/email_ai_agent_ingest"
+
+# Connection pool and timeout settings (seconds)
+LANGFLOW_MAX_CONNECTIONS = int(os.getenv("LANGFLOW_MAX_CONNECTIONS", "100"))
+LANGFLOW_MAX_KEEPALIVE = int(os.getenv("LANGFLOW_MAX_KEEPALIVE", "20"))
+LANGFLOW_KEEPALIVE_EXPIRY = float(os.getenv("LANGFLOW_KEEPALIVE_EXPIRY", "30"))
+LANGFLOW_CONNECT_TIMEOUT = float(os.getenv("LANGFLOW_CONNECT_TIMEOUT", "5"))
+LANGFLOW_TIMEOUT = float(os.getenv("LANGFLOW_TIMEOUT", "10"))
+LANGFLOW_POOL_TIMEOUT = float(os.getenv("LANGFLOW_POOL_TIMEOUT", "5"))
+
+
+class LangflowClient:
+    """
+    A shared, connection-pooled async client for forwarding emails to Langflow.
+    """
+
+    def __init__(
+            self,
+            base_url: str = LANGFLOW_API_URL,
+            max_connections: int = LANGFLOW_MAX_CONNECTIONS,
+            max_keepalive: int = LANGFLOW_MAX_KEEPALIVE,
+            keepalive_expiry: float = LANGFLOW_KEEPALIVE_EXPIRY,
+            connect_timeout: float = LANGFLOW_CONNECT_TIMEOUT,
+            timeout: float = LANGFLOW_TIMEOUT,
+            pool_timeout: float = LANGFLOW_POOL_TIMEOUT,
+            limiter: Optional[ForwardLimiter] = None,
+            breaker: Optional[CircuitBreaker] = None
+        ):
+        """
+        Initialize the LangflowClient settings. The HTTP client itself is
+        created by start() so it can be bound to the running event loop.
+
+        Args:
+            base_url: Base URL of the Langflow instance
+            max_connections: Maximum number of concurrent connections in the pool
+            max_keepalive: Maximum number of idle keep-alive connections
+            keepalive_expiry: Seconds an idle keep-alive connection is kept open
+            connect_timeout: Seconds to wait for a connection to be established
+            timeout: Seconds to wait for reading/writing a response
+            pool_timeout: Seconds to wait for a free connection from the pool
+            limiter: Concurrency limit on forwards; defaults to one configured from the environment
+            breaker: Circuit breaker for Langflow failures; defaults to one configured from the environment
+        """
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(
+            timeout,
+            connect=connect_timeout,
+            pool=pool_timeout
+        )
+        self.limiter = limiter or ForwardLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[httpx.AsyncClient] = None
+
+
+    async def start(self) -> None:
+        """
+        Create the pooled HTTP client. Called once at application startup.
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+            logger.info("Langflow client started for %s", self.base_url)
+
+
+    async def close(self) -> None:
+        """
+        Close the pooled HTTP client and release its connections.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Langflow client closed")
+
+
+    async def forward(self, data: Dict[str, Any]) -> httpx.Response:
+        """
+        Forward filtered email data to the Langflow ingest webhook.
+
+        Args:
+            data: Filtered and cleaned email data
+
+        Returns:
+            The Langflow HTTP response
+
+        Raises:
+            CircuitOpen: If the circuit breaker is open
+            Overloaded: If too many forwards are in flight or waiting
+        """
+        if self._client is None:
+            raise RuntimeError("Langflow client is not started")
+
+        # Fail fast before queueing for a slot if Langflow is known to be down
+        self.breaker.check()
+        async with self.limiter.slot():
+            self.breaker.before_call()
+            start = time.perf_counter()
+            try:
+                response = await self._client.post(LANGFLOW_INGEST_PATH, json=data)
+            except asyncio.CancelledError:
+                self.breaker.abandon_call()
+                raise
+            except Exception:
+                LANGFLOW_RESPONSES.inc("error")
+                self.breaker.record_failure()
+                raise
+            finally:
+                LANGFLOW_FORWARD_SECONDS.observe(time.perf_counter() - start)
+
+        LANGFLOW_RESPONSES.inc(response.status_code)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
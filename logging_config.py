@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+# Logging settings
+LOG_LEVEL = os.getenv("WEBHOOK_LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("WEBHOOK_LOG_FILE", "webhook.log")
+LOG_ROTATION = os.getenv("WEBHOOK_LOG_ROTATION", "size").lower()  # "size" or "time"
+LOG_MAX_BYTES = int(os.getenv("WEBHOOK_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("WEBHOOK_LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("WEBHOOK_LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_ENABLED = os.getenv("WEBHOOK_LOG_QUEUE", "true").lower() in ("1", "true", "yes")
+LOG_QUEUE_SIZE = int(os.getenv("WEBHOOK_LOG_QUEUE_SIZE", "10000"))
+# Fraction of requests whose payloads are logged at INFO; DEBUG logs every payload
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("WEBHOOK_LOG_PAYLOAD_SAMPLE_RATE", "0"))
+# Maximum INFO/DEBUG records per request; warnings and errors are always logged
+LOG_REQUEST_BUDGET = int(os.getenv("WEBHOOK_LOG_REQUEST_BUDGET", "20"))
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_log_budget: ContextVar[Optional[int]] = ContextVar("log_budget", default=None)
+
+
+class LazyJSON:
+    """
+    Defers serialising a payload until a log record is actually formatted,
+    and then uses compact JSON instead of indent=2.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class RequestLogBudget(logging.Filter):
+    """
+    Drops INFO and DEBUG records once the current request has used up its log budget.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        # The same record passes every handler; only charge the budget once
+        decision = getattr(record, "_within_log_budget", None)
+        if decision is not None:
+            return decision
+        remaining = _log_budget.get()
+        if remaining is None:
+            decision = True
+        elif remaining <= 0:
+            self.dropped += 1
+            decision = False
+        else:
+            _log_budget.set(remaining - 1)
+            decision = True
+        record._within_log_budget = decision
+        return decision
+
+
+class _ThreadQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for an in-process listener thread. The stock prepare() formats
+    every record on the calling thread so it can be pickled; records never leave
+    this process, so formatting (including LazyJSON payloads) is left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Shed log records rather than block the event loop
+            request_log_budget.dropped += 1
+
+
+request_log_budget = RequestLogBudget()
+
+
+def start_request_log_budget(budget: int = LOG_REQUEST_BUDGET) -> None:
+    """
+    Reset the log budget for the current request. Call at the start of each request handler.
+
+    Args:
+        budget: Number of INFO/DEBUG records the request may emit; 0 or less disables the budget
+    """
+    _log_budget.set(budget if budget > 0 else None)
+
+
+def should_log_payload(logger: logging.Logger) -> bool:
+    """
+    Decide whether to log a full payload: always at DEBUG, otherwise for a sampled fraction of requests.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        return True
+    return LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+
+
+def _file_handler() -> logging.Handler:
+    if LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    return logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+
+
+def configure_logging() -> Optional[logging.handlers.QueueListener]:
+    """
+    Configure root logging to a rotating file and stdout.
+
+    With the queue enabled, the event loop thread only enqueues records and a
+    listener thread does the formatting and I/O.
+
+    Like logging.basicConfig, this does nothing if the root logger already has handlers.
+
+    Returns:
+        The started QueueListener, or None if logging is synchronous or already configured
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = [
+        _file_handler(),                    # Log to a rotating file
+        logging.StreamHandler(sys.stdout)   # Also log to console
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root.setLevel(LOG_LEVEL)
+
+    if not LOG_QUEUE_ENABLED:
+        for handler in handlers:
+            handler.addFilter(request_log_budget)
+            root.addHandler(handler)
+        return None
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = _ThreadQueueHandler(log_queue)
+    queue_handler.addFilter(request_log_budget)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
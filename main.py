@@ -1,48 +1,304 @@
-from langsmith import wrappers, Client
-from pydantic import BaseModel, Field
+import os
+import time
+import uuid
+import asyncio
+import argparse
+import contextlib
+
+from langsmith import wrappers, Client, aevaluate
 from openai import OpenAI
+from checkpoint import RunJournal
+from dataset_cache import DatasetMetadataCache
+from dataset_sources import default_registry
 from dataset_manager import DatasetManager
+from eval_report import (
+    EVAL_REPORT_DIR, CallLog, UsageMeter, format_call_summary, format_summary, summarize_records, summarize_results
+)
+from offline import InMemoryClient, StubServer, format_profile, profile_harness
+from judge import JUDGE_BATCHING, AccuracyJudge, BatchingJudge
+from pre_grader import PREGRADE_ENABLED, TieredJudge
+from rate_limit import EVAL_MAX_IN_FLIGHT, RateLimiter, estimate_tokens
+from response_cache import ResponseCache, cache_key
 
+TARGET_MODEL = "gpt-4o-mini"
+TARGET_SYSTEM_PROMPT = "Answer the following question accurately"
 
-def main():
-    # Initialize clients
-    client = Client()
-    openai_client = wrappers.wrap_openai(OpenAI())
+# "async" runs the rate-limited aevaluate pipeline; "sync" runs client.evaluate
+EVAL_MODE = os.getenv("EVAL_MODE", "sync")
+# Reuse the ID of an interrupted run to resume it
+EVAL_RUN_ID = os.getenv("EVAL_RUN_ID")
 
-    dataset_manager = DatasetManager(client)
-    dataset_manager.create_dataset_from_examples(
-        dataset_name="Coding Dataset",
-        dataset_type="coding",
-        description="A dataset with coding questions and answers."
-    )
+EXPERIMENT_PREFIX = "langsmith-evaluation"
 
-    # Run evaluation on the general knowledge dataset
-    run_evaluation(
-        client=client,
-        openai_client=openai_client,
-        dataset_name="Coding Dataset"
-    )
+
+def dataset_name_for(category: str) -> str:
+    """
+    LangSmith dataset name of a predefined category, e.g. "coding" -> "Coding Dataset".
+    """
+    return f"{category.replace('_', ' ').title()} Dataset"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    categories = list(default_registry())
+    parser = argparse.ArgumentParser(description="Provision and evaluate predefined datasets")
+    parser.add_argument("--datasets", default="coding",
+                        help=f"Comma-separated categories or 'all' (available: {', '.join(categories)})")
+    parser.add_argument("--mode", choices=("async", "sync"), default=EVAL_MODE,
+                        help="async evaluates the categories concurrently; sync evaluates them one at a time")
+    parser.add_argument("--max-concurrency", type=int, default=EVAL_MAX_IN_FLIGHT,
+                        help="Model calls in flight across all categories (async mode)")
+    parser.add_argument("--run-id",
+                        help="Run ID to start or resume; each category is journaled as <run-id>-<category>")
+    parser.add_argument("--refresh-datasets", action="store_true",
+                        help="Ignore cached dataset metadata and check every dataset with the API")
+    parser.add_argument("--offline", action="store_true",
+                        help="Use a local OpenAI stub and an in-memory LangSmith client instead of the real services")
+    parser.add_argument("--stub-latency-ms", type=float, default=0, help="Stub model latency (offline mode)")
+    parser.add_argument("--stub-jitter-ms", type=float, default=0, help="Stub model latency jitter (offline mode)")
+    parser.add_argument("--stub-port", type=int, default=7862, help="Port of the stub model server (offline mode)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Report the harness's own overhead per example (offline mode)")
+    args = parser.parse_args(argv)
+    if args.profile and not args.offline:
+        parser.error("--profile requires --offline")
+    # An offline run's experiment lives in memory, so there is nothing for a later process to resume
+    if args.run_id and args.offline:
+        parser.error("--run-id can't be used with --offline")
+    if not args.offline:
+        args.run_id = args.run_id or EVAL_RUN_ID
+    args.categories = categories if args.datasets == "all" else [c.strip() for c in args.datasets.split(",")]
+    unknown = [c for c in args.categories if c not in categories]
+    if unknown:
+        parser.error(f"unknown categories {', '.join(unknown)}; available: {', '.join(categories)}")
+    return args
+
+
+def provision_datasets(client, categories, metadata_cache=None, refresh=False) -> None:
+    """
+    Create the dataset of each category, with its predefined examples, if it doesn't exist.
+    
+    Datasets whose cached metadata shows them in sync are skipped without API calls,
+    unless refresh is set.
+    """
+    dataset_manager = DatasetManager(client, metadata_cache)
+    if refresh:
+        dataset_manager.invalidate_cache()
+    for category in categories:
+        dataset_manager.create_dataset_from_examples(
+            dataset_name=dataset_name_for(category),
+            dataset_type=category,
+            description=f"A dataset with {category.replace('_', ' ')} questions and answers."
+        )
 
 
-def target(inputs: dict, openai_client=None) -> dict:
+def summarize_category(category, rows, meter, run_id=None) -> dict:
+    """
+    Summarize a category's evaluation.
+    
+    A journaled run is summarized from its journal, so a resumed run covers the
+    examples and usage of earlier attempts too, not just the rows evaluated now.
+    
+    Returns:
+        Summary of the category
+    """
+    if not run_id:
+        return summarize_results(rows, meter)
+    journal = RunJournal(f"{run_id}-{category}")
+    journal.close()
+    total = UsageMeter()
+    for usage in journal.usage:
+        total.merge(usage)
+    return summarize_records(journal.completed.values(), total)
+
+
+async def evaluate_categories(client, categories, run_id, cache, limiter, openai_options=None, call_log=None) -> dict:
+    """
+    Evaluate several categories concurrently under one limiter, and so one global
+    concurrency and rate budget.
+    
+    Returns:
+        Summary per category
+    """
+    openai_client = wrappers.wrap_openai(limiter.async_openai_client(**(openai_options or {})))
+
+    async def evaluate_category(category):
+        meter = UsageMeter(category, call_log)
+        results = await run_evaluation_async(
+            client=client,
+            openai_client=openai_client,
+            dataset_name=dataset_name_for(category),
+            cache=cache,
+            limiter=limiter,
+            # The limiter, not each experiment, bounds the calls in flight
+            max_concurrency=limiter.max_in_flight,
+            run_id=f"{run_id}-{category}" if run_id else None,
+            meter=meter
+        )
+        rows = [row async for row in results] if results is not None else []
+        return category, summarize_category(category, rows, meter, run_id)
+
+    return dict(await asyncio.gather(*(evaluate_category(category) for category in categories)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if args.offline:
+            # Nothing leaves the machine: a stub serves the models and LangSmith lives in memory
+            stub = stack.enter_context(StubServer(args.stub_port, args.stub_latency_ms, args.stub_jitter_ms))
+            client = InMemoryClient()
+            openai_options = {"api_key": "offline", "base_url": stub.base_url}
+            # Stub answers and in-memory datasets must never land in the real caches
+            cache = ResponseCache(":memory:")
+            metadata_cache = DatasetMetadataCache(":memory:")
+        else:
+            # Initialize clients
+            client = Client()
+            openai_options = {}
+            # Cache target responses and judge verdicts across runs
+            cache = ResponseCache()
+            metadata_cache = DatasetMetadataCache()
+
+        provision_datasets(client, args.categories, metadata_cache, args.refresh_datasets)
+
+        # Completed examples are journaled under the run ID so an interrupted run can resume
+        run_id = None
+        if not args.offline:
+            run_id = args.run_id or new_run_id()
+            print(f"Run ID: {run_id} (pass --run-id {run_id} to resume it)")
+
+        # Every target and judge call is reported per dataset and stage
+        report_path = None
+        if EVAL_REPORT_DIR:
+            report_path = os.path.join(EVAL_REPORT_DIR, f"{run_id or new_run_id()}.calls.jsonl")
+        call_log = stack.enter_context(contextlib.closing(CallLog(report_path)))
+
+        start = time.perf_counter()
+        if args.mode == "async":
+            limiter = RateLimiter(max_in_flight=args.max_concurrency)
+            summaries = asyncio.run(evaluate_categories(
+                client, args.categories, run_id, cache, limiter, openai_options, call_log
+            ))
+        else:
+            openai_client = wrappers.wrap_openai(OpenAI(**openai_options))
+            summaries = {}
+            for category in args.categories:
+                meter = UsageMeter(category, call_log)
+                results = run_evaluation(
+                    client=client,
+                    openai_client=openai_client,
+                    dataset_name=dataset_name_for(category),
+                    cache=cache,
+                    run_id=f"{run_id}-{category}" if run_id else None,
+                    meter=meter
+                )
+                summaries[category] = summarize_category(
+                    category, results if results is not None else [], meter, run_id
+                )
+        elapsed = time.perf_counter() - start
+
+        print(format_summary(summaries))
+        print(format_call_summary(call_log.summarize()))
+        if report_path:
+            summary_path = report_path.replace(".calls.jsonl", ".summary.json")
+            call_log.write_summary(summary_path)
+            print(f"Call report: {report_path} (summary {summary_path})")
+        print(f"Cache stats: {cache.stats()}")
+        if args.offline:
+            examples = sum(summary["examples"] for summary in summaries.values())
+            print(f"Offline run: {examples} examples in {elapsed:.2f}s, stub stats {stub.stats()}")
+            if args.profile:
+                print(format_profile(profile_harness(stub.base_url)))
+
+
+def target(inputs: dict, openai_client=None, cache: ResponseCache = None, meter: UsageMeter = None) -> dict:
     """
     Target function for evaluation.
     
     Args:
         inputs: Input dictionary with a question
         openai_client: OpenAI client
+        cache: Optional cache of responses keyed by model, system prompt and question
+        meter: Optional UsageMeter that accumulates token usage and records the call
         
     Returns:
         Dictionary with the model's response
     """
+    start = time.perf_counter()
+    if cache is not None:
+        key = cache_key("target", TARGET_MODEL, TARGET_SYSTEM_PROMPT, inputs["question"])
+        cached = cache.get("target", key)
+        if cached is not None:
+            if meter is not None:
+                meter.record_call("target", TARGET_MODEL, time.perf_counter() - start,
+                                  cache_hit=True, input_text=inputs["question"])
+            return {"response": cached}
+
     response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Answer the following question accurately"},
-            {"role": "user", "content": inputs["question"]},
-        ]
+        model=TARGET_MODEL,
+        messages=_target_messages(inputs["question"])
     )
-    return {"response": response.choices[0].message.content.strip()}
+    if meter is not None:
+        meter.record_call("target", TARGET_MODEL, time.perf_counter() - start, response.usage,
+                          input_text=inputs["question"])
+    content = response.choices[0].message.content.strip()
+
+    if cache is not None:
+        cache.set("target", key, content)
+    return {"response": content}
+
+
+def _target_messages(question: str) -> list:
+    return [
+        {"role": "system", "content": TARGET_SYSTEM_PROMPT},
+        {"role": "user", "content": question},
+    ]
+
+
+async def atarget(inputs: dict, openai_client=None, cache: ResponseCache = None,
+                  limiter: RateLimiter = None, meter: UsageMeter = None) -> dict:
+    """
+    Async target function for evaluation.
+    
+    Args:
+        inputs: Input dictionary with a question
+        openai_client: AsyncOpenAI client
+        cache: Optional cache of responses keyed by model, system prompt and question
+        limiter: Optional RateLimiter that schedules and retries the call
+        meter: Optional UsageMeter that accumulates token usage and records the call
+        
+    Returns:
+        Dictionary with the model's response
+    """
+    start = time.perf_counter()
+    if cache is not None:
+        key = cache_key("target", TARGET_MODEL, TARGET_SYSTEM_PROMPT, inputs["question"])
+        cached = cache.get("target", key)
+        if cached is not None:
+            if meter is not None:
+                meter.record_call("target", TARGET_MODEL, time.perf_counter() - start,
+                                  cache_hit=True, input_text=inputs["question"])
+            return {"response": cached}
+
+    messages = _target_messages(inputs["question"])
+
+    def create():
+        return openai_client.chat.completions.create(model=TARGET_MODEL, messages=messages)
+
+    call_stats = {}
+    if limiter is not None:
+        response = await limiter.call(create, estimate_tokens(messages), call_stats)
+    else:
+        response = await create()
+    if meter is not None:
+        meter.record_call("target", TARGET_MODEL, time.perf_counter() - start, response.usage,
+                          call_stats=call_stats, input_text=inputs["question"])
+    content = response.choices[0].message.content.strip()
+
+    if cache is not None:
+        cache.set("target", key, content)
+    return {"response": content}
 
 
 def accuracy(outputs: dict, reference_outputs: dict) -> bool:
@@ -56,35 +312,82 @@ def accuracy(outputs: dict, reference_outputs: dict) -> bool:
     Returns:
         Boolean indicating whether the response is accurate
     """
-    # Define instructions for the LLM judge evaluator
-    instructions = """
-    Evaluate Student Answer against Ground Truth for conceptual similarity and classify true or false:
-    - False: No conceptual match and similarity
-    - True: Most or full conceptual match and similarity
-    - Key criteria: Concept should match, not exact wording.
+    return get_default_judge().grade(outputs, reference_outputs)
+
+
+_default_judge = None
+
+
+def get_default_judge() -> AccuracyJudge:
+    """
+    Get the judge shared by calls to accuracy(), creating it on first use.
+    
+    Returns:
+        The shared AccuracyJudge
     """
+    global _default_judge
+    if _default_judge is None:
+        _default_judge = AccuracyJudge()
+    return _default_judge
 
-    # Define output schema for the LLM judge
-    class Grade(BaseModel):
-        score: bool = Field(
-            description="Boolean that indicates whether the response is accurate relative to the reference answer"
-        )
 
-    # Use OpenAI to evaluate
-    openai_client = wrappers.wrap_openai(OpenAI())
-    response = openai_client.beta.chat.completions.parse(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": instructions},
-            {"role": "user", "content": f"""Ground Truth answer: {reference_outputs["answer"]};
-            Student's Answer: {outputs["response"]}"""}
-        ],
-        response_format=Grade
-    )
-    return response.choices[0].message.parsed.score
+def make_grader(judge):
+    """
+    Put the deterministic pre-grader in front of a judge when PREGRADE_ENABLED is set.
+    
+    Args:
+        judge: AccuracyJudge or BatchingJudge, or an already tiered judge
+        
+    Returns:
+        The grader whose evaluator is used for the experiment
+    """
+    if PREGRADE_ENABLED and not isinstance(judge, TieredJudge):
+        return TieredJudge(judge)
+    return judge
+
+
+def print_grader_stats(grader):
+    if isinstance(grader, TieredJudge):
+        print(f"Grading tiers: {grader.stats()}")
+        grader = grader.judge
+    if isinstance(grader, BatchingJudge):
+        print(f"Batch judging: {grader.stats()}")
+
 
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
 
-def run_evaluation(client, openai_client, dataset_name):
+
+def experiment_options(client, dataset_name, run_id, evaluator):
+    """
+    Build the data and experiment arguments for an evaluation, checkpointed when a run ID is given.
+    
+    Args:
+        client: LangSmith client
+        dataset_name: Name of the dataset to evaluate
+        run_id: Run ID for the journal, or None for an unjournaled run
+        evaluator: Evaluator to checkpoint
+        
+    Returns:
+        (evaluate keyword arguments, journal or None, (run, example) pairs of a resumed
+        run whose runs still need grading); the arguments are None when the run has
+        no examples left to evaluate
+    """
+    if not run_id:
+        return {"data": dataset_name, "evaluators": [evaluator], "experiment_prefix": EXPERIMENT_PREFIX}, None, []
+
+    journal = RunJournal(run_id)
+    experiment, examples, ungraded = journal.prepare(client, dataset_name, EXPERIMENT_PREFIX)
+    if journal.resumed and (journal.completed or ungraded):
+        print(f"Resuming run {run_id}: {len(journal.completed)} examples done, {len(ungraded)} to grade, "
+              f"{len(examples)} remaining")
+    if not examples:
+        return None, journal, ungraded
+    options = {"data": examples, "evaluators": [journal.checkpointed(evaluator)], "experiment": experiment}
+    return options, journal, ungraded
+
+
+def run_evaluation(client, openai_client, dataset_name, judge=None, cache=None, run_id=None, meter=None):
     """
     Run evaluation on a dataset.
     
@@ -92,24 +395,109 @@ def run_evaluation(client, openai_client, dataset_name):
         client: LangSmith client
         openai_client: OpenAI client
         dataset_name: Name of the dataset to evaluate
+        judge: AccuracyJudge or TieredJudge shared by every example. If None, one is
+            created that reuses openai_client and cache.
+        cache: Optional ResponseCache for target responses and judge verdicts
+        run_id: Journal finished examples under this ID; rerunning with the same ID
+            evaluates only the remaining examples into the same experiment
+        meter: Optional UsageMeter for the token usage and call records of the target and a created judge
     """
     # Create a wrapper for the target function that includes the OpenAI client
     def target_with_client(inputs: dict) -> dict:
-        return target(inputs, openai_client)
+        return target(inputs, openai_client, cache, meter)
+
+    # One judge, with one pooled client and prebuilt schema, grades every example
+    judge = judge or AccuracyJudge(openai_client, cache=cache, meter=meter)
+    # Clear-cut answers are graded locally; only ambiguous ones reach the judge
+    grader = make_grader(judge)
+
+    evaluator = grader.evaluator()
+    options, journal, ungraded = experiment_options(client, dataset_name, run_id, evaluator)
 
     # Run the evaluation
-    experiment_results = client.evaluate(
-        target_with_client,
-        data=dataset_name,
-        evaluators=[
-            accuracy,
-            # can add multiple evaluators here
-        ],
-        experiment_prefix="langsmith-evaluation",
-        max_concurrency=2,
-    )
+    try:
+        if ungraded:
+            # Their target ran before the interruption; only the grading is missing
+            journal.grade_ungraded(client, evaluator, ungraded)
+        if options is None:
+            print(f"Run {run_id} already finished.")
+            return None
+        experiment_results = client.evaluate(
+            target_with_client,
+            max_concurrency=2,
+            **options
+        )
+    finally:
+        if journal is not None:
+            if meter is not None:
+                journal.record_usage(meter.usage)
+            journal.close()
 
     print("Evaluation complete. View results in LangSmith.")
+    print_grader_stats(grader)
+    return experiment_results
+
+
+async def run_evaluation_async(client, openai_client, dataset_name, judge=None, cache=None,
+                               limiter=None, max_concurrency=None, run_id=None,
+                               meter=None):
+    """
+    Run evaluation on a dataset with async target and judge calls.
+    
+    Examples are processed concurrently, so one example's judge call overlaps
+    with other examples' target calls. The limiter keeps all calls within the
+    provider's requests/min and tokens/min quotas.
+    
+    Args:
+        client: LangSmith client
+        openai_client: AsyncOpenAI client, ideally from limiter.async_openai_client()
+        dataset_name: Name of the dataset to evaluate
+        judge: AccuracyJudge, BatchingJudge or TieredJudge with an AsyncOpenAI client.
+            If None, one is created that reuses openai_client, cache and limiter, and
+            batches its requests when JUDGE_BATCHING is set.
+        cache: Optional ResponseCache for target responses and judge verdicts
+        limiter: RateLimiter shared by the target and judge. If None, one is created
+            from the EVAL_* settings.
+        max_concurrency: Maximum examples in flight. If None, the limiter's max_in_flight.
+        run_id: Journal finished examples under this ID; rerunning with the same ID
+            evaluates only the remaining examples into the same experiment
+        meter: Optional UsageMeter for the token usage and call records of the target and a created judge
+    """
+    limiter = limiter or RateLimiter()
+
+    async def target_with_client(inputs: dict) -> dict:
+        return await atarget(inputs, openai_client, cache, limiter, meter)
+
+    judge = judge or AccuracyJudge(openai_client, cache=cache, limiter=limiter, meter=meter)
+    if JUDGE_BATCHING and isinstance(judge, AccuracyJudge):
+        # Concurrent examples share judge requests, paying the instructions once per batch
+        judge = BatchingJudge(judge)
+    grader = make_grader(judge)
+
+    evaluator = grader.async_evaluator()
+    options, journal, ungraded = experiment_options(client, dataset_name, run_id, evaluator)
+
+    try:
+        if ungraded:
+            # Their target ran before the interruption; only the grading is missing
+            await journal.agrade_ungraded(client, evaluator, ungraded)
+        if options is None:
+            print(f"Run {run_id} already finished.")
+            return None
+        experiment_results = await aevaluate(
+            target_with_client,
+            max_concurrency=max_concurrency or limiter.max_in_flight,
+            client=client,
+            **options
+        )
+    finally:
+        if journal is not None:
+            if meter is not None:
+                journal.record_usage(meter.usage)
+            journal.close()
+
+    print(f"Evaluation complete ({limiter.retries} retries). View results in LangSmith.")
+    print_grader_stats(grader)
     return experiment_results
 
 if __name__ == "__main__":
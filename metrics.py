@@ -0,0 +1,217 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Payload size buckets in bytes
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    A monotonically increasing counter, optionally read from a callback at scrape time.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, callback: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def render(self) -> List[str]:
+        value = self.value
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class LabeledCounter:
+    """
+    A counter split by the value of a single label, e.g. HTTP status code.
+    Values are keyed directly on the label value, so incrementing allocates nothing.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, label: str):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values: Dict[Hashable, float] = {}
+
+    def inc(self, label_value: Hashable, amount: float = 1) -> None:
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f'{self.name}{{{self.label}="{label_value}"}} {_format_value(value)}'
+            for label_value, value in sorted(self.values.items(), key=lambda item: str(item[0]))
+        ]
+
+
+class Gauge:
+    """
+    A value that goes up and down, or is read from a callback at scrape time.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, callback: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.callback = callback
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> List[str]:
+        value = self.value
+        if self.callback is not None:
+            try:
+                value = self.callback()
+            except Exception:
+                return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram:
+    """
+    A histogram with preallocated buckets. observe() is a bisect and two additions;
+    cumulative bucket counts are only computed when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        """
+        Context manager that observes the elapsed time of its block in seconds.
+        """
+        return _Timer(self)
+
+    def render(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {repr(self.sum)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and renders them in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, callback: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, description, callback))
+
+    def labeled_counter(self, name: str, description: str, label: str) -> LabeledCounter:
+        return self.register(LabeledCounter(name, description, label))
+
+    def gauge(self, name: str, description: str, callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, description, callback))
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Webhook request metrics
+WEBHOOK_REQUESTS = registry.labeled_counter(
+    "webhook_requests_total", "Webhook requests by outcome", "outcome")
+WEBHOOK_IN_FLIGHT = registry.gauge(
+    "webhook_requests_in_flight", "Webhook requests currently being handled")
+WEBHOOK_REQUEST_SECONDS = registry.histogram(
+    "webhook_request_seconds", "Total time spent handling a webhook request")
+BODY_READ_SECONDS = registry.histogram(
+    "webhook_body_read_seconds", "Time spent reading the request body")
+BODY_BYTES = registry.histogram(
+    "webhook_body_bytes", "Size of webhook request bodies in bytes", SIZE_BUCKETS)
+PARSE_SECONDS = registry.histogram(
+    "webhook_parse_seconds", "Time spent extracting the email fields from the body")
+PARSE_FALLBACKS = registry.counter(
+    "webhook_parse_fallbacks_total", "Bodies that needed a full JSON parse instead of the fast path")
+JSON_REPAIRS = registry.counter(
+    "webhook_json_repairs_total", "Bodies that needed repair_json to parse")
+SANITIZE_SECONDS = registry.histogram(
+    "webhook_sanitize_seconds", "Time spent cleaning and truncating the email fields")
+DEDUP_DUPLICATES = registry.counter(
+    "webhook_duplicates_total", "Redelivered webhooks dropped by deduplication")
+FORWARD_MESSAGE_CHARS = registry.histogram(
+    "webhook_forward_message_chars", "Length of messageText forwarded to Langflow", SIZE_BUCKETS)
+
+# Langflow forwarding metrics
+LANGFLOW_FORWARD_SECONDS = registry.histogram(
+    "langflow_forward_seconds", "Latency of forwarding an email to Langflow")
+LANGFLOW_RESPONSES = registry.labeled_counter(
+    "langflow_responses_total", "Langflow responses by HTTP status code, or 'error' for transport errors", "status")
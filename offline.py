@@ -0,0 +1,443 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import datetime
+import threading
+import subprocess
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+from langsmith import Client, aevaluate, tracing_context, wrappers
+from langsmith.schemas import Dataset, Example, Feedback, Run, TracerSession
+from openai import AsyncOpenAI, OpenAI
+from openai.types.chat import ChatCompletion
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OPENAI_STUB = os.path.join(ROOT, "benchmarks", "openai_stub.py")
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class InMemoryClient(Client):
+    """
+    A LangSmith Client stand-in that keeps datasets, examples, experiments, runs and
+    feedback in memory, so evaluations run without a LangSmith account or network.
+
+    Only the calls made by this repository's dataset and evaluation code are
+    implemented; everything else behaves like a Client pointed at an unreachable server.
+    """
+
+    def __init__(self):
+        super().__init__(api_url="http://langsmith.offline.invalid", api_key="offline", auto_batch_tracing=False)
+        self._lock = threading.Lock()
+        self.stored_datasets: Dict[uuid.UUID, Dataset] = {}
+        self.stored_examples: Dict[uuid.UUID, Example] = {}
+        self.stored_projects: Dict[str, TracerSession] = {}
+        self.stored_runs: Dict[str, Dict[str, Any]] = {}
+        self.stored_feedback: List[Dict[str, Any]] = []
+
+
+    # Datasets
+
+    def create_dataset(self, dataset_name: str, *, description: Optional[str] = None, **kwargs: Any) -> Dataset:
+        dataset = Dataset(
+            id=uuid.uuid4(), name=dataset_name, description=description,
+            created_at=_now(), modified_at=_now(), tenant_id=uuid.UUID(int=0)
+        )
+        with self._lock:
+            self.stored_datasets[dataset.id] = dataset
+        return dataset
+
+
+    def list_datasets(self, *, dataset_name: Optional[str] = None, dataset_name_contains: Optional[str] = None,
+                      limit: Optional[int] = None, **kwargs: Any) -> Iterator[Dataset]:
+        matches = [
+            dataset for dataset in list(self.stored_datasets.values())
+            if (dataset_name is None or dataset.name == dataset_name)
+            and (dataset_name_contains is None or dataset_name_contains in dataset.name)
+        ]
+        return iter(matches[:limit] if limit else matches)
+
+
+    def read_dataset(self, *, dataset_name: Optional[str] = None, dataset_id: Optional[Any] = None) -> Dataset:
+        for dataset in list(self.stored_datasets.values()):
+            if dataset.name == dataset_name or (dataset_id is not None and str(dataset.id) == str(dataset_id)):
+                return dataset
+        raise ValueError(f"Dataset {dataset_name or dataset_id} not found")
+
+
+    def has_dataset(self, *, dataset_name: Optional[str] = None, dataset_id: Optional[Any] = None) -> bool:
+        try:
+            self.read_dataset(dataset_name=dataset_name, dataset_id=dataset_id)
+            return True
+        except ValueError:
+            return False
+
+
+    def create_examples(self, *, dataset_name: Optional[str] = None, dataset_id: Optional[Any] = None,
+                        examples: Optional[Sequence[Any]] = None, inputs: Optional[Sequence[dict]] = None,
+                        outputs: Optional[Sequence[Optional[dict]]] = None,
+                        metadata: Optional[Sequence[Optional[dict]]] = None,
+                        ids: Optional[Sequence[Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        dataset = self.read_dataset(dataset_name=dataset_name, dataset_id=dataset_id)
+        if examples is None:
+            examples = [
+                {
+                    "inputs": example_inputs,
+                    "outputs": outputs[i] if outputs else None,
+                    "metadata": metadata[i] if metadata else None,
+                    "id": ids[i] if ids else None,
+                }
+                for i, example_inputs in enumerate(inputs or [])
+            ]
+        created = []
+        with self._lock:
+            for item in examples:
+                item = item if isinstance(item, dict) else item.model_dump()
+                example = Example(
+                    id=uuid.UUID(str(item.get("id") or uuid.uuid4())),
+                    dataset_id=dataset.id,
+                    inputs=item.get("inputs") or {},
+                    outputs=item.get("outputs"),
+                    metadata=item.get("metadata"),
+                    created_at=_now(),
+                    modified_at=_now(),
+                )
+                self.stored_examples[example.id] = example
+                created.append(str(example.id))
+        return {"count": len(created), "example_ids": created}
+
+
+    def list_examples(self, dataset_id: Optional[Any] = None, dataset_name: Optional[str] = None,
+                      example_ids: Optional[Sequence[Any]] = None, offset: int = 0,
+                      limit: Optional[int] = None, **kwargs: Any) -> Iterator[Example]:
+        if dataset_id is None and dataset_name is not None:
+            dataset_id = self.read_dataset(dataset_name=dataset_name).id
+        wanted = {str(i) for i in example_ids} if example_ids is not None else None
+        matches = [
+            example for example in list(self.stored_examples.values())
+            if (dataset_id is None or str(example.dataset_id) == str(dataset_id))
+            and (wanted is None or str(example.id) in wanted)
+        ]
+        matches = matches[offset:]
+        return iter(matches[:limit] if limit else matches)
+
+
+    def update_examples(self, *, dataset_name: Optional[str] = None, dataset_id: Optional[Any] = None,
+                        updates: Optional[Sequence[Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        updated = []
+        with self._lock:
+            for item in updates or []:
+                item = item if isinstance(item, dict) else item.model_dump(exclude_none=True)
+                example_id = uuid.UUID(str(item["id"]))
+                fields = {k: v for k, v in item.items() if k in ("inputs", "outputs", "metadata") and v is not None}
+                self.stored_examples[example_id] = self.stored_examples[example_id].model_copy(
+                    update=dict(fields, modified_at=_now())
+                )
+                updated.append(str(example_id))
+        return {"message": f"{len(updated)} examples updated", "count": len(updated), "example_ids": updated}
+
+
+    def delete_examples(self, example_ids: Sequence[Any], **kwargs: Any) -> None:
+        with self._lock:
+            for example_id in example_ids:
+                self.stored_examples.pop(uuid.UUID(str(example_id)), None)
+
+
+    # Experiments and runs
+
+    def create_project(self, project_name: str, *, description: Optional[str] = None,
+                       metadata: Optional[dict] = None, reference_dataset_id: Optional[Any] = None,
+                       **kwargs: Any) -> TracerSession:
+        project = TracerSession(
+            id=uuid.uuid4(), name=project_name, description=description, start_time=_now(),
+            extra={"metadata": metadata or {}}, reference_dataset_id=reference_dataset_id,
+            tenant_id=uuid.UUID(int=0)
+        )
+        with self._lock:
+            self.stored_projects[project_name] = project
+        return project
+
+
+    def read_project(self, *, project_id: Optional[str] = None, project_name: Optional[str] = None,
+                     **kwargs: Any) -> TracerSession:
+        for project in list(self.stored_projects.values()):
+            if project.name == project_name or (project_id is not None and str(project.id) == str(project_id)):
+                return project
+        raise ValueError(f"Project {project_name or project_id} not found")
+
+
+    def has_project(self, project_name: str, *, project_id: Optional[str] = None) -> bool:
+        try:
+            self.read_project(project_name=project_name, project_id=project_id)
+            return True
+        except ValueError:
+            return False
+
+
+    def update_project(self, project_id: Any, **kwargs: Any) -> TracerSession:
+        return self.read_project(project_id=project_id)
+
+
+    def create_run(self, name: str, inputs: dict, run_type: str, **kwargs: Any) -> None:
+        run_id = str(kwargs.get("id") or uuid.uuid4())
+        with self._lock:
+            self.stored_runs[run_id] = dict(kwargs, name=name, inputs=inputs, run_type=run_type)
+
+
+    def update_run(self, run_id: Any, **kwargs: Any) -> None:
+        with self._lock:
+            self.stored_runs.setdefault(str(run_id), {}).update(kwargs)
+
+
+    def batch_ingest_runs(self, create: Optional[Sequence[Any]] = None, update: Optional[Sequence[Any]] = None,
+                          **kwargs: Any) -> None:
+        for run in list(create or []) + list(update or []):
+            run = run if isinstance(run, dict) else run.dict()
+            with self._lock:
+                self.stored_runs.setdefault(str(run.get("id")), {}).update(run)
+
+
+    multipart_ingest = batch_ingest_runs
+
+
+    def list_runs(self, *, project_id: Optional[Any] = None, project_name: Optional[str] = None,
+                  is_root: Optional[bool] = None, **kwargs: Any) -> Iterator[Run]:
+        if project_id is not None:
+            project_name = self.read_project(project_id=project_id).name
+        with self._lock:
+            stored = [dict(run) for run in self.stored_runs.values()]
+        for run in stored:
+            if project_name is not None and run.get("session_name") != project_name:
+                continue
+            if is_root is not None and (run.get("parent_run_id") is None) != is_root:
+                continue
+            yield Run(**{key: value for key, value in run.items() if key in Run.model_fields and value is not None})
+
+
+    def create_feedback(self, run_id: Optional[Any] = None, key: str = "unnamed", **kwargs: Any) -> Dict[str, Any]:
+        feedback = dict(kwargs, run_id=run_id, key=key, id=kwargs.get("feedback_id") or uuid.uuid4(),
+                        created_at=_now())
+        with self._lock:
+            self.stored_feedback.append(feedback)
+        return feedback
+
+
+    def list_feedback(self, *, run_ids: Optional[Sequence[Any]] = None, feedback_key: Optional[Sequence[str]] = None,
+                      **kwargs: Any) -> Iterator[Feedback]:
+        run_ids = {str(run_id) for run_id in run_ids} if run_ids is not None else None
+        with self._lock:
+            stored = list(self.stored_feedback)
+        for feedback in stored:
+            if run_ids is not None and str(feedback["run_id"]) not in run_ids:
+                continue
+            if feedback_key is not None and feedback["key"] not in feedback_key:
+                continue
+            yield Feedback(
+                id=feedback["id"], created_at=feedback["created_at"], modified_at=feedback["created_at"],
+                run_id=feedback["run_id"], trace_id=feedback.get("trace_id"), key=feedback["key"],
+                score=feedback.get("score"), value=feedback.get("value"), comment=feedback.get("comment")
+            )
+
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        pass
+
+
+class StubServer:
+    """
+    Runs benchmarks/openai_stub.py in a subprocess for the duration of a with block.
+    """
+
+    def __init__(self, port: int = 7862, latency_ms: float = 0, jitter_ms: float = 0, rate_limit_rate: float = 0):
+        """
+        Initialize the StubServer.
+
+        Args:
+            port: Local port for the stub
+            latency_ms: Base response latency in milliseconds
+            jitter_ms: Uniform random latency added on top, in milliseconds
+            rate_limit_rate: Fraction of requests answered with HTTP 429
+        """
+        self.port = port
+        self.args = ["--port", str(port), "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms),
+                     "--rate-limit-rate", str(rate_limit_rate)]
+        self._process = None
+
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+
+    def stats(self) -> Dict[str, Any]:
+        return httpx.get(f"http://127.0.0.1:{self.port}/stats").json()
+
+
+    def __enter__(self) -> "StubServer":
+        self._process = subprocess.Popen([sys.executable, OPENAI_STUB] + self.args, cwd=ROOT)
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{self.port}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline or self._process.poll() is not None:
+                self.__exit__(None, None, None)
+                raise RuntimeError(f"OpenAI stub did not come up on port {self.port}")
+            time.sleep(0.1)
+
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+
+
+def _mean_ms(func: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def profile_harness(base_url: str, iterations: int = 50, examples: int = 50) -> Dict[str, Dict[str, float]]:
+    """
+    Measure the evaluation harness's own overhead against the stub model server.
+
+    Each figure is a mean in milliseconds:
+    - construction: building a LangSmith client, OpenAI clients, the tracing wrapper and a judge
+    - serialization: encoding a judge request and decoding its completion and grade
+    - call: a raw model call, the stub's own service time, the transport left after
+      subtracting it, and the extra cost of a call through wrap_openai with tracing on
+    - scheduling: per-example cost of evaluate/aevaluate with a no-op target and evaluator
+
+    Args:
+        base_url: Base URL of the stub, e.g. StubServer.base_url
+        iterations: Repetitions of each construction, serialization and call measurement
+        examples: Examples in the scheduling measurement
+
+    Returns:
+        Figures per section
+    """
+    from judge import AccuracyJudge, Grade
+
+    service_ms: List[float] = []
+
+    def record_service(response: httpx.Response) -> None:
+        if "x-stub-service-ms" in response.headers:
+            service_ms.append(float(response.headers["x-stub-service-ms"]))
+
+    def langsmith_client() -> Client:
+        return Client(api_url="http://langsmith.offline.invalid", api_key="offline", auto_batch_tracing=False)
+
+    def openai_client() -> OpenAI:
+        return OpenAI(api_key="offline", base_url=base_url, max_retries=0)
+
+    # wrap_openai patches a client in place, so each measurement wraps a fresh one
+    unwrapped = iter([openai_client() for _ in range(iterations)])
+    shared = openai_client()
+    construction = {
+        "langsmith_client": _mean_ms(langsmith_client, iterations),
+        "openai_client": _mean_ms(openai_client, iterations),
+        "async_openai_client": _mean_ms(lambda: AsyncOpenAI(api_key="offline", base_url=base_url), iterations),
+        "wrap_openai": _mean_ms(lambda: wrappers.wrap_openai(next(unwrapped)), iterations),
+        "judge": _mean_ms(lambda: AccuracyJudge(shared), iterations),
+    }
+
+    raw = OpenAI(api_key="offline", base_url=base_url, max_retries=0,
+                 http_client=httpx.Client(event_hooks={"response": [record_service]}))
+    judge = AccuracyJudge(raw)
+    request = {
+        "model": judge.model,
+        "messages": judge.build_messages("The chemical symbol for gold is Au.", "Gold's symbol is Au."),
+        "response_format": judge.response_format,
+    }
+    raw_response = raw.chat.completions.with_raw_response.create(**request)
+    text = raw_response.http_response.text
+    content = raw_response.parse().choices[0].message.content
+    serialization = {
+        "request_encode": _mean_ms(lambda: json.dumps(request), iterations),
+        "completion_decode": _mean_ms(lambda: ChatCompletion.model_validate(json.loads(text)), iterations),
+        "grade_parse": _mean_ms(lambda: Grade.model_validate_json(content), iterations),
+    }
+
+    service_ms.clear()
+    raw_call = _mean_ms(lambda: raw.chat.completions.create(**request), iterations)
+    service = sum(service_ms) / len(service_ms) if service_ms else 0.0
+    tracing_client = InMemoryClient()
+    wrapped = wrappers.wrap_openai(raw)
+    with tracing_context(enabled=True, client=tracing_client, project_name="offline-profile"):
+        traced_call = _mean_ms(lambda: wrapped.chat.completions.create(**request), iterations)
+    call = {
+        "raw_call": raw_call,
+        "stub_service": service,
+        "transport": raw_call - service,
+        "tracing_wrapper": traced_call - raw_call,
+    }
+
+    client = InMemoryClient()
+    dataset = client.create_dataset("offline-profile")
+    client.create_examples(
+        dataset_id=dataset.id,
+        inputs=[{"question": f"question {i}"} for i in range(examples)],
+        outputs=[{"answer": f"answer {i}"} for i in range(examples)]
+    )
+    data = list(client.list_examples(dataset_id=dataset.id))
+
+    def noop_target(inputs: dict) -> dict:
+        return {"response": ""}
+
+    def noop_evaluator(outputs: dict, reference_outputs: dict) -> bool:
+        return True
+
+    async def anoop_target(inputs: dict) -> dict:
+        return {"response": ""}
+
+    async def anoop_evaluator(outputs: dict, reference_outputs: dict) -> bool:
+        return True
+
+    start = time.perf_counter()
+    client.evaluate(noop_target, data=data, evaluators=[noop_evaluator], experiment_prefix="offline-profile",
+                    max_concurrency=0)
+    sync_ms = (time.perf_counter() - start) / examples * 1000
+    start = time.perf_counter()
+    asyncio.run(aevaluate(anoop_target, data=data, evaluators=[anoop_evaluator], client=client,
+                          experiment_prefix="offline-profile", max_concurrency=0))
+    async_ms = (time.perf_counter() - start) / examples * 1000
+    scheduling = {"evaluate_per_example": sync_ms, "aevaluate_per_example": async_ms}
+
+    return {"construction": construction, "serialization": serialization, "call": call, "scheduling": scheduling}
+
+
+def format_profile(profile: Dict[str, Dict[str, float]], calls_per_example: float = 2.0) -> str:
+    """
+    Format a profile_harness() result, with the estimated harness overhead per example.
+
+    Args:
+        profile: Result of profile_harness()
+        calls_per_example: Model calls per example, e.g. one target and one judge call
+
+    Returns:
+        The report as text
+    """
+    lines = []
+    for section, figures in profile.items():
+        lines.append(f"{section}:")
+        lines.extend(f"  {name:<24}{value:>10.3f} ms" for name, value in figures.items())
+    per_call = (
+        sum(profile["serialization"].values())
+        + profile["call"]["transport"]
+        + profile["call"]["tracing_wrapper"]
+    )
+    per_example = profile["scheduling"]["aevaluate_per_example"] + calls_per_example * per_call
+    lines.append(f"harness overhead per example (aevaluate, {calls_per_example:g} calls): {per_example:.3f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, Optional, Set, Tuple
+
+from fastapi import Request
+from json_repair import repair_json
+
+from metrics import JSON_REPAIRS
+
+logger = logging.getLogger("webhook_handler")
+
+# Largest webhook body accepted, in bytes (Gmail caps messages at 25 MB)
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", str(25 * 1024 * 1024)))
+
+# Email fields forwarded to Langflow
+EMAIL_FIELDS = ("to", "sender", "subject", "messageText", "messageTimestamp", "threadId", "messageId")
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+_SCALAR = re.compile(rb"[^\s,\]}]+")
+
+_QUOTE, _BACKSLASH, _OPEN_BRACE, _OPEN_BRACKET = ord('"'), ord("\\"), ord("{"), ord("[")
+
+
+class BodyTooLarge(Exception):
+    """Raised when a webhook body exceeds WEBHOOK_MAX_BODY_BYTES"""
+
+
+async def read_body(request: Request, max_bytes: int = WEBHOOK_MAX_BODY_BYTES) -> bytes:
+    """
+    Read the request body from the stream, stopping as soon as it exceeds max_bytes.
+
+    Args:
+        request: Incoming request
+        max_bytes: Maximum body size in bytes
+
+    Returns:
+        The raw body
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise BodyTooLarge(f"Body of {content_length} bytes exceeds limit of {max_bytes} bytes")
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise BodyTooLarge(f"Body exceeds limit of {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def filter_email_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Keep only the email fields forwarded to Langflow.
+
+    Args:
+        data: The 'data' object of the webhook payload
+
+    Returns:
+        Dictionary with the email fields, without the large 'payload' object
+    """
+    return {
+        "to": data.get("to"),
+        "sender": data.get("sender"),
+        "subject": data.get("subject"),
+        "messageText": data.get("messageText", ""),
+        "messageTimestamp": data.get("messageTimestamp"),
+        "threadId": data.get("threadId"),
+        "messageId": data.get("messageId")
+    }
+
+
+def _skip_whitespace(buf: bytes, pos: int) -> int:
+    return _WHITESPACE.match(buf, pos).end()
+
+
+def _string_end(buf: bytes, pos: int) -> int:
+    """
+    Find the end of the JSON string starting at pos. Uses bytes.find so long
+    strings such as base64 attachments are skipped at memchr speed.
+    """
+    index = pos + 1
+    while True:
+        quote = buf.find(b'"', index)
+        if quote == -1:
+            raise ValueError(f"Unterminated string at {pos}")
+        backslash = quote - 1
+        while buf[backslash] == _BACKSLASH:
+            backslash -= 1
+        if (quote - backslash) % 2:
+            return quote + 1
+        index = quote + 1
+
+
+def _value_end(buf: bytes, pos: int) -> int:
+    """
+    Find the end of the JSON value starting at pos without decoding it.
+    Strings are skipped whole, so brackets inside them are ignored.
+    """
+    if pos >= len(buf):
+        raise ValueError("Unexpected end of body")
+    first = buf[pos]
+    if first == _QUOTE:
+        return _string_end(buf, pos)
+    if first in (_OPEN_BRACE, _OPEN_BRACKET):
+        depth = 0
+        search = _STRUCTURAL.search
+        while True:
+            match = search(buf, pos)
+            if not match:
+                raise ValueError(f"Unterminated container at {pos}")
+            pos = match.start()
+            token = buf[pos]
+            if token == _QUOTE:
+                pos = _string_end(buf, pos)
+                continue
+            pos += 1
+            if token in (_OPEN_BRACE, _OPEN_BRACKET):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos
+    match = _SCALAR.match(buf, pos)
+    if not match:
+        raise ValueError(f"Expected a value at {pos}")
+    return match.end()
+
+
+def _scan_object(
+        buf: bytes,
+        pos: int,
+        wanted: Set[str],
+        stop_key: Optional[str] = None
+    ) -> Dict[str, Tuple[int, int]]:
+    """
+    Walk the members of the JSON object starting at pos and record where the wanted values are.
+
+    Args:
+        buf: Raw body
+        pos: Offset of the opening brace
+        wanted: Keys whose value spans should be recorded
+        stop_key: Stop scanning as soon as this key has been found
+
+    Returns:
+        Dictionary mapping found keys to (start, end) byte offsets of their values
+    """
+    if pos >= len(buf) or buf[pos] != _OPEN_BRACE:
+        raise ValueError(f"Expected an object at {pos}")
+    spans = {}
+    pos = _skip_whitespace(buf, pos + 1)
+    if buf[pos:pos + 1] == b"}":
+        return spans
+
+    while True:
+        if buf[pos:pos + 1] != b'"':
+            raise ValueError(f"Expected a key at {pos}")
+        key_end = _string_end(buf, pos)
+        key = json.loads(buf[pos:key_end])
+        pos = _skip_whitespace(buf, key_end)
+        if buf[pos:pos + 1] != b":":
+            raise ValueError(f"Expected ':' at {pos}")
+        pos = _skip_whitespace(buf, pos + 1)
+        end = _value_end(buf, pos)
+
+        if key in wanted:
+            spans[key] = (pos, end)
+            if key == stop_key or (stop_key is None and len(spans) == len(wanted)):
+                return spans
+
+        pos = _skip_whitespace(buf, end)
+        separator = buf[pos:pos + 1]
+        if separator == b",":
+            pos = _skip_whitespace(buf, pos + 1)
+        elif separator == b"}":
+            return spans
+        else:
+            raise ValueError(f"Expected ',' or '}}' at {pos}")
+
+
+def extract_email_fields(body: bytes) -> Dict[str, Any]:
+    """
+    Fast path: pull only the email fields out of the raw body.
+
+    The large 'payload' object (MIME tree, attachments) is skipped over without being
+    decoded, and scanning stops once every field has been found.
+
+    Args:
+        body: Raw webhook body
+
+    Returns:
+        Dictionary with the email fields
+
+    Raises:
+        ValueError: If the body isn't well-formed enough for the fast path
+    """
+    start = body.find(b"{")
+    if start == -1:
+        raise ValueError("No JSON object in body")
+
+    fields = set(EMAIL_FIELDS)
+    spans = _scan_object(body, start, fields | {"data"}, stop_key="data")
+    if "data" in spans:
+        data_start, _ = spans["data"]
+        spans = _scan_object(body, data_start, fields)
+
+    data = {key: json.loads(body[s:e]) for key, (s, e) in spans.items() if key in fields}
+    return filter_email_fields(data)
+
+
+def parse_payload(raw_body: bytes) -> Dict[str, Any]:
+    """
+    Slow path: decode and parse the whole body, repairing malformed JSON if needed.
+
+    Args:
+        raw_body: Raw webhook body
+
+    Returns:
+        The full webhook payload
+    """
+    raw_text = raw_body.decode('utf-8')
+
+    # Find the JSON object boundaries
+    start = raw_text.find("{")
+    end = raw_text.rfind("}")
+    if start != -1 and end != -1 and end > start:
+        raw_text = raw_text[start:end+1]
+
+    try:
+        # First try standard parsing
+        return json.loads(raw_text)
+    except json.JSONDecodeError:
+        # If that fails, try to repair the JSON
+        logger.info("Attempting to repair malformed JSON")
+        JSON_REPAIRS.inc()
+        repaired_text = repair_json(raw_text)
+        payload = json.loads(repaired_text)
+        logger.info("JSON successfully repaired")
+        return payload
@@ -0,0 +1,300 @@
+import os
+import re
+import random
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from judge import AccuracyJudge
+
+# Tiered grading settings
+PREGRADE_ENABLED = os.getenv("PREGRADE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Token-overlap F1 at or above which a response is accepted without the judge
+PREGRADE_ACCEPT_OVERLAP = float(os.getenv("PREGRADE_ACCEPT_OVERLAP", "0.8"))
+# Fraction of locally graded examples also sent to the judge to measure agreement
+PREGRADE_AUDIT_RATE = float(os.getenv("PREGRADE_AUDIT_RATE", "0.0"))
+
+TIERS = ("exact", "entity", "overlap", "judge")
+
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)*|\w+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+STOPWORDS = frozenset(
+    "a an the is are was were be been being of in on at to for from by with and or as it its "
+    "this that these those which what who whom when where why how do does did has have had "
+    "can could will would should may might than then there their they them he she his her "
+    "you your i we our us".split()
+)
+NEGATIONS = frozenset("not no never none neither nor cannot isn't aren't wasn't weren't doesn't don't didn't".split())
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").replace("’", "'")
+
+
+def _tokens(text: str) -> List[str]:
+    """
+    Casefolded word and number tokens, with thousands separators removed from numbers.
+    """
+    return [
+        token.replace(",", "") if token[0].isdigit() else token
+        for token in _TOKEN.findall(_normalize(text).casefold())
+    ]
+
+
+def _numbers(text: str) -> Set[str]:
+    return {number.replace(",", "") for number in _NUMBER.findall(_normalize(text))}
+
+
+def _numbers_match(a: str, b: str) -> bool:
+    """
+    Compare numbers at the precision of the less precise one, so 78.5 matches 78.54.
+    """
+    places = min(len(a.partition(".")[2]), len(b.partition(".")[2]))
+    try:
+        return round(float(a), places) == round(float(b), places)
+    except ValueError:
+        return a == b
+
+
+def _entities(text: str) -> Set[str]:
+    """
+    Key entities of a text: numbers and capitalised or mixed-case words that are not stopwords.
+    """
+    entities = set()
+    for token in _TOKEN.findall(_normalize(text)):
+        if token[0].isdigit():
+            entities.add(token.replace(",", ""))
+        elif not token.islower() and token.casefold() not in STOPWORDS:
+            entities.add(token.casefold())
+    return entities
+
+
+def token_f1(reference: str, response: str) -> float:
+    """
+    F1 overlap of the content tokens of two texts.
+
+    Args:
+        reference: Ground truth answer
+        response: Student's answer
+
+    Returns:
+        F1 score between 0 and 1
+    """
+    reference_tokens = [t for t in _tokens(reference) if t not in STOPWORDS]
+    response_tokens = [t for t in _tokens(response) if t not in STOPWORDS]
+    if not reference_tokens or not response_tokens:
+        return 0.0
+    remaining: Dict[str, int] = {}
+    for token in reference_tokens:
+        remaining[token] = remaining.get(token, 0) + 1
+    common = 0
+    for token in response_tokens:
+        if remaining.get(token):
+            remaining[token] -= 1
+            common += 1
+    if not common:
+        return 0.0
+    precision = common / len(response_tokens)
+    recall = common / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+class PreGrader:
+    """
+    Deterministic local checks that grade clear-cut responses without an LLM call.
+
+    Checks run cheapest first: normalized exact match, then containment of the
+    answer's key entities and numbers, then token overlap against the accept
+    threshold. Both accepts require that the response contains every key entity
+    and number of the answer and names none the reference doesn't, since a
+    competing name or number may be the response's actual answer. Low overlap
+    is never rejected locally, because a correct paraphrase can share no words
+    with the reference. Anything still ambiguous is left to the judge.
+    """
+
+    def __init__(self, accept_overlap: float = PREGRADE_ACCEPT_OVERLAP):
+        """
+        Initialize the PreGrader.
+
+        Args:
+            accept_overlap: Token-overlap F1 at or above which a response is accurate
+        """
+        self.accept_overlap = accept_overlap
+
+
+    def grade(self, reference: str, response: str, question: str = "") -> Tuple[Optional[bool], str]:
+        """
+        Grade a response locally if the answer is clear-cut.
+
+        Args:
+            reference: Ground truth answer
+            response: Student's answer
+            question: The question, whose own entities are not counted as part of the answer
+
+        Returns:
+            (score, tier) where score is None and tier is "judge" when the checks are inconclusive
+        """
+        reference_tokens = [t for t in _tokens(reference) if t not in ("a", "an", "the")]
+        response_tokens = [t for t in _tokens(response) if t not in ("a", "an", "the")]
+        if reference_tokens and reference_tokens == response_tokens:
+            return True, "exact"
+
+        negated = any(token in NEGATIONS or token.endswith("n't") for token in response_tokens)
+        question_entities = _entities(question)
+        reference_entities = _entities(reference)
+        answer_entities = reference_entities - question_entities
+        answer_numbers = {e for e in answer_entities if e[0].isdigit()}
+        response_entities = _entities(response)
+        response_numbers = _numbers(response) - _numbers(question)
+        missing = [
+            entity for entity in answer_entities
+            if entity not in response_entities
+            and not (entity in answer_numbers and any(_numbers_match(entity, n) for n in response_numbers))
+        ]
+        competing = [
+            entity for entity in response_entities - reference_entities - question_entities
+            if not (entity[0].isdigit() and any(_numbers_match(entity, a) for a in answer_numbers))
+        ]
+
+        if not negated and not missing and not competing:
+            if answer_entities:
+                return True, "entity"
+            if token_f1(reference, response) >= self.accept_overlap:
+                return True, "overlap"
+        # A different number where a number is the answer is wrong, whatever the wording
+        if not negated and answer_numbers and response_numbers and all(
+            not any(_numbers_match(a, n) for n in response_numbers) for a in answer_numbers
+        ):
+            return False, "entity"
+        return None, "judge"
+
+
+class TieredJudge:
+    """
+    Grades with the PreGrader first and escalates to an AccuracyJudge only when it is inconclusive.
+
+    Each result records the tier that decided it. A sample of locally graded
+    examples can also be sent to the judge to audit how often the tiers agree.
+    """
+
+    def __init__(
+            self,
+            judge: AccuracyJudge,
+            pre_grader: PreGrader = None,
+            audit_rate: float = PREGRADE_AUDIT_RATE
+        ):
+        """
+        Initialize the TieredJudge.
+
+        Args:
+            judge: LLM judge for ambiguous responses and audits
+            pre_grader: Local checks. If None, one is created from the PREGRADE_* settings.
+            audit_rate: Fraction of locally graded examples also graded by the judge
+        """
+        self.judge = judge
+        self.pre_grader = pre_grader or PreGrader()
+        self.audit_rate = audit_rate
+        self._lock = threading.Lock()
+        self._decided = {tier: 0 for tier in TIERS}
+        self._audited = {tier: 0 for tier in TIERS[:-1]}
+        self._agreed = {tier: 0 for tier in TIERS[:-1]}
+
+
+    def _pre_grade(self, inputs: dict, outputs: dict, reference_outputs: dict) -> Tuple[Optional[bool], str, bool]:
+        score, tier = self.pre_grader.grade(
+            reference_outputs["answer"], outputs["response"], (inputs or {}).get("question", "")
+        )
+        audit = score is not None and self.audit_rate > 0 and random.random() < self.audit_rate
+        return score, tier, audit
+
+
+    def _record(self, score: bool, tier: str, judge_score: Optional[bool] = None) -> Dict[str, Any]:
+        results = [
+            {"key": "accuracy", "score": score, "comment": f"decided by {tier} tier"},
+            {"key": "grading_tier", "value": tier},
+        ]
+        with self._lock:
+            self._decided[tier] += 1
+            if judge_score is not None and tier != "judge":
+                self._audited[tier] += 1
+                self._agreed[tier] += judge_score == score
+        if judge_score is not None and tier != "judge":
+            results.append({"key": "pregrade_agreement", "score": judge_score == score})
+        return {"results": results}
+
+
+    def grade(self, inputs: dict, outputs: dict, reference_outputs: dict) -> Dict[str, Any]:
+        """
+        Grade a model response, calling the judge only when the local checks are inconclusive.
+
+        Args:
+            inputs: Inputs from the dataset
+            outputs: Output from the target function
+            reference_outputs: Reference outputs from the dataset
+
+        Returns:
+            LangSmith evaluation results with the accuracy score and the deciding tier
+        """
+        score, tier, audit = self._pre_grade(inputs, outputs, reference_outputs)
+        if score is None:
+            score = self.judge.grade(outputs, reference_outputs)
+            return self._record(score, tier, score)
+        return self._record(score, tier, self.judge.grade(outputs, reference_outputs) if audit else None)
+
+
+    async def agrade(self, inputs: dict, outputs: dict, reference_outputs: dict) -> Dict[str, Any]:
+        """
+        Async version of grade() using the judge's agrade().
+        """
+        score, tier, audit = self._pre_grade(inputs, outputs, reference_outputs)
+        if score is None:
+            score = await self.judge.agrade(outputs, reference_outputs)
+            return self._record(score, tier, score)
+        return self._record(score, tier, await self.judge.agrade(outputs, reference_outputs) if audit else None)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Tier statistics for this process.
+
+        Returns:
+            Dictionary with examples decided per tier, judge calls saved and per-tier audit agreement
+        """
+        with self._lock:
+            local = sum(self._decided[tier] for tier in TIERS[:-1])
+            audits = sum(self._audited.values())
+            return {
+                "decided": dict(self._decided),
+                "judge_calls_saved": local - audits,
+                "agreement": {
+                    tier: self._agreed[tier] / self._audited[tier]
+                    for tier in self._audited if self._audited[tier]
+                },
+            }
+
+
+    def evaluator(self):
+        """
+        Get a LangSmith evaluator function backed by this tiered judge.
+
+        Returns:
+            Evaluator function named 'accuracy'
+        """
+        def accuracy(inputs: dict, outputs: dict, reference_outputs: dict) -> Dict[str, Any]:
+            return self.grade(inputs, outputs, reference_outputs)
+
+        return accuracy
+
+
+    def async_evaluator(self):
+        """
+        Get an async LangSmith evaluator function backed by this tiered judge, for aevaluate.
+
+        Returns:
+            Async evaluator function named 'accuracy'
+        """
+        async def accuracy(inputs: dict, outputs: dict, reference_outputs: dict) -> Dict[str, Any]:
+            return await self.agrade(inputs, outputs, reference_outputs)
+
+        return accuracy
@@ -0,0 +1,251 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger("evaluation")
+
+# Provider quota for evaluation calls
+EVAL_RPM_LIMIT = int(os.getenv("EVAL_RPM_LIMIT", "500"))
+EVAL_TPM_LIMIT = int(os.getenv("EVAL_TPM_LIMIT", "200000"))
+# Model calls in flight at once, across every evaluation sharing the limiter
+EVAL_MAX_IN_FLIGHT = int(os.getenv("EVAL_MAX_IN_FLIGHT", "32"))
+# Retries of rate-limited or failed calls, with full-jitter exponential backoff
+EVAL_MAX_RETRIES = int(os.getenv("EVAL_MAX_RETRIES", "6"))
+EVAL_RETRY_BASE_DELAY = float(os.getenv("EVAL_RETRY_BASE_DELAY", "1"))
+EVAL_RETRY_MAX_DELAY = float(os.getenv("EVAL_RETRY_MAX_DELAY", "60"))
+
+# Rough characters per token used to estimate prompt size before a call
+CHARS_PER_TOKEN = 4
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def estimate_tokens(messages: Iterable[Dict[str, str]], max_output_tokens: int = 256) -> int:
+    """
+    Estimate the tokens a chat completion will consume, for the tokens/min bucket.
+
+    Args:
+        messages: Chat messages sent with the request
+        max_output_tokens: Allowance for the completion
+
+    Returns:
+        Estimated prompt plus completion tokens
+    """
+    chars = sum(len(message.get("content") or "") for message in messages)
+    return chars // CHARS_PER_TOKEN + max_output_tokens
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously up to its capacity over one period.
+
+    Callers reserve capacity up front, so the balance can go negative; each caller
+    then waits until the refill has covered its reservation. This keeps waiters
+    in arrival order without a lock.
+    """
+
+    def __init__(self, capacity: int, period: float = 60.0):
+        """
+        Initialize the TokenBucket.
+
+        Args:
+            capacity: Tokens available per period
+            period: Refill period in seconds
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount from the bucket.
+
+        Args:
+            amount: Tokens to take; capped at the capacity so oversized requests still run
+
+        Returns:
+            Seconds to wait before the reservation is covered
+        """
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+
+    def sync(self, remaining: float) -> None:
+        """
+        Lower the balance to the provider's view of the remaining quota.
+
+        Args:
+            remaining: Remaining quota reported by the provider
+        """
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """
+    Schedules calls to a model provider within requests/min and tokens/min quotas.
+
+    Each call reserves one request and its estimated tokens before it is sent,
+    then waits for one of max_in_flight slots, so a limiter shared by several
+    evaluations gives them one global budget.
+    Rate-limit headers on every response keep the buckets in line with the
+    provider, and retryable failures are retried with full-jitter backoff.
+    """
+
+    def __init__(
+            self,
+            rpm: int = EVAL_RPM_LIMIT,
+            tpm: int = EVAL_TPM_LIMIT,
+            max_in_flight: int = EVAL_MAX_IN_FLIGHT,
+            max_retries: int = EVAL_MAX_RETRIES,
+            base_delay: float = EVAL_RETRY_BASE_DELAY,
+            max_delay: float = EVAL_RETRY_MAX_DELAY
+        ):
+        """
+        Initialize the RateLimiter.
+
+        Args:
+            rpm: Requests per minute
+            tpm: Tokens per minute
+            max_in_flight: Maximum concurrent calls
+            max_retries: Retries of a failed call before giving up
+            base_delay: Backoff ceiling for the first retry in seconds
+            max_delay: Upper bound of the backoff ceiling in seconds
+        """
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_in_flight = max_in_flight
+        self._slots = None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until one request and the given tokens fit within both quotas.
+
+        Args:
+            tokens: Estimated tokens of the call
+        """
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+    async def observe_response(self, response: httpx.Response) -> None:
+        """
+        httpx response hook that syncs the buckets with x-ratelimit-* headers.
+
+        Args:
+            response: Response from the provider
+        """
+        headers = response.headers
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                bucket.sync(float(remaining))
+            except ValueError:
+                pass
+
+
+    def backoff(self, attempt: int, error: Exception = None) -> float:
+        """
+        Delay before the next attempt: the provider's Retry-After if given, else full jitter.
+
+        Args:
+            attempt: Number of attempts made so far, starting at 1
+            error: The failure being retried
+
+        Returns:
+            Seconds to wait
+        """
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            try:
+                if retry_after is not None:
+                    return min(self.max_delay, float(retry_after)) + random.uniform(0, self.base_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+    async def call(self, func: Callable[[], Awaitable[Any]], tokens: int, stats: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Run an API call within the quotas, retrying retryable failures.
+
+        Args:
+            func: Coroutine function making the call
+            tokens: Estimated tokens of the call
+            stats: Optional dictionary that receives this call's "retries" and
+                "wait_s", the seconds spent waiting for quota and a free slot
+
+        Returns:
+            The call's result
+        """
+        attempt = 0
+        waited = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                await self.acquire(tokens)
+                attempt += 1
+                if self._slots is None:
+                    # Created on first use so it binds to the running event loop
+                    self._slots = asyncio.Semaphore(self.max_in_flight)
+                try:
+                    async with self._slots:
+                        waited += time.perf_counter() - start
+                        return await func()
+                except RETRYABLE_ERRORS as e:
+                    if attempt > self.max_retries:
+                        raise
+                    delay = self.backoff(attempt, e)
+                    self.retries += 1
+                    logger.warning("Retrying after %s (attempt %d) in %.1fs", type(e).__name__, attempt, delay)
+                    await asyncio.sleep(delay)
+        finally:
+            if stats is not None:
+                stats["retries"] = max(0, attempt - 1)
+                stats["wait_s"] = waited
+
+
+    def async_openai_client(self, **kwargs) -> openai.AsyncOpenAI:
+        """
+        Create an AsyncOpenAI client whose responses update this limiter.
+
+        The client's own retries are disabled so that retries go through call().
+
+        Args:
+            kwargs: Extra AsyncOpenAI arguments
+
+        Returns:
+            AsyncOpenAI client
+        """
+        http_client = openai.DefaultAsyncHttpxClient(event_hooks={"response": [self.observe_response]})
+        kwargs.setdefault("max_retries", 0)
+        return openai.AsyncOpenAI(http_client=http_client, **kwargs)
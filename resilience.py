@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger("webhook_handler")
+
+# Backpressure settings for forwards to Langflow
+FORWARD_MAX_IN_FLIGHT = int(os.getenv("FORWARD_MAX_IN_FLIGHT", "32"))
+FORWARD_MAX_WAITING = int(os.getenv("FORWARD_MAX_WAITING", "64"))
+FORWARD_WAIT_TIMEOUT = float(os.getenv("FORWARD_WAIT_TIMEOUT", "2"))
+OVERLOAD_RETRY_AFTER = int(os.getenv("OVERLOAD_RETRY_AFTER", "5"))
+
+# Circuit breaker settings
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+
+class Overloaded(Exception):
+    """Raised when no forward slot is available and the wait queue is full or timed out"""
+
+    def __init__(self, message: str, retry_after: int = OVERLOAD_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Exception):
+    """Raised when the circuit breaker is not letting calls through to Langflow"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ForwardLimiter:
+    """
+    Limits concurrent forwards to Langflow, with a bounded number of callers
+    allowed to wait for a slot.
+    """
+
+    def __init__(
+            self,
+            max_in_flight: int = FORWARD_MAX_IN_FLIGHT,
+            max_waiting: int = FORWARD_MAX_WAITING,
+            wait_timeout: float = FORWARD_WAIT_TIMEOUT
+        ):
+        """
+        Initialize the ForwardLimiter.
+
+        Args:
+            max_in_flight: Maximum number of concurrent forwards
+            max_waiting: Maximum number of callers waiting for a slot
+            wait_timeout: Seconds a caller may wait for a slot
+        """
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = None
+
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Hold a forward slot for the duration of the block.
+
+        Raises:
+            Overloaded: If the wait queue is full or no slot frees up within wait_timeout
+        """
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise Overloaded(f"{self.in_flight} forwards in flight and {self.waiting} waiting")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded(f"No forward slot free after {self.wait_timeout}s")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+class CircuitBreaker:
+    """
+    Stops calling Langflow for a cool-down period after consecutive failures.
+
+    After the cool-down a single trial call is let through (half-open); its
+    outcome closes the circuit again or restarts the cool-down.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+            self,
+            failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+            cooldown: float = BREAKER_COOLDOWN
+        ):
+        """
+        Initialize the CircuitBreaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            cooldown: Seconds the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+
+    def retry_after(self) -> int:
+        """
+        Whole seconds until the circuit will let a trial call through.
+        """
+        return max(1, int(self.opened_at + self.cooldown - time.monotonic() + 0.999))
+
+
+    def check(self) -> None:
+        """
+        Fail fast if calls would currently be rejected, without changing state.
+
+        Raises:
+            CircuitOpen: If the circuit is open and cooling down, or a trial call is in flight
+        """
+        if self.state == self.OPEN and time.monotonic() < self.opened_at + self.cooldown:
+            raise CircuitOpen("Langflow circuit is open", self.retry_after())
+        if self.state == self.HALF_OPEN and self._trial_in_flight:
+            raise CircuitOpen("Langflow circuit is half-open with a trial call in flight", 1)
+
+
+    def before_call(self) -> None:
+        """
+        Admit a call, moving an open circuit to half-open once the cool-down has passed.
+
+        Raises:
+            CircuitOpen: If the call is not admitted
+        """
+        self.check()
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+            logger.info("Langflow circuit half-open, sending a trial call")
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = True
+
+
+    def record_success(self) -> None:
+        """
+        Record a successful call, closing the circuit.
+        """
+        if self.state != self.CLOSED:
+            logger.info("Langflow circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+
+    def abandon_call(self) -> None:
+        """
+        Forget an admitted call that ended without an outcome, e.g. because it was cancelled.
+        """
+        self._trial_in_flight = False
+
+
+    def record_failure(self) -> None:
+        """
+        Record a failed call, opening the circuit after enough consecutive failures.
+        """
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    "Langflow circuit opened after %d consecutive failures, cooling down for %ss",
+                    self.failures, self.cooldown
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
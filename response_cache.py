@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+# Evaluation cache settings
+EVAL_CACHE_PATH = os.getenv("EVAL_CACHE_PATH", ".eval_cache.db")
+EVAL_CACHE_MAX_ENTRIES = int(os.getenv("EVAL_CACHE_MAX_ENTRIES", "100000"))
+EVAL_CACHE_MAX_BYTES = int(os.getenv("EVAL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Comma-separated stages whose cached values are ignored (and refreshed), e.g. "judge" or "all"
+EVAL_CACHE_BYPASS = os.getenv("EVAL_CACHE_BYPASS", "")
+
+# Check the size bounds after this many writes
+EVICT_EVERY = 100
+
+
+def cache_key(*parts: Any) -> str:
+    """
+    Build a content-addressed cache key from everything that determines a result.
+
+    Args:
+        parts: JSON-serializable values, e.g. model, prompt and input
+
+    Returns:
+        Hex SHA-256 of the canonical JSON encoding of the parts
+    """
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    A persistent, size-bounded cache of model responses and judge verdicts backed by SQLite.
+
+    Entries are grouped by stage (e.g. "target", "judge") so hit/miss statistics
+    and bypassing can be controlled per stage. Least recently used entries are
+    evicted once the entry count or total size exceeds its bound.
+    """
+
+    def __init__(
+            self,
+            path: str = EVAL_CACHE_PATH,
+            max_entries: int = EVAL_CACHE_MAX_ENTRIES,
+            max_bytes: int = EVAL_CACHE_MAX_BYTES,
+            bypass: Iterable[str] = tuple(s.strip() for s in EVAL_CACHE_BYPASS.split(",") if s.strip())
+        ):
+        """
+        Initialize the ResponseCache.
+
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Maximum number of cached entries
+            max_bytes: Maximum total size of cached values in bytes
+            bypass: Stages whose cached values are ignored and overwritten; "all" bypasses every stage
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass = set(bypass)
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used);
+        """)
+
+
+    def is_bypassed(self, stage: str) -> bool:
+        return "all" in self.bypass or stage in self.bypass
+
+
+    def _count(self, stage: str, outcome: str) -> None:
+        stats = self._stats.setdefault(stage, {"hits": 0, "misses": 0, "bypassed": 0})
+        stats[outcome] += 1
+
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            stage: Stage the value belongs to, e.g. "target" or "judge"
+            key: Key from cache_key()
+
+        Returns:
+            The cached value, or None on a miss or when the stage is bypassed
+        """
+        with self._lock:
+            if self.is_bypassed(stage):
+                self._count(stage, "bypassed")
+                return None
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(stage, "misses")
+                return None
+            self._conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._count(stage, "hits")
+        return json.loads(row[0])
+
+
+    def set(self, stage: str, key: str, value: Any) -> None:
+        """
+        Store a value.
+
+        Args:
+            stage: Stage the value belongs to
+            key: Key from cache_key()
+            value: JSON-serializable value
+        """
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, stage, value, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, encoded, len(encoded.encode("utf-8")), now, now)
+            )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict()
+
+
+    def _evict(self) -> None:
+        """
+        Delete least recently used entries until both size bounds hold.
+        """
+        entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if entries <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        # Trim to 90% of the bounds so eviction doesn't run on every check
+        excess_entries = max(0, entries - int(self.max_entries * 0.9))
+        excess_bytes = max(0, total_bytes - int(self.max_bytes * 0.9))
+        removed_entries = removed_bytes = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY last_used"):
+            if removed_entries >= excess_entries and removed_bytes >= excess_bytes:
+                break
+            doomed.append((key,))
+            removed_entries += 1
+            removed_bytes += size
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+
+
+    def clear(self, stage: Optional[str] = None) -> None:
+        """
+        Remove cached entries.
+
+        Args:
+            stage: Only remove entries of this stage; None removes everything
+        """
+        with self._lock:
+            if stage is None:
+                self._conn.execute("DELETE FROM cache")
+            else:
+                self._conn.execute("DELETE FROM cache WHERE stage = ?", (stage,))
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics for this process.
+
+        Returns:
+            Dictionary with per-stage hits/misses/bypassed and hit rate, plus entry count and size on disk
+        """
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+            stages = {}
+            for stage, counts in self._stats.items():
+                lookups = counts["hits"] + counts["misses"]
+                stages[stage] = dict(counts, hit_rate=counts["hits"] / lookups if lookups else 0.0)
+        return {"stages": stages, "entries": entries, "bytes": total_bytes}
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
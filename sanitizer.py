@@ -0,0 +1,101 @@
+import os
+import re
+import unicodedata
+from typing import Any, Dict
+
+from payload_parser import EMAIL_FIELDS
+
+# Longest messageText forwarded to Langflow, in characters
+MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "10000"))
+TRUNCATION_MARKER = "... (truncated)"
+
+# Extra characters kept past the limit before cleaning; the window grows if removed
+# control characters or NFC composition leave too little text past the limit
+TRUNCATION_SLACK = 256
+# Characters before a cut checked for composing with the character after it
+COMPOSITION_CONTEXT = 8
+
+# Create a translation table that maps control characters to None
+CONTROL_CHAR_TABLE = str.maketrans("", "", "".join(chr(i) for i in range(32)) + chr(127))
+CONTROL_CHAR_PATTERN = re.compile("[\x00-\x1f\x7f]")
+
+def clean_json_data(data):
+    """Clean JSON data to ensure it can be properly serialized"""
+    if isinstance(data, dict):
+        return {k: clean_json_data(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [clean_json_data(item) for item in data]
+    elif isinstance(data, str):
+        # Remove control characters
+        cleaned = data.translate(CONTROL_CHAR_TABLE)
+        # Normalize Unicode
+        cleaned = unicodedata.normalize("NFC", cleaned)
+        return cleaned
+    else:
+        return data
+
+def clean_text(text: str) -> str:
+    """Remove control characters and NFC-normalize, skipping whichever step isn't needed"""
+    if text.isascii():
+        # ASCII is always NFC; translate is only cheap on ASCII, so check before calling it
+        if CONTROL_CHAR_PATTERN.search(text):
+            text = text.translate(CONTROL_CHAR_TABLE)
+        return text
+    # On non-ASCII text a regex substitution is far cheaper than translate, and
+    # normalize() returns quickly when its is_normalized quick check passes
+    text = CONTROL_CHAR_PATTERN.sub("", text)
+    return unicodedata.normalize("NFC", text)
+
+def safe_cut(text: str, cut: int) -> int:
+    """Move a cut forward to where cleaning each side separately gives the same text as cleaning the whole"""
+    # The characters before the cut that survive cleaning; no canonical composition spans more of them
+    context = ""
+    before = cut
+    while before > 0 and len(context) < COMPOSITION_CONTEXT:
+        before -= 1
+        if not CONTROL_CHAR_PATTERN.match(text[before]):
+            context = text[before] + context
+    while cut < len(text):
+        char = text[cut]
+        if not CONTROL_CHAR_PATTERN.match(char):
+            # A starter that doesn't compose with the text before it ends canonical
+            # reordering and composition, so nothing after it can change the prefix
+            if (unicodedata.combining(unicodedata.normalize("NFD", char)[0]) == 0
+                    and unicodedata.normalize("NFC", context + char)
+                    == unicodedata.normalize("NFC", context) + unicodedata.normalize("NFC", char)):
+                return cut
+            context = (context + char)[-COMPOSITION_CONTEXT:]
+        cut += 1
+    return cut
+
+def truncate_message_text(text: str, max_length: int = MAX_MESSAGE_LENGTH) -> str:
+    """Cut messageText down before cleaning it, then apply the truncation limit to the cleaned text"""
+    window = max_length + TRUNCATION_SLACK
+    while len(text) > window:
+        cut = safe_cut(text, window)
+        if cut >= len(text):
+            break
+        cleaned = clean_text(text[:cut])
+        # The cleaned prefix is a prefix of the cleaned text, so it is enough once it runs past the limit
+        if len(cleaned) > max_length:
+            return cleaned[:max_length] + TRUNCATION_MARKER
+        window *= 2
+    cleaned = clean_text(text)
+    if len(cleaned) > max_length:
+        cleaned = cleaned[:max_length] + TRUNCATION_MARKER
+    return cleaned
+
+def sanitize_email_fields(data: Dict[str, Any], max_length: int = MAX_MESSAGE_LENGTH) -> Dict[str, Any]:
+    """Clean the filtered email fields and truncate messageText, equivalent to clean_json_data plus truncation"""
+    sanitized = {}
+    for field in EMAIL_FIELDS:
+        value = data.get(field)
+        if field == "messageText" and isinstance(value, str):
+            sanitized[field] = truncate_message_text(value, max_length)
+        elif isinstance(value, str):
+            sanitized[field] = clean_text(value)
+        elif isinstance(value, (dict, list)):
+            sanitized[field] = clean_json_data(value)
+        else:
+            sanitized[field] = value
+    return sanitized
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from bulk_upload import ChunkedUploader, UploadError, chunked
+
+
+def quiet(uploaded, rate):
+    pass
+
+
+def test_chunks_are_bounded_by_count():
+    assert list(chunked(range(7), max_items=3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_chunks_are_bounded_by_size_and_large_items_go_alone():
+    items = ["a" * 8, "b" * 8, "c" * 40, "d"]
+    # Each 8-character string is 10 bytes of JSON
+    assert list(chunked(items, max_items=10, max_bytes=20)) == [items[:2], [items[2]], [items[3]]]
+
+
+def test_chunked_consumes_lazily():
+    read = []
+
+    def items():
+        for i in range(10):
+            read.append(i)
+            yield i
+
+    first = next(chunked(items(), max_items=2))
+    assert first == [0, 1]
+    assert read == [0, 1, 2]
+
+
+def test_uploads_every_chunk():
+    sent = []
+    lock = threading.Lock()
+
+    def send(chunk):
+        with lock:
+            sent.extend(chunk)
+
+    uploaded = ChunkedUploader(send, workers=3, progress=quiet).upload(chunked(range(100), max_items=7))
+    assert uploaded == 100
+    assert sorted(sent) == list(range(100))
+
+
+def test_failed_chunk_is_retried_on_its_own():
+    calls = []
+
+    def send(chunk):
+        calls.append(chunk)
+        if chunk == [2, 3] and calls.count(chunk) < 3:
+            raise ConnectionError("reset")
+
+    uploader = ChunkedUploader(send, workers=1, max_retries=3, retry_base_delay=0, progress=quiet)
+    assert uploader.upload(chunked(range(6), max_items=2)) == 6
+    assert calls.count([2, 3]) == 3
+    assert calls.count([0, 1]) == calls.count([4, 5]) == 1
+
+
+def test_exhausted_retries_raise_upload_error_after_the_rest():
+    def send(chunk):
+        if 4 in chunk:
+            raise ConnectionError("reset")
+
+    uploader = ChunkedUploader(send, workers=2, max_retries=2, retry_base_delay=0, progress=quiet)
+    with pytest.raises(UploadError) as info:
+        uploader.upload(chunked(range(10), max_items=2))
+    assert info.value.failed == [[4, 5]]
+    assert info.value.uploaded == 8
+
+
+def test_read_ahead_is_bounded_by_two_chunks_per_worker():
+    release = threading.Event()
+    read = []
+
+    def chunks():
+        for i in range(50):
+            read.append(i)
+            yield [i]
+
+    uploader = ChunkedUploader(lambda chunk: release.wait(), workers=2, progress=quiet)
+    thread = threading.Thread(target=uploader.upload, args=(chunks(),))
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while len(read) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        # Two in flight per worker, plus the chunk waiting for a free slot
+        assert len(read) == 5
+    finally:
+        release.set()
+        thread.join()
+    assert len(read) == 50
+
+
+def test_conflicting_retry_counts_as_sent():
+    calls = []
+
+    def send(chunk):
+        calls.append(chunk)
+        raise ConnectionError("reset") if len(calls) == 1 else KeyError("exists")
+
+    uploader = ChunkedUploader(send, workers=1, retry_base_delay=0, progress=quiet,
+                               already_sent=lambda e: isinstance(e, KeyError))
+    assert uploader.upload([[1, 2]]) == 2
+    assert len(calls) == 2
+
+
+def test_conflict_on_the_first_attempt_is_an_error():
+    def send(chunk):
+        raise KeyError("exists")
+
+    uploader = ChunkedUploader(send, workers=1, max_retries=1, retry_base_delay=0, progress=quiet,
+                               already_sent=lambda e: isinstance(e, KeyError))
+    with pytest.raises(UploadError):
+        uploader.upload([[1]])
@@ -0,0 +1,112 @@
+import uuid
+import datetime
+
+from langsmith.schemas import Example
+
+from checkpoint import RunJournal
+from eval_report import UsageMeter, summarize_records
+from offline import InMemoryClient
+
+
+def make_run(client, project, example, outputs=None):
+    run_id = uuid.uuid4()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    client.stored_runs[str(run_id)] = {
+        "id": run_id, "trace_id": run_id, "name": "target", "run_type": "chain",
+        "start_time": now, "end_time": now + datetime.timedelta(seconds=1),
+        "session_name": project.name, "reference_example_id": example.id,
+        "outputs": outputs or {"response": "answer"},
+    }
+    return run_id
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = RunJournal("run", str(tmp_path))
+    journal.start("experiment", "dataset")
+    journal.record("a", {"response": "x"}, True)
+    journal.close()
+    with open(tmp_path / "run.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"type": "example", "example_id": "b"')
+
+    resumed = RunJournal("run", str(tmp_path))
+    assert resumed.resumed
+    assert set(resumed.completed) == {"a"}
+    resumed.record("c", None, False)
+    resumed.close()
+    assert set(RunJournal("run", str(tmp_path)).completed) == {"a", "c"}
+
+
+def test_reconcile_trusts_the_experiment(tmp_path):
+    client = InMemoryClient()
+    dataset = client.create_dataset("dataset")
+    client.create_examples(dataset_id=dataset.id, examples=[
+        {"inputs": {"question": f"q{i}"}, "outputs": {"answer": f"a{i}"}} for i in range(4)
+    ])
+    examples = sorted(client.list_examples(dataset_id=dataset.id), key=lambda e: e.inputs["question"])
+    journal = RunJournal("run", str(tmp_path))
+    experiment, remaining, ungraded = journal.prepare(client, "dataset", "prefix")
+    assert len(remaining) == 4 and ungraded == []
+
+    # q0 graded and journaled, q1 graded but not journaled,
+    # q2 run without feedback, q3 journaled but never reached the experiment
+    for example in examples[:2]:
+        client.create_feedback(make_run(client, experiment, example), key="accuracy", score=True)
+    ungraded_run = make_run(client, experiment, examples[2])
+    journal.record(examples[0].id, None, True)
+    journal.record(examples[3].id, None, True)
+    journal.close()
+
+    resumed = RunJournal("run", str(tmp_path))
+    _, remaining, ungraded = resumed.prepare(client, "dataset", "prefix")
+    assert [e.id for e in remaining] == [examples[3].id]
+    assert [(run.id, example.id) for run, example in ungraded] == [(ungraded_run, examples[2].id)]
+    assert set(resumed.completed) == {str(examples[0].id), str(examples[1].id)}
+    assert resumed.completed[str(examples[1].id)]["result"] == {"key": "accuracy", "score": True}
+
+    resumed.grade_ungraded(client, lambda outputs, reference_outputs: False, ungraded)
+    resumed.close()
+    feedback = [f for f in client.stored_feedback if str(f["run_id"]) == str(ungraded_run)]
+    assert [f["score"] for f in feedback] == [False]
+    assert str(examples[2].id) in RunJournal("run", str(tmp_path)).completed
+
+
+def test_checkpointed_keeps_name_and_records(tmp_path):
+    journal = RunJournal("run", str(tmp_path))
+
+    def accuracy(inputs, outputs, reference_outputs):
+        return outputs["response"] == reference_outputs["answer"]
+
+    wrapped = journal.checkpointed(accuracy)
+    example = Example(id=uuid.uuid4(), dataset_id=uuid.uuid4(), inputs={"question": "q"}, outputs={"answer": "a"},
+                      created_at=datetime.datetime.now(datetime.timezone.utc))
+
+    class FakeRun:
+        outputs = {"response": "a"}
+        error = None
+        start_time = end_time = None
+
+    assert wrapped.__name__ == "accuracy"
+    assert wrapped(FakeRun(), example) is True
+    assert journal.completed[str(example.id)]["result"] is True
+
+
+def test_resumed_summary_covers_every_attempt(tmp_path):
+    first = RunJournal("run", str(tmp_path))
+    first.record("a", {"response": "x"}, True)
+    first.record("b", {"response": "y"}, {"key": "accuracy", "score": 0})
+    first.record_usage({"gpt-4o-mini": {"calls": 2, "prompt_tokens": 100, "completion_tokens": 10}})
+    first.close()
+
+    second = RunJournal("run", str(tmp_path))
+    second.record("c", {"response": "z"}, {"results": [{"key": "accuracy", "score": 1}]})
+    second.record_usage({"gpt-4o-mini": {"calls": 1, "prompt_tokens": 50, "completion_tokens": 5}})
+    second.close()
+
+    journal = RunJournal("run", str(tmp_path))
+    meter = UsageMeter()
+    for usage in journal.usage:
+        meter.merge(usage)
+    summary = summarize_records(journal.completed.values(), meter)
+    assert summary["examples"] == 3
+    assert summary["accuracy"] == 2 / 3
+    assert summary["tokens"] == 165
@@ -0,0 +1,110 @@
+import asyncio
+
+from coalescer import ThreadCoalescer, merge_thread_messages
+from sanitizer import MAX_MESSAGE_LENGTH, TRUNCATION_MARKER
+
+
+def message(message_id, thread_id="t-1", text="hello"):
+    return {
+        "messageId": message_id,
+        "threadId": thread_id,
+        "sender": "alice@example.com",
+        "messageTimestamp": f"ts-{message_id}",
+        "messageText": text,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.delivered = []
+
+
+    async def __call__(self, merged, messages):
+        self.delivered.append((merged, messages))
+
+
+def test_single_message_is_not_merged():
+    only = message("m-1")
+    assert merge_thread_messages([only]) is only
+
+
+def test_merge_puts_newest_text_first_and_keeps_arrival_order_ids():
+    merged = merge_thread_messages([message("m-1", text="first"), message("m-2", text="second")])
+    assert merged["messageId"] == "m-2"
+    assert merged["messageIds"] == ["m-1", "m-2"]
+    assert merged["messageCount"] == 2
+    assert merged["messageText"].index("second") < merged["messageText"].index("first")
+
+
+def test_merge_truncates_the_oldest_text():
+    merged = merge_thread_messages([message("m-1", text="old " * MAX_MESSAGE_LENGTH), message("m-2", text="new")])
+    assert merged["messageText"].endswith(TRUNCATION_MARKER)
+    assert "new" in merged["messageText"]
+
+
+def test_disabled_or_threadless_messages_are_not_buffered():
+    async def run():
+        assert not ThreadCoalescer(Recorder(), window=0).add(message("m-1"))
+        assert not ThreadCoalescer(Recorder(), window=1).add(message("m-1", thread_id=None))
+
+    asyncio.run(run())
+
+
+def test_window_coalesces_a_thread():
+    deliver = Recorder()
+
+    async def run():
+        coalescer = ThreadCoalescer(deliver, window=0.05)
+        for message_id, thread_id in [("m-1", "t-1"), ("m-2", "t-2"), ("m-3", "t-1")]:
+            assert coalescer.add(message(message_id, thread_id))
+        assert coalescer.pending == 3
+        await asyncio.sleep(0.2)
+        return coalescer
+
+    coalescer = asyncio.run(run())
+    merged = {m["threadId"]: m for m, _ in deliver.delivered}
+    assert merged["t-1"]["messageIds"] == ["m-1", "m-3"]
+    assert merged["t-2"]["messageId"] == "m-2"
+    assert coalescer.coalesced == 1
+    assert coalescer.pending == 0
+
+
+def test_max_messages_flushes_before_the_window():
+    deliver = Recorder()
+
+    async def run():
+        coalescer = ThreadCoalescer(deliver, window=60, max_messages=2)
+        coalescer.add(message("m-1"))
+        coalescer.add(message("m-2"))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert [merged["messageIds"] for merged, _ in deliver.delivered] == [["m-1", "m-2"]]
+
+
+def test_flush_all_delivers_buffered_threads():
+    deliver = Recorder()
+
+    async def run():
+        coalescer = ThreadCoalescer(deliver, window=60)
+        coalescer.add(message("m-1", "t-1"))
+        coalescer.add(message("m-2", "t-2"))
+        await coalescer.flush_all()
+        return coalescer
+
+    coalescer = asyncio.run(run())
+    assert sorted(merged["messageId"] for merged, _ in deliver.delivered) == ["m-1", "m-2"]
+    assert coalescer.pending == 0
+
+
+def test_delivery_errors_are_contained():
+    async def failing(merged, messages):
+        raise RuntimeError("Langflow down")
+
+    async def run():
+        coalescer = ThreadCoalescer(failing, window=60)
+        coalescer.add(message("m-1"))
+        await coalescer.flush_all()
+
+    asyncio.run(run())
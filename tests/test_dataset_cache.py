@@ -0,0 +1,120 @@
+import types
+
+import pytest
+
+import dataset_cache
+from dataset_cache import DatasetMetadataCache, client_namespace
+from dataset_manager import DatasetManager
+from dataset_sources import DatasetRegistry
+from offline import InMemoryClient
+
+
+@pytest.fixture
+def client():
+    return InMemoryClient()
+
+
+@pytest.fixture
+def cache():
+    return DatasetMetadataCache(":memory:")
+
+
+def test_set_and_get(client, cache):
+    dataset = client.create_dataset("d", description="desc")
+    cache.set("ns", dataset, example_count=3, content_hash="abc")
+    entry = cache.get("ns", "d")
+    assert entry["id"] == str(dataset.id)
+    assert entry["description"] == "desc"
+    assert (entry["example_count"], entry["content_hash"]) == (3, "abc")
+    assert cache.get("other", "d") is None
+
+
+def test_entries_expire_after_the_ttl(client, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dataset_cache.time, "time", lambda: now[0])
+    cache = DatasetMetadataCache(":memory:", ttl=60)
+    cache.set("ns", client.create_dataset("d"))
+    now[0] += 59
+    assert cache.get("ns", "d") is not None
+    now[0] += 2
+    assert cache.get("ns", "d") is None
+
+
+def test_zero_ttl_disables_lookups(client):
+    cache = DatasetMetadataCache(":memory:", ttl=0)
+    cache.set("ns", client.create_dataset("d"))
+    assert cache.get("ns", "d") is None
+
+
+def test_set_without_hash_keeps_it_only_while_count_matches(client, cache):
+    dataset = client.create_dataset("d")
+    cache.set("ns", dataset, example_count=3, content_hash="abc")
+    cache.set("ns", dataset)
+    assert cache.get("ns", "d")["content_hash"] == "abc"
+    cache.set("ns", dataset, example_count=4)
+    assert cache.get("ns", "d")["content_hash"] is None
+
+
+def test_invalidate_by_name_and_namespace(client, cache):
+    for namespace in ("a", "b"):
+        for name in ("x", "y"):
+            cache.set(namespace, client.create_dataset(f"{namespace}-{name}"))
+    cache.invalidate("a", "a-x")
+    assert cache.get("a", "a-x") is None
+    assert cache.get("a", "a-y") is not None
+    cache.invalidate("b")
+    assert cache.get("b", "b-x") is None
+    assert cache.get("a", "a-y") is not None
+    cache.invalidate()
+    assert cache.get("a", "a-y") is None
+
+
+def test_namespace_depends_on_url_and_key():
+    def namespace(api_url, api_key):
+        return client_namespace(types.SimpleNamespace(api_url=api_url, api_key=api_key))
+
+    assert namespace("https://api", "k1") == namespace("https://api", "k1")
+    assert namespace("https://api", "k1") != namespace("https://api", "k2")
+    assert namespace("https://api", "k1") != namespace("https://eu.api", "k1")
+
+
+def test_unchanged_dataset_skips_the_sync_without_api_calls(client, cache, monkeypatch):
+    registry = DatasetRegistry()
+    registry["qa"] = [("q1", "a1"), ("q2", "a2")]
+    manager = DatasetManager(client, cache, registry)
+    dataset = manager.create_dataset_from_examples("d", "qa")
+    assert cache.get(manager.namespace, "d")["example_count"] == 2
+
+    def no_api(*args, **kwargs):
+        pytest.fail("unexpected API call")
+
+    for method in ("list_datasets", "create_dataset", "list_examples", "create_examples"):
+        monkeypatch.setattr(client, method, no_api)
+    assert manager.create_dataset_from_examples("d", "qa").id == dataset.id
+
+
+def test_changed_examples_sync_again(client, cache):
+    registry = DatasetRegistry()
+    registry["qa"] = [("q1", "a1")]
+    manager = DatasetManager(client, cache, registry)
+    dataset = manager.create_dataset_from_examples("d", "qa")
+    registry["qa"] = [("q1", "a1"), ("q2", "a2")]
+    manager.create_dataset_from_examples("d", "qa")
+    assert len(list(client.list_examples(dataset_id=dataset.id))) == 2
+    assert cache.get(manager.namespace, "d")["example_count"] == 2
+
+
+def test_failed_sync_drops_the_entry(client, cache, monkeypatch):
+    registry = DatasetRegistry()
+    registry["qa"] = [("q1", "a1")]
+    manager = DatasetManager(client, cache, registry)
+    manager.create_dataset_from_examples("d", "qa")
+    registry["qa"] = [("q2", "a2")]
+
+    def fail(*args, **kwargs):
+        raise ConnectionError("reset")
+
+    monkeypatch.setattr(manager, "sync_examples", fail)
+    with pytest.raises(ConnectionError):
+        manager.create_dataset_from_examples("d", "qa")
+    assert cache.get(manager.namespace, "d") is None
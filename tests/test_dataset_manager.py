@@ -0,0 +1,114 @@
+import pytest
+
+from dataset_cache import DatasetMetadataCache
+from dataset_manager import DatasetManager, content_hash, examples_hash
+from dataset_sources import DatasetRegistry
+from offline import InMemoryClient
+
+
+@pytest.fixture
+def manager():
+    return DatasetManager(InMemoryClient(), DatasetMetadataCache(":memory:"), DatasetRegistry())
+
+
+def remote_pairs(manager, dataset):
+    return sorted(
+        (example.inputs["question"], example.outputs["answer"])
+        for example in manager.client.list_examples(dataset_id=dataset.id)
+    )
+
+
+def sync(manager, dataset, examples, **kwargs):
+    result = manager.sync_examples(dataset.id, examples, **kwargs)
+    return {key: value for key, value in result.items() if key != "content_hash"}
+
+
+def test_sync_creates_updates_and_keeps_unchanged(manager):
+    dataset = manager.client.create_dataset("d")
+    assert sync(manager, dataset, [("q1", "a1"), ("q2", "a2")]) == {
+        "created": 2, "updated": 0, "deleted": 0, "unchanged": 0, "total": 2}
+    assert sync(manager, dataset, [("q1", "a1"), ("q2", "A2"), ("q3", "a3")]) == {
+        "created": 1, "updated": 1, "deleted": 0, "unchanged": 1, "total": 3}
+    assert remote_pairs(manager, dataset) == [("q1", "a1"), ("q2", "A2"), ("q3", "a3")]
+
+
+def test_unchanged_sync_writes_nothing(manager, monkeypatch):
+    dataset = manager.client.create_dataset("d")
+    manager.sync_examples(dataset.id, [("q1", "a1")])
+    for method in ("create_examples", "update_examples", "delete_examples"):
+        monkeypatch.setattr(manager.client, method, lambda *args, **kwargs: pytest.fail("unexpected write"))
+    assert sync(manager, dataset, [("q1", "a1")])["unchanged"] == 1
+
+
+def test_removed_examples_are_kept_without_delete_missing(manager):
+    dataset = manager.client.create_dataset("d")
+    manager.sync_examples(dataset.id, [("q1", "a1"), ("q2", "a2")])
+    assert sync(manager, dataset, [("q1", "a1")]) == {
+        "created": 0, "updated": 0, "deleted": 0, "unchanged": 1, "total": 2}
+    assert len(remote_pairs(manager, dataset)) == 2
+
+
+def test_delete_missing_removes_stale_and_duplicate_examples(manager):
+    dataset = manager.client.create_dataset("d")
+    manager.client.create_examples(dataset_id=dataset.id, examples=[
+        {"inputs": {"question": "q1"}, "outputs": {"answer": "a1"}},
+        {"inputs": {"question": "q1"}, "outputs": {"answer": "a1"}},
+        {"inputs": {"question": "old"}, "outputs": {"answer": "gone"}},
+    ])
+    assert sync(manager, dataset, [("q1", "a1")], delete_missing=True) == {
+        "created": 0, "updated": 0, "deleted": 2, "unchanged": 1, "total": 1}
+    assert remote_pairs(manager, dataset) == [("q1", "a1")]
+
+
+def test_examples_without_stored_hash_are_compared_by_content(manager):
+    dataset = manager.client.create_dataset("d")
+    manager.client.create_examples(dataset_id=dataset.id, examples=[
+        {"inputs": {"question": "q1"}, "outputs": {"answer": "a1"}},
+    ])
+    assert sync(manager, dataset, [("q1", "a1")])["unchanged"] == 1
+    assert sync(manager, dataset, [("q1", "changed")])["updated"] == 1
+    example = next(iter(manager.client.list_examples(dataset_id=dataset.id)))
+    assert example.metadata["content_hash"] == content_hash("q1", "changed")
+
+
+def test_sync_reads_a_generator_once_and_keeps_the_first_duplicate(manager):
+    dataset = manager.client.create_dataset("d")
+    pairs = [("q1", "first"), ("q2", "a2"), ("q1", "second")]
+    result = manager.sync_examples(dataset.id, (pair for pair in pairs))
+    assert result["created"] == 2
+    assert result["content_hash"] == examples_hash(pairs)[0]
+    assert remote_pairs(manager, dataset) == [("q1", "first"), ("q2", "a2")]
+
+
+def test_sync_pages_through_remote_examples(manager, monkeypatch):
+    dataset = manager.client.create_dataset("d")
+    pairs = [(f"q{i}", f"a{i}") for i in range(10)]
+    manager.sync_examples(dataset.id, pairs)
+    pages = []
+    monkeypatch.setattr(manager, "iter_remote_examples",
+                        lambda dataset_id: DatasetManager.iter_remote_examples(manager, dataset_id, page_size=3))
+    original = manager.client.list_examples
+    monkeypatch.setattr(manager.client, "list_examples",
+                        lambda **kwargs: pages.append(kwargs["offset"]) or original(**kwargs))
+    assert sync(manager, dataset, pairs)["unchanged"] == 10
+    assert pages == [0, 3, 6, 9]
+
+
+def test_retried_create_does_not_duplicate_examples(manager, monkeypatch):
+    dataset = manager.client.create_dataset("d")
+    create_examples = manager.client.create_examples
+    calls = []
+
+    def flaky_create(**kwargs):
+        calls.append(kwargs)
+        create_examples(**kwargs)
+        if len(calls) == 1:
+            # The server applied the write, but the response never arrived
+            raise ConnectionError("timed out")
+
+    monkeypatch.setattr(manager.client, "create_examples", flaky_create)
+    monkeypatch.setattr("bulk_upload.UPLOAD_RETRY_BASE_DELAY", 0)
+    manager.add_examples(dataset.id, [("q1", "a1"), ("q2", "a2")])
+    manager.sync_examples(dataset.id, [("q1", "a1"), ("q2", "a2"), ("q3", "a3")])
+    assert len(calls) == 3
+    assert remote_pairs(manager, dataset) == [("q1", "a1"), ("q2", "a2"), ("q3", "a3")]
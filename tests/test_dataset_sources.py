@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+import dataset_sources
+from dataset_cache import DatasetMetadataCache
+from dataset_definitions import DatasetDefinitions
+from dataset_manager import DatasetManager
+from dataset_sources import (
+    CallableSource, CsvSource, DatasetRegistry, DatasetSource, JsonlSource, StaticSource,
+    default_registry, file_source
+)
+from offline import InMemoryClient
+
+PAIRS = [("What is 2 + 2?", "4"), ("Capital of France?", "Paris, \"city of light\"")]
+
+
+class CountingSource(DatasetSource):
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.passes = 0
+
+
+    def __iter__(self):
+        self.passes += 1
+        return iter(self.pairs)
+
+
+@pytest.fixture
+def jsonl_path(tmp_path):
+    path = tmp_path / "qa.jsonl"
+    path.write_text("\n".join(json.dumps({"question": q, "answer": a}) for q, a in PAIRS) + "\n\n",
+                    encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "qa.csv"
+    path.write_text('question,answer\nWhat is 2 + 2?,4\nCapital of France?,"Paris, ""city of light"""\n',
+                    encoding="utf-8")
+    return str(path)
+
+
+def test_dataset_source_is_abstract():
+    with pytest.raises(TypeError):
+        DatasetSource()
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_file_sources_stream_pairs(jsonl_path, csv_path, use_mmap):
+    assert list(JsonlSource(jsonl_path, use_mmap=use_mmap)) == PAIRS
+    assert list(CsvSource(csv_path, use_mmap=use_mmap)) == PAIRS
+
+
+def test_file_sources_are_re_iterable(jsonl_path):
+    source = file_source(jsonl_path)
+    assert list(source) == list(source) == PAIRS
+
+
+def test_custom_field_names(tmp_path):
+    path = tmp_path / "qa.jsonl"
+    path.write_text('{"prompt": "p", "completion": "c"}\n', encoding="utf-8")
+    assert list(JsonlSource(str(path), question_key="prompt", answer_key="completion")) == [("p", "c")]
+
+
+def test_empty_file_with_mmap(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_bytes(b"")
+    assert list(JsonlSource(str(path), use_mmap=True)) == []
+
+
+def test_bad_records_name_their_line(tmp_path):
+    path = tmp_path / "qa.jsonl"
+    path.write_text('{"question": "q", "answer": "a"}\n{"question": "q2"}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=r"qa.jsonl:2: missing field"):
+        list(JsonlSource(str(path)))
+    path.write_text("{not json}\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"qa.jsonl:1: invalid JSON"):
+        list(JsonlSource(str(path)))
+
+
+def test_unknown_extension_is_rejected():
+    with pytest.raises(ValueError):
+        file_source("qa.txt")
+
+
+def test_callable_source_loads_once_on_first_iteration():
+    calls = []
+
+    def load():
+        calls.append(1)
+        return PAIRS
+
+    source = CallableSource(load)
+    assert calls == []
+    assert list(source) == list(source) == PAIRS
+    assert calls == [1]
+
+
+def test_registry_behaves_like_a_dictionary(jsonl_path):
+    registry = DatasetRegistry()
+    registry["list"] = PAIRS
+    registry["file"] = jsonl_path
+    source = registry.register("source", StaticSource(PAIRS))
+    assert isinstance(registry["list"], StaticSource)
+    assert isinstance(registry["file"], JsonlSource)
+    assert registry["source"] is source
+    assert list(registry) == ["list", "file", "source"]
+    del registry["list"]
+    assert "list" not in registry and len(registry) == 2
+
+
+def test_default_registry_defers_loading(monkeypatch, jsonl_path):
+    monkeypatch.setattr(dataset_sources, "EVAL_DATASET_FILES", f" extra = {jsonl_path} ,")
+    monkeypatch.setattr(DatasetDefinitions, "math", staticmethod(lambda: pytest.fail("loaded eagerly")))
+    registry = default_registry()
+    assert set(DatasetDefinitions.CATEGORIES) <= set(registry)
+    assert list(registry["extra"]) == PAIRS
+
+
+def test_malformed_dataset_files_entry(monkeypatch):
+    monkeypatch.setattr(dataset_sources, "EVAL_DATASET_FILES", "no-path")
+    with pytest.raises(ValueError, match="name=path"):
+        default_registry()
+
+
+def test_manager_accessors(jsonl_path):
+    manager = DatasetManager(InMemoryClient(), DatasetMetadataCache(":memory:"), DatasetRegistry())
+    manager.add_custom_example_dataset("file", jsonl_path)
+    assert isinstance(manager.get_example_source("file"), JsonlSource)
+    assert manager.get_example_dataset("file") == PAIRS
+    with pytest.raises(ValueError, match="Available types: file"):
+        manager.get_example_dataset("missing")
+
+
+def test_first_sync_reads_the_source_once():
+    source = CountingSource(PAIRS)
+    registry = DatasetRegistry()
+    registry["qa"] = source
+    manager = DatasetManager(InMemoryClient(), DatasetMetadataCache(":memory:"), registry)
+    manager.create_dataset_from_examples("d", "qa")
+    assert source.passes == 1
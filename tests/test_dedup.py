@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+import dedup
+from dedup import DedupCache, dedup_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_key_prefers_the_message_id():
+    assert dedup_key({"messageId": "m-1", "subject": "s"}) == "id:m-1"
+
+
+def test_key_falls_back_to_a_hash_of_sender_subject_and_timestamp():
+    email = {"sender": "a@example.com", "subject": "s", "messageTimestamp": "t"}
+    key = dedup_key(email)
+    assert key.startswith("hash:")
+    assert dedup_key(dict(email, messageText="other body")) == key
+    assert dedup_key(dict(email, subject="other")) != key
+    assert dedup_key({"messageText": "only a body"}) is None
+
+
+def test_claim_and_release():
+    cache = DedupCache(store_path=None)
+    assert cache.claim("id:m-1")
+    assert not cache.claim("id:m-1")
+    cache.release("id:m-1")
+    assert cache.claim("id:m-1")
+    assert cache.stats() == {"entries": 1, "duplicates": 1}
+
+
+def test_keys_expire_after_the_ttl(clock):
+    cache = DedupCache(ttl=60, store_path=None)
+    assert cache.claim("id:m-1")
+    clock[0] += 59
+    assert not cache.claim("id:m-1")
+    clock[0] += 2
+    assert cache.claim("id:m-1")
+
+
+def test_least_recently_used_keys_are_evicted():
+    cache = DedupCache(max_entries=2, store_path=None)
+    cache.claim("a")
+    cache.claim("b")
+    # A duplicate refreshes its key, so "b" is now the oldest
+    assert not cache.claim("a")
+    cache.claim("c")
+    assert cache.stats()["entries"] == 2
+    assert not cache.claim("a")
+    assert cache.claim("b")
+
+
+def test_store_survives_restarts_and_eviction(tmp_path, clock):
+    path = str(tmp_path / "dedup.db")
+    cache = DedupCache(max_entries=1, ttl=60, store_path=path)
+    cache.open()
+    cache.claim("a")
+    cache.claim("b")
+    # Evicted from memory, still found in the store
+    assert not cache.claim("a")
+    cache.release("b")
+    cache.close()
+
+    restarted = DedupCache(ttl=60, store_path=path)
+    restarted.open()
+    assert not restarted.claim("a")
+    assert restarted.claim("b")
+    clock[0] += 61
+    assert restarted.claim("a")
+    restarted.close()
+
+
+def test_store_io_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = DedupCache(store_path=str(tmp_path / "dedup.db"))
+    cache.open()
+    threads = []
+    claim, release = cache.claim, cache.release
+    monkeypatch.setattr(cache, "claim", lambda key: threads.append(threading.current_thread()) or claim(key))
+    monkeypatch.setattr(cache, "release", lambda key: threads.append(threading.current_thread()) or release(key))
+
+    async def run():
+        assert await cache.aclaim("a")
+        assert not await cache.aclaim("a")
+        await cache.arelease("a")
+        assert await cache.aclaim("a")
+
+    asyncio.run(run())
+    cache.close()
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
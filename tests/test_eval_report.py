@@ -0,0 +1,112 @@
+import json
+import math
+import types
+
+import pytest
+
+import eval_report
+from eval_report import CallLog, UsageMeter, _percentile, model_price, summarize_results
+
+
+def usage(prompt_tokens, completion_tokens):
+    return types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (50, 50), (90, 90), (95, 95), (99, 99), (100, 100)])
+def test_percentile_is_nearest_rank(pct, expected):
+    assert _percentile(list(range(1, 101)), pct) == expected
+
+
+def test_percentile_of_few_values():
+    assert [_percentile([1.0, 2.0, 3.0], pct) for pct in (0, 34, 50, 67, 95)] == [1.0, 2.0, 2.0, 3.0, 3.0]
+    assert _percentile([7.0], 99) == 7.0
+    assert math.isnan(_percentile([], 50))
+
+
+def test_model_price_matches_dated_snapshots(monkeypatch):
+    monkeypatch.setattr(eval_report, "EVAL_MODEL_PRICES", {"custom": [1.0, 2.0]})
+    assert model_price("gpt-4o-mini-2024-07-18") == (0.15, 0.60)
+    assert model_price("gpt-4o-2024-08-06") == (2.50, 10.00)
+    assert model_price("custom") == (1.0, 2.0)
+    assert model_price("unknown") is None
+
+
+def test_usage_meter_cost_and_tokens():
+    meter = UsageMeter()
+    meter.add("gpt-4o-mini", usage(1_000_000, 0))
+    meter.add("gpt-4o", usage(0, 100_000))
+    meter.add("gpt-4o", None)
+    assert meter.usage["gpt-4o"]["calls"] == 1
+    assert meter.tokens() == 1_100_000
+    assert meter.cost() == pytest.approx(0.15 + 1.0)
+    meter.add("unknown-model", usage(1, 1))
+    assert meter.cost() is None
+
+
+def test_usage_meter_merge():
+    meter = UsageMeter()
+    meter.add("gpt-4o-mini", usage(10, 5))
+    meter.merge({"gpt-4o-mini": {"calls": 2, "prompt_tokens": 100, "completion_tokens": 50},
+                 "gpt-4o": {"calls": 1, "prompt_tokens": 1}})
+    assert meter.usage == {
+        "gpt-4o-mini": {"calls": 3, "prompt_tokens": 110, "completion_tokens": 55},
+        "gpt-4o": {"calls": 1, "prompt_tokens": 1, "completion_tokens": 0},
+    }
+
+
+def record_calls(meter):
+    for i, latency in enumerate([0.1, 0.2, 0.3, 0.4]):
+        meter.record_call("target", "gpt-4o-mini", latency, usage(10, 2), input_text=f"question {i}",
+                          call_stats={"retries": i % 2, "wait_s": latency / 10})
+    meter.record_call("judge", "gpt-4o-mini", 0.05, cache_hit=True)
+
+
+def test_call_log_summarize():
+    log = CallLog()
+    record_calls(UsageMeter("coding", log))
+    UsageMeter("math", log).record_call("target", "gpt-4o-mini", 1.0, usage(1, 1))
+    summary = log.summarize()
+    assert list(summary) == ["coding", "math"]
+    target = summary["coding"]["target"]
+    assert (target["calls"], target["cache_hit_rate"], target["retries"]) == (4, 0.0, 2)
+    assert (target["p50_s"], target["p95_s"], target["max_s"]) == (0.2, 0.4, 0.4)
+    assert target["wait_p95_s"] == pytest.approx(0.04)
+    assert (target["prompt_tokens"], target["completion_tokens"]) == (40, 8)
+    judge = summary["coding"]["judge"]
+    assert (judge["calls"], judge["cache_hit_rate"], judge["prompt_tokens"]) == (1, 1.0, 0)
+    assert math.isnan(judge["wait_p95_s"])
+
+
+def test_call_log_flushes_each_record(tmp_path):
+    path = tmp_path / "reports" / "run.calls.jsonl"
+    log = CallLog(str(path))
+    record_calls(UsageMeter("coding", log))
+    # Readable before close, as after a crash
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 5
+    assert records[0]["input"] == "question 0"
+    assert records[-1]["cache_hit"] is True
+    log.close()
+
+
+def test_summary_file_writes_nan_as_null(tmp_path):
+    log = CallLog()
+    record_calls(UsageMeter("coding", log))
+    path = tmp_path / "summary.json"
+    log.write_summary(str(path))
+    summary = json.loads(path.read_text(encoding="utf-8"))
+    assert summary["coding"]["judge"]["wait_p95_s"] is None
+    assert summary["coding"]["target"]["calls"] == 4
+
+
+def test_summarize_results_counts_errors_and_accuracy():
+    def row(error, score):
+        return {"run": types.SimpleNamespace(error=error, start_time=None, end_time=None),
+                "evaluation_results": {"results": [types.SimpleNamespace(key="accuracy", score=score)]}}
+
+    meter = UsageMeter()
+    meter.add("gpt-4o-mini", usage(1_000_000, 0))
+    summary = summarize_results([row(None, 1), row("timeout", 0), row(None, None)], meter)
+    assert (summary["examples"], summary["errors"], summary["accuracy"]) == (2, 1, 0.5)
+    assert math.isnan(summary["p95_s"])
+    assert summary["cost_usd"] == pytest.approx(0.15)
@@ -0,0 +1,163 @@
+import asyncio
+import types
+
+import pytest
+
+import ingest_queue
+from ingest_queue import IngestQueue, QueueForwarder
+from resilience import CircuitOpen, Overloaded
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ingest_queue.time, "time", lambda: now[0])
+    # Backoff without jitter: always the full delay
+    monkeypatch.setattr(ingest_queue.random, "uniform", lambda low, high: high)
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = IngestQueue(str(tmp_path / "queue.db"), max_attempts=3, backoff_base=1, backoff_max=4,
+                        lease_seconds=60)
+    queue.open()
+    yield queue
+    queue.close()
+
+
+class FakeLangflow:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+
+    async def forward(self, payload):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return types.SimpleNamespace(status_code=outcome, text="body")
+
+
+def deliver(queue, langflow, on_dead_letter=None):
+    """Claim the next due item and deliver it once."""
+    forwarder = QueueForwarder(queue, langflow, workers=1, on_dead_letter=on_dead_letter)
+
+    async def run():
+        item = queue.claim()
+        assert item is not None
+        await forwarder._deliver(asyncio.get_running_loop(), *item)
+
+    asyncio.run(run())
+
+
+def test_claim_leases_until_the_lease_expires(queue, clock):
+    first = queue.put({"messageId": "m-1"})
+    queue.put({"messageId": "m-2"})
+    assert queue.claim() == (first, {"messageId": "m-1"}, 0)
+    assert queue.claim()[1] == {"messageId": "m-2"}
+    assert queue.claim() is None
+    clock[0] += 61
+    assert queue.claim()[0] == first
+    assert queue.depth() == 2
+
+
+def test_ack_removes_the_item(queue):
+    item_id = queue.put({"messageId": "m-1"})
+    queue.claim()
+    queue.ack(item_id)
+    assert queue.depth() == 0
+
+
+def test_defer_and_fail_schedule_the_next_attempt(queue, clock):
+    item_id = queue.put({"messageId": "m-1"})
+    queue.claim()
+    queue.defer(item_id, 5)
+    clock[0] += 4.9
+    assert queue.claim() is None
+    clock[0] += 0.2
+    assert queue.claim()[2] == 0
+
+    # Backoff doubles per attempt: 1s, then 2s
+    assert not queue.fail(item_id, 1, "HTTP 500")
+    clock[0] += 0.9
+    assert queue.claim() is None
+    clock[0] += 0.2
+    assert queue.claim()[2] == 1
+    assert not queue.fail(item_id, 2, "HTTP 500")
+    clock[0] += 1.9
+    assert queue.claim() is None
+    clock[0] += 0.2
+    assert queue.claim()[2] == 2
+
+
+def test_retry_delay_is_capped(queue):
+    assert [queue.retry_delay(attempts) for attempts in (1, 2, 3, 4, 10)] == [1, 2, 4, 4, 4]
+
+
+def test_dead_letter_after_max_attempts(queue):
+    item_id = queue.put({"messageId": "m-1"})
+    queue.claim()
+    assert queue.fail(item_id, 3, "HTTP 500")
+    assert queue.depth() == 0
+    assert queue.dead_letter_count() == 1
+
+
+def test_requeue_dead_letters(queue):
+    for message_id in ("m-1", "m-2"):
+        item_id = queue.put({"messageId": message_id})
+        queue.claim()
+        queue.fail(item_id, 1, "HTTP 400", retryable=False)
+    assert queue.requeue_dead_letters() == 2
+    assert queue.dead_letter_count() == 0
+    assert [queue.claim()[1:] for _ in range(2)] == [({"messageId": "m-1"}, 0), ({"messageId": "m-2"}, 0)]
+
+
+def test_forwarder_acks_a_delivered_item(queue):
+    queue.put({"messageId": "m-1"})
+    deliver(queue, FakeLangflow(200))
+    assert queue.depth() == 0
+
+
+def test_forwarder_retries_server_errors_then_dead_letters(queue, clock):
+    dead = []
+
+    async def on_dead_letter(payload):
+        dead.append(payload)
+
+    queue.put({"messageId": "m-1"})
+    langflow = FakeLangflow(503, ConnectionError("reset"), 500)
+    for _ in range(3):
+        deliver(queue, langflow, on_dead_letter)
+        clock[0] += 10
+    assert langflow.calls == 3
+    assert queue.dead_letter_count() == 1
+    assert dead == [{"messageId": "m-1"}]
+
+
+@pytest.mark.parametrize("status, dead_letters", [(400, 1), (422, 1), (429, 0), (408, 0)])
+def test_forwarder_dead_letters_non_retryable_client_errors(queue, status, dead_letters):
+    queue.put({"messageId": "m-1"})
+    deliver(queue, FakeLangflow(status))
+    assert queue.dead_letter_count() == dead_letters
+
+
+@pytest.mark.parametrize("error", [CircuitOpen("open", retry_after=7), Overloaded("busy", retry_after=7)])
+def test_shed_forwards_defer_without_an_attempt(queue, clock, error):
+    queue.put({"messageId": "m-1"})
+    deliver(queue, FakeLangflow(error))
+    clock[0] += 6.9
+    assert queue.claim() is None
+    clock[0] += 0.2
+    assert queue.claim()[2] == 0
+    assert queue.dead_letter_count() == 0
+
+
+def test_dead_letter_callback_errors_are_contained(queue):
+    async def on_dead_letter(payload):
+        raise RuntimeError("dedup store gone")
+
+    queue.put({"messageId": "m-1"})
+    deliver(queue, FakeLangflow(400), on_dead_letter)
+    assert queue.dead_letter_count() == 1
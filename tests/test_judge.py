@@ -0,0 +1,56 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+from judge import AccuracyJudge
+from response_cache import ResponseCache
+
+
+class FakeCompletions:
+    """
+    Answers batch requests with a grade for every pair but the ones in skip, and single requests with True.
+    """
+
+    def __init__(self, skip=()):
+        self.skip = set(skip)
+        self.requests = []
+
+    async def create(self, model, messages, response_format):
+        self.requests.append(response_format["json_schema"]["name"])
+        if response_format["json_schema"]["name"] == "BatchGrade":
+            count = messages[-1]["content"].count("Pair ")
+            grades = [{"index": i, "score": False} for i in range(count) if i not in self.skip]
+            content = json.dumps({"grades": grades})
+        else:
+            content = json.dumps({"score": True})
+        message = SimpleNamespace(content=content, refusal=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_judge(completions, cache):
+    return AccuracyJudge(SimpleNamespace(chat=SimpleNamespace(completions=completions)), cache=cache)
+
+
+def test_batch_verdicts_are_not_reused_by_single_grading():
+    cache = ResponseCache(":memory:")
+    completions = FakeCompletions()
+    judge = make_judge(completions, cache)
+
+    assert asyncio.run(judge.agrade_batch([("ref", "resp")])) == [False]
+    assert asyncio.run(judge.agrade({"response": "resp"}, {"answer": "ref"})) is True
+    assert completions.requests == ["BatchGrade", "Grade"]
+
+    # Each method reads back only its own verdict
+    assert asyncio.run(judge.agrade_batch([("ref", "resp")])) == [False]
+    assert asyncio.run(judge.agrade({"response": "resp"}, {"answer": "ref"})) is True
+    assert len(completions.requests) == 2
+
+
+def test_missing_batch_grades_fall_back_to_single_grading():
+    completions = FakeCompletions(skip={1, 2})
+    judge = make_judge(completions, None)
+
+    pairs = [("r0", "a0"), ("r1", "a1"), ("r2", "a2")]
+    assert asyncio.run(judge.agrade_batch(pairs)) == [False, True, True]
+    assert judge.batch_fallbacks == 2
+    assert completions.requests == ["BatchGrade", "Grade", "Grade"]
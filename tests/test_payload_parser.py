@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from payload_parser import extract_email_fields, filter_email_fields, parse_payload
+
+WEBHOOK = {
+    "event": "gmail.message",
+    "data": {
+        "to": "team@example.com",
+        "sender": "alice@example.com",
+        "subject": "Quarterly report {draft}",
+        "payload": {"parts": [{"body": "}]\\\"{["}, {"attachments": [1, 2.5, True, None]}]},
+        "messageText": "Hi,\nsee the \"numbers\" é below.",
+        "messageTimestamp": "2024-05-01T12:00:00Z",
+        "threadId": "t-1",
+        "messageId": "m-1",
+    },
+}
+
+
+def test_fast_path_matches_full_parse():
+    body = json.dumps(WEBHOOK).encode("utf-8")
+    assert extract_email_fields(body) == filter_email_fields(parse_payload(body)["data"])
+
+
+def test_fast_path_skips_surrounding_text_and_whitespace():
+    body = b"prefix " + json.dumps(WEBHOOK, indent=2).encode("utf-8") + b" trailer"
+    fields = extract_email_fields(body)
+    assert fields["subject"] == "Quarterly report {draft}"
+    assert fields["messageId"] == "m-1"
+
+
+def test_fast_path_reads_top_level_fields_without_data():
+    assert extract_email_fields(b'{"subject": "top", "messageId": "m-2"}')["subject"] == "top"
+
+
+def test_missing_fields_are_filled_in():
+    fields = extract_email_fields(b'{"data": {"subject": "s"}}')
+    assert fields["messageText"] == ""
+    assert fields["sender"] is None
+
+
+@pytest.mark.parametrize("body", [
+    b"no json here",
+    b'{"data": {"subject": "s",}}',
+    b'{"data": {"subject": "s" "messageText": "x"}}',
+])
+def test_malformed_body_raises_for_the_fallback(body):
+    with pytest.raises(ValueError):
+        extract_email_fields(body)
+
+
+def test_fallback_repairs_malformed_json():
+    assert parse_payload(b'junk {"data": {"subject": "s",}} junk') == {"data": {"subject": "s"}}
+
+
+def test_duplicate_data_key_fast_path_keeps_first_value():
+    # json.loads keeps the last value of a repeated key; the fast path stops at the first
+    body = b'{"data": {"subject": "first"}, "data": {"subject": "last"}}'
+    assert extract_email_fields(body)["subject"] == "first"
+    assert parse_payload(body)["data"]["subject"] == "last"
@@ -0,0 +1,57 @@
+import pytest
+
+from pre_grader import PreGrader
+
+OCEAN = ("What is the largest ocean on Earth?", "The Pacific Ocean is the largest ocean on Earth.")
+ROOT = ("What is the square root of 144?", "The square root of 144 is 12.")
+AREA = ("What is the area of a circle with radius 5?",
+        "The area of a circle with radius 5 is 78.54 square units (25π).")
+PRESIDENT = ("Who was the first President of the United States?",
+             "George Washington was the first President of the United States.")
+DECLARATION = ("Who wrote the Declaration of Independence?",
+               "Thomas Jefferson was the principal author of the Declaration of Independence.")
+
+
+def grade(example, response):
+    question, reference = example
+    return PreGrader().grade(reference, response, question)
+
+
+def test_exact_match_is_accepted():
+    assert grade(OCEAN, "the pacific ocean is the largest ocean on earth") == (True, "exact")
+
+
+def test_key_entities_are_accepted():
+    assert grade(PRESIDENT, "It was George Washington.") == (True, "entity")
+    assert grade(ROOT, "12") == (True, "entity")
+
+
+@pytest.mark.parametrize("example, response", [
+    (ROOT, "Twelve."),
+    (AREA, "About 78.5"),
+])
+def test_paraphrases_without_overlap_go_to_the_judge(example, response):
+    assert grade(example, response) == (None, "judge")
+
+
+@pytest.mark.parametrize("example, response", [
+    (OCEAN, "The Atlantic Ocean is the largest ocean on Earth."),
+    (PRESIDENT, "John Adams was the first President, after George Washington declined."),
+    (DECLARATION, "Benjamin Franklin, with help from Thomas Jefferson, wrote it."),
+])
+def test_competing_entities_go_to_the_judge(example, response):
+    assert grade(example, response) == (None, "judge")
+
+
+def test_negated_answer_goes_to_the_judge():
+    assert grade(PRESIDENT, "It was not George Washington.") == (None, "judge")
+
+
+def test_different_number_is_rejected():
+    assert grade(ROOT, "The square root of 144 is 14.") == (False, "entity")
+
+
+def test_overlap_accepts_only_without_key_entities():
+    reference = "lists are mutable while tuples are immutable"
+    assert PreGrader().grade(reference, "lists are mutable, tuples are immutable") == (True, "overlap")
+    assert PreGrader().grade(reference, "lists are mutable, Python tuples are immutable") == (None, "judge")
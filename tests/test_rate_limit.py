@@ -0,0 +1,145 @@
+import asyncio
+import types
+
+import httpx
+import openai
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, TokenBucket, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+
+    def time(self):
+        return self.now
+
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(monotonic=clock.time, perf_counter=clock.time))
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", clock.sleep)
+    # Jitter always takes its upper bound
+    monkeypatch.setattr(rate_limit, "random", types.SimpleNamespace(uniform=lambda low, high: high))
+    return clock
+
+
+def rate_limited(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.test/v1"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_estimate_tokens():
+    messages = [{"role": "system", "content": "x" * 40}, {"role": "user", "content": "y" * 8}]
+    assert estimate_tokens(messages, max_output_tokens=16) == 12 + 16
+
+
+def test_reservations_wait_for_the_refill(clock):
+    bucket = TokenBucket(60, period=60)
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == 1
+    assert bucket.reserve(2) == 3
+    clock.now += 3
+    assert bucket.reserve(1) == 1
+
+
+def test_oversized_reservations_are_capped_at_the_capacity(clock):
+    bucket = TokenBucket(10, period=60)
+    assert bucket.reserve(1000) == 0
+    assert bucket.reserve(1) == 6
+
+
+def test_refill_stops_at_the_capacity(clock):
+    bucket = TokenBucket(60, period=60)
+    clock.now += 600
+    bucket.reserve(0)
+    assert bucket.tokens == 60
+
+
+def test_sync_only_lowers_the_balance(clock):
+    bucket = TokenBucket(100, period=60)
+    bucket.sync(500)
+    assert bucket.tokens == 100
+    bucket.sync(10)
+    assert bucket.tokens == 10
+
+
+def test_headers_sync_both_buckets(clock):
+    limiter = RateLimiter(rpm=100, tpm=10000)
+    response = httpx.Response(200, headers={
+        "x-ratelimit-remaining-requests": "3",
+        "x-ratelimit-remaining-tokens": "not a number",
+    })
+    asyncio.run(limiter.observe_response(response))
+    assert limiter.requests.tokens == 3
+    assert limiter.tokens.tokens == 10000
+
+
+def test_acquire_waits_for_the_tighter_quota(clock):
+    limiter = RateLimiter(rpm=60, tpm=600)
+    limiter.tokens.sync(0)
+    asyncio.run(limiter.acquire(100))
+    # 100 tokens at 10 tokens/s
+    assert clock.sleeps == [10]
+
+
+def test_rate_limited_call_is_retried_after_retry_after(clock):
+    limiter = RateLimiter(rpm=1000, tpm=100000, base_delay=1, max_delay=60)
+    outcomes = [rate_limited(retry_after=2), "done"]
+
+    async def func():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    stats = {}
+    assert asyncio.run(limiter.call(func, 10, stats)) == "done"
+    # Retry-After plus up to one base delay of jitter
+    assert clock.sleeps == [3]
+    assert stats["retries"] == 1
+    assert limiter.retries == 1
+
+
+def test_backoff_is_capped(clock):
+    limiter = RateLimiter(base_delay=1, max_delay=10)
+    assert limiter.backoff(1, rate_limited(retry_after=120)) == 11
+    assert [limiter.backoff(attempt, rate_limited()) for attempt in (1, 2, 3, 4, 5, 6)] == [1, 2, 4, 8, 10, 10]
+
+
+def test_call_gives_up_after_max_retries(clock):
+    limiter = RateLimiter(rpm=1000, tpm=100000, max_retries=2, base_delay=1, max_delay=60)
+    calls = []
+
+    async def func():
+        calls.append(1)
+        raise rate_limited()
+
+    stats = {}
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(limiter.call(func, 10, stats))
+    assert len(calls) == 3
+    assert clock.sleeps == [1, 2]
+    assert stats["retries"] == 2
+
+
+def test_other_errors_are_not_retried(clock):
+    limiter = RateLimiter()
+
+    async def func():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.call(func, 10))
+    assert clock.sleeps == []
@@ -0,0 +1,164 @@
+import asyncio
+import types
+
+import pytest
+
+import resilience
+from langflow_client import LangflowClient
+from resilience import CircuitBreaker, CircuitOpen, ForwardLimiter, Overloaded
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    # Only the breaker's clock; the event loop keeps the real one
+    monkeypatch.setattr(resilience, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def open_breaker(clock, threshold=3, cooldown=30):
+    breaker = CircuitBreaker(failure_threshold=threshold, cooldown=cooldown)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_the_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 10.5
+    with pytest.raises(CircuitOpen) as info:
+        breaker.before_call()
+    assert info.value.retry_after == 20
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_admits_exactly_one_trial(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    breaker.check()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpen) as info:
+        breaker.before_call()
+    assert info.value.retry_after == 1
+
+
+def test_successful_trial_closes_the_circuit(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_for_a_full_cooldown(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen) as info:
+        breaker.check()
+    assert info.value.retry_after == 30
+
+
+def test_abandoned_trial_lets_another_through(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.abandon_call()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+async def hold(limiter, release):
+    async with limiter.slot():
+        await release.wait()
+
+
+def test_limiter_bounds_calls_in_flight():
+    async def run():
+        limiter = ForwardLimiter(max_in_flight=2, max_waiting=1, wait_timeout=5)
+        release = asyncio.Event()
+        holders = [asyncio.create_task(hold(limiter, release)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert (limiter.in_flight, limiter.waiting) == (2, 1)
+        release.set()
+        await asyncio.gather(*holders)
+        assert (limiter.in_flight, limiter.waiting) == (0, 0)
+
+    asyncio.run(run())
+
+
+def test_full_wait_queue_is_overloaded():
+    async def run():
+        limiter = ForwardLimiter(max_in_flight=1, max_waiting=1, wait_timeout=5)
+        release = asyncio.Event()
+        holders = [asyncio.create_task(hold(limiter, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+
+    asyncio.run(run())
+
+
+def test_wait_timeout_is_overloaded():
+    async def run():
+        limiter = ForwardLimiter(max_in_flight=1, max_waiting=4, wait_timeout=0.01)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(limiter, release))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as info:
+            async with limiter.slot():
+                pass
+        assert info.value.retry_after == resilience.OVERLOAD_RETRY_AFTER
+        assert limiter.waiting == 0
+        release.set()
+        await holder
+        assert limiter.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_forward_abandons_the_trial(clock):
+    class HangingHTTP:
+        async def post(self, path, json):
+            await asyncio.Event().wait()
+
+    async def run():
+        client = LangflowClient("http://langflow", breaker=open_breaker(clock))
+        client._client = HangingHTTP()
+        clock[0] += 30
+        trial = asyncio.create_task(client.forward({"messageId": "m-1"}))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpen):
+            client.breaker.check()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # The cancelled trial has no outcome, so the next call may try again
+        client.breaker.before_call()
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+import itertools
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A strictly increasing clock, so least recently used order never ties
+    ticks = itertools.count(1)
+    monkeypatch.setattr(response_cache.time, "time", lambda: float(next(ticks)))
+
+
+def open_cache(tmp_path, **kwargs):
+    return ResponseCache(str(tmp_path / "cache.db"), **kwargs)
+
+
+def test_cache_key_is_canonical():
+    assert cache_key("model", {"a": 1, "b": 2}) == cache_key("model", {"b": 2, "a": 1})
+    assert cache_key("model", "prompt") != cache_key("model", "prompt ")
+
+
+def test_get_returns_stored_values_and_counts(tmp_path):
+    cache = open_cache(tmp_path)
+    assert cache.get("target", "k") is None
+    cache.set("target", "k", {"response": "hi", "tokens": [1, 2]})
+    assert cache.get("target", "k") == {"response": "hi", "tokens": [1, 2]}
+    stats = cache.stats()
+    assert stats["stages"]["target"] == {"hits": 1, "misses": 1, "bypassed": 0, "hit_rate": 0.5}
+    assert stats["entries"] == 1
+
+
+def test_values_persist_across_instances(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.set("judge", "k", True)
+    cache.close()
+    assert open_cache(tmp_path).get("judge", "k") is True
+
+
+def test_bypassed_stage_ignores_but_refreshes_entries(tmp_path):
+    open_cache(tmp_path).set("judge", "k", False)
+    cache = open_cache(tmp_path, bypass=["judge"])
+    assert cache.get("judge", "k") is None
+    cache.set("judge", "k", True)
+    assert cache.stats()["stages"]["judge"]["bypassed"] == 1
+    assert open_cache(tmp_path).get("judge", "k") is True
+    assert open_cache(tmp_path, bypass=["all"]).get("judge", "k") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(response_cache, "EVICT_EVERY", 1)
+    cache = open_cache(tmp_path, max_entries=10)
+    for i in range(10):
+        cache.set("target", f"k{i}", i)
+    # Reading k0 makes k1 the least recently used
+    assert cache.get("target", "k0") == 0
+    cache.set("target", "k10", 10)
+    assert cache.stats()["entries"] == 9
+    assert cache.get("target", "k0") == 0
+    assert cache.get("target", "k1") is None
+    assert cache.get("target", "k2") is None
+    assert cache.get("target", "k10") == 10
+
+
+def test_size_bound_is_enforced(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(response_cache, "EVICT_EVERY", 1)
+    cache = open_cache(tmp_path, max_bytes=1000)
+    for i in range(20):
+        cache.set("target", f"k{i}", "x" * 98)
+    assert cache.stats()["bytes"] <= 1000
+    assert cache.get("target", "k19") is not None
+
+
+def test_clear_by_stage(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.set("target", "a", 1)
+    cache.set("judge", "b", 2)
+    cache.clear("judge")
+    assert cache.get("judge", "b") is None
+    assert cache.get("target", "a") == 1
+    cache.clear()
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,108 @@
+import unicodedata
+
+import pytest
+
+from payload_parser import EMAIL_FIELDS
+from sanitizer import (
+    MAX_MESSAGE_LENGTH,
+    TRUNCATION_MARKER,
+    TRUNCATION_SLACK,
+    clean_json_data,
+    clean_text,
+    safe_cut,
+    sanitize_email_fields,
+)
+
+
+def baseline(data):
+    """clean_json_data plus truncation, as the webhook handler originally did it"""
+    data = clean_json_data({field: data.get(field) for field in EMAIL_FIELDS})
+    if len(data.get("messageText") or "") > MAX_MESSAGE_LENGTH:
+        data["messageText"] = data["messageText"][:MAX_MESSAGE_LENGTH] + TRUNCATION_MARKER
+    return data
+
+
+def email(message_text, subject="Re: planning"):
+    return {
+        "to": "agent@example.com",
+        "sender": "Jane Doe <jane@example.com>",
+        "subject": subject,
+        "messageText": message_text,
+        "messageTimestamp": "2025-03-14T09:26:53Z",
+        "threadId": "t-1",
+        "messageId": "m-1",
+        "payload": {"parts": []},
+    }
+
+
+NFD = unicodedata.normalize("NFD", "Café résumé naïve Ångström ")
+
+BODIES = {
+    "ascii": "plain text\r\n",
+    "control": "a\x00b\x07c\x1bd\x7fe\tf\n",
+    "nfd": NFD,
+    "nfd-and-control": NFD.replace("e", "e\x00"),
+    "hangul-jamo": "가\x00ᆨ ",
+    "combining-run": "e" + "̣́" * 20,
+    "emoji": "\U0001F44D\U0001F3FD \U0001F468‍\U0001F4BB ",
+}
+
+LENGTHS = sorted({
+    MAX_MESSAGE_LENGTH - 1,
+    MAX_MESSAGE_LENGTH,
+    MAX_MESSAGE_LENGTH + 1,
+    MAX_MESSAGE_LENGTH + TRUNCATION_SLACK - 1,
+    MAX_MESSAGE_LENGTH + TRUNCATION_SLACK,
+    MAX_MESSAGE_LENGTH + TRUNCATION_SLACK + 1,
+    3 * (MAX_MESSAGE_LENGTH + TRUNCATION_SLACK),
+})
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+@pytest.mark.parametrize("body", BODIES, ids=list(BODIES))
+def test_matches_baseline_around_the_truncation_limit(body, length):
+    text = (BODIES[body] * (length // len(BODIES[body]) + 1))[:length]
+    data = email(text, subject=BODIES[body])
+    assert sanitize_email_fields(data) == baseline(data)
+
+
+@pytest.mark.parametrize("offset", range(-4, 5))
+def test_matches_baseline_when_a_sequence_straddles_the_cut(offset):
+    # Decomposed accents and control characters right where the text is cut before cleaning
+    for filler in ("\x00", NFD, "̣́"):
+        for at in (MAX_MESSAGE_LENGTH, MAX_MESSAGE_LENGTH + TRUNCATION_SLACK):
+            text = "x" * (at + offset) + filler * 10 + "y" * 2 * TRUNCATION_SLACK
+            data = email(text)
+            assert sanitize_email_fields(data) == baseline(data)
+
+
+def test_matches_baseline_when_control_characters_fill_the_window():
+    text = "a" * (MAX_MESSAGE_LENGTH - 10) + "\x00" * (4 * TRUNCATION_SLACK) + "b" * 20
+    data = email(text)
+    assert sanitize_email_fields(data)["messageText"] == "a" * (MAX_MESSAGE_LENGTH - 10) + "b" * 10 + TRUNCATION_MARKER
+    assert sanitize_email_fields(data) == baseline(data)
+
+
+def test_long_combining_run_is_reordered_like_the_whole_text():
+    # Canonical ordering moves every dot below ahead of every acute, however far the run goes
+    data = email("e" + "̣́" * MAX_MESSAGE_LENGTH)
+    assert sanitize_email_fields(data) == baseline(data)
+
+
+def test_non_string_fields_are_kept():
+    data = {"messageText": None, "subject": ["a\x00", {"b": "c\x07"}], "threadId": 5}
+    assert sanitize_email_fields(data) == baseline(data)
+    assert sanitize_email_fields(data)["subject"] == ["a", {"b": "c"}]
+
+
+@pytest.mark.parametrize("text", [
+    "abᄀ\x00ᅡᆨcd",
+    "é\x00̣x",
+    "େ\x1fାୗ",
+    "x\x00\x00\x00y",
+])
+def test_safe_cut_splits_cleaning_exactly(text):
+    for cut in range(len(text) + 1):
+        safe = safe_cut(text, cut)
+        assert safe >= cut
+        assert clean_text(text[:safe]) + clean_text(text[safe:]) == clean_text(text)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import tempfile
+import types
+
+import pytest
+
+# Keep the handler's log file out of the working tree
+os.environ.setdefault("WEBHOOK_LOG_FILE", os.path.join(tempfile.mkdtemp(), "webhook.log"))
+
+from fastapi.testclient import TestClient
+
+import metrics
+import webhook_handler
+from resilience import CircuitOpen
+
+
+def email(message_id):
+    return {"data": {"messageId": message_id, "sender": "a@example.com", "subject": "s", "messageText": "hi"}}
+
+
+@pytest.fixture
+def forwarded(monkeypatch):
+    statuses, sent = [], []
+
+    async def forward(data):
+        sent.append(data)
+        return types.SimpleNamespace(status_code=statuses.pop(0), text="")
+
+    monkeypatch.setattr(webhook_handler.langflow_client, "forward", forward)
+    monkeypatch.setattr(webhook_handler, "dedup_cache", webhook_handler.DedupCache(store_path=None))
+    return statuses, sent
+
+
+def outcomes():
+    return dict(metrics.WEBHOOK_REQUESTS.values)
+
+
+def test_langflow_server_error_is_not_a_success(forwarded):
+    statuses, sent = forwarded
+    statuses.extend([503, 200])
+    before = outcomes()
+    with TestClient(webhook_handler.app) as client:
+        response = client.post("/webhook", json=email("m-1"))
+        assert response.status_code == 502
+        assert response.json()["status"] == "error"
+        # The dedup key was released, so the redelivery is forwarded again
+        assert client.post("/webhook", json=email("m-1")).json()["status"] == "success"
+    after = outcomes()
+    assert after.get("langflow_error", 0) - before.get("langflow_error", 0) == 1
+    assert after.get("success", 0) - before.get("success", 0) == 1
+    assert len(sent) == 2
+
+
+class FakeForwarder:
+    def __init__(self):
+        self.queued = []
+
+
+    async def enqueue(self, payload):
+        self.queued.append(payload)
+        return len(self.queued)
+
+
+@pytest.mark.parametrize("outcome", [503, ConnectionError("reset"), CircuitOpen("open", retry_after=5)])
+def test_failed_coalesced_flush_goes_to_the_queue(monkeypatch, outcome):
+    async def forward(data):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return types.SimpleNamespace(status_code=outcome, text="")
+
+    forwarder = FakeForwarder()
+    monkeypatch.setattr(webhook_handler.langflow_client, "forward", forward)
+    monkeypatch.setattr(webhook_handler, "queue_forwarder", forwarder)
+    monkeypatch.setattr(webhook_handler, "INGEST_MODE", "direct")
+    merged = {"threadId": "t-1", "messageIds": ["m-1", "m-2"]}
+    asyncio.run(webhook_handler.deliver_coalesced(merged, []))
+    assert forwarder.queued == [merged]
+
+
+def test_delivered_coalesced_flush_is_not_queued(monkeypatch):
+    async def forward(data):
+        return types.SimpleNamespace(status_code=200, text="")
+
+    forwarder = FakeForwarder()
+    monkeypatch.setattr(webhook_handler.langflow_client, "forward", forward)
+    monkeypatch.setattr(webhook_handler, "queue_forwarder", forwarder)
+    monkeypatch.setattr(webhook_handler, "INGEST_MODE", "direct")
+    asyncio.run(webhook_handler.deliver_coalesced({"threadId": "t-1"}, []))
+    assert forwarder.queued == []
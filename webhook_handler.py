@@ -1,115 +1,259 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 import uvicorn
-import json
-import requests
+import os
+import time
 import logging
-import sys
-from json_repair import repair_json
-import unicodedata
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("webhook.log"),  # Log to a file
-        logging.StreamHandler(sys.stdout)    # Also log to console
-    ]
+from logging_config import (
+    configure_logging, start_request_log_budget, request_log_budget, should_log_payload, LazyJSON
 )
+from langflow_client import LangflowClient, LANGFLOW_API_URL
+from ingest_queue import IngestQueue, QueueForwarder
+from payload_parser import (
+    BodyTooLarge, read_body, extract_email_fields, parse_payload, filter_email_fields
+)
+from sanitizer import sanitize_email_fields
+from resilience import CircuitOpen, Overloaded
+from coalescer import ThreadCoalescer, COALESCE_WINDOW_SECONDS
+from dedup import DedupCache, dedup_key, DEDUP_ENABLED
+import metrics
+
+# Configure logging: a listener thread does the formatting and rotating-file I/O
+configure_logging()
 logger = logging.getLogger("webhook_handler")
 
-app = FastAPI(title="Email AI Agent Webhook Handler")
-
-# Langflow API details
-LANGFLOW_API_URL = "http://localhost:7860"  # Change to your Langflow URL
-
-# Create a translation table that maps control characters to None
-CONTROL_CHAR_TABLE = str.maketrans("", "", "".join(chr(i) for i in range(32)) + chr(127))
-
-def clean_json_data(data):
-    """Clean JSON data to ensure it can be properly serialized"""
-    if isinstance(data, dict):
-        return {k: clean_json_data(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [clean_json_data(item) for item in data]
-    elif isinstance(data, str):
-        # Remove control characters
-        cleaned = data.translate(CONTROL_CHAR_TABLE)
-        # Normalize Unicode
-        cleaned = unicodedata.normalize("NFC", cleaned)
-        return cleaned
-    else:
-        return data
+# "direct" forwards to Langflow before responding, "queue" acknowledges once durably queued
+INGEST_MODE = os.getenv("INGEST_MODE", "direct").lower()
+# Coalesced messages are acknowledged before they are forwarded, so in direct mode the
+# queue takes the flushes that fail; otherwise it is only used in "queue" mode
+QUEUE_ENABLED = INGEST_MODE == "queue" or COALESCE_WINDOW_SECONDS > 0
+
+# Shared, pooled client for forwarding to Langflow
+langflow_client = LangflowClient(LANGFLOW_API_URL)
+
+# Drops redelivered webhooks so each email triggers a single agent run
+dedup_cache = DedupCache()
+
+async def release_dead_letter(data):
+    """Let redeliveries of a dead-lettered email through, since Langflow never processed it"""
+    if not DEDUP_ENABLED:
+        return
+    # A coalesced payload carries the IDs of every merged message
+    keys = {dedup_key(data)} | {f"id:{message_id}" for message_id in data.get("messageIds") or () if message_id}
+    for key in keys - {None}:
+        await dedup_cache.arelease(key)
+
+# Durable ingest queue and its background forwarders, used when QUEUE_ENABLED
+ingest_queue = IngestQueue()
+queue_forwarder = QueueForwarder(ingest_queue, langflow_client, on_dead_letter=release_dead_letter)
+
+async def deliver_coalesced(data, messages):
+    """Forward (or queue) a payload flushed by the thread coalescer"""
+    if INGEST_MODE != "queue":
+        try:
+            response = await langflow_client.forward(data)
+            logger.info("Forwarded coalesced thread %s to Langflow, status: %d",
+                        data.get("threadId"), response.status_code)
+            if response.status_code < 500:
+                return
+            error = f"HTTP {response.status_code}"
+        except Exception as e:
+            error = str(e)
+        # The messages were already acknowledged, so a redelivery can't be relied on:
+        # hand the thread to the queue, which retries it until Langflow takes it
+        logger.warning("Forwarding coalesced thread %s failed, queueing it: %s", data.get("threadId"), error)
+
+    item_id = await queue_forwarder.enqueue(data)
+    logger.info("Queued coalesced thread %s for Langflow as item %d", data.get("threadId"), item_id)
+
+# Merges bursts of messages from the same thread into one agent run
+coalescer = ThreadCoalescer(deliver_coalesced)
+
+# Metrics read from their owners at scrape time
+metrics.registry.gauge(
+    "langflow_forwards_in_flight", "Forwards to Langflow currently in flight",
+    callback=lambda: langflow_client.limiter.in_flight)
+metrics.registry.gauge(
+    "langflow_forwards_waiting", "Forwards waiting for a free slot",
+    callback=lambda: langflow_client.limiter.waiting)
+metrics.registry.gauge(
+    "langflow_circuit_open", "1 while the Langflow circuit breaker is open or half-open, otherwise 0",
+    callback=lambda: int(langflow_client.breaker.state != langflow_client.breaker.CLOSED))
+metrics.registry.counter(
+    "webhook_log_records_dropped_total", "Log records dropped by the per-request budget or a full log queue",
+    callback=lambda: request_log_budget.dropped)
+metrics.registry.counter(
+    "webhook_coalesced_messages_total", "Messages merged into an earlier message's thread payload",
+    callback=lambda: coalescer.coalesced)
+metrics.registry.gauge(
+    "webhook_coalescing_pending", "Messages buffered waiting for their thread to be flushed",
+    callback=lambda: coalescer.pending)
+if QUEUE_ENABLED:
+    metrics.registry.gauge(
+        "ingest_queue_depth", "Emails waiting in the ingest queue", callback=ingest_queue.depth)
+    metrics.registry.gauge(
+        "ingest_dead_letters", "Emails in the ingest dead-letter table", callback=ingest_queue.dead_letter_count)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled Langflow client (and ingest queue) at startup and close them at shutdown"""
+    await langflow_client.start()
+    if DEDUP_ENABLED:
+        dedup_cache.open()
+    if QUEUE_ENABLED:
+        ingest_queue.open()
+        queue_forwarder.start()
+    try:
+        yield
+    finally:
+        await coalescer.flush_all()
+        if QUEUE_ENABLED:
+            await queue_forwarder.stop()
+            ingest_queue.close()
+        dedup_cache.close()
+        await langflow_client.close()
+
+app = FastAPI(title="Email AI Agent Webhook Handler", lifespan=lifespan)
 
 @app.post("/webhook")
 async def webhook(request: Request):
     """Handle incoming webhook from Gmail"""
+    start_request_log_budget()
+    metrics.WEBHOOK_IN_FLIGHT.inc()
+    request_start = time.perf_counter()
+    outcome = "error"
+    key = None
     try:
-        # Get raw request body and try to repair if needed
-        raw_body = await request.body()
-        raw_text = raw_body.decode('utf-8')
+        if INGEST_MODE != "queue":
+            # Shed load before reading the body if Langflow is known to be down
+            langflow_client.breaker.check()
 
-        # Find the JSON object boundaries
-        start = raw_text.find("{")
-        end = raw_text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            raw_text = raw_text[start:end+1]
+        # Read the body, refusing anything over the size limit
+        with metrics.BODY_READ_SECONDS.time():
+            raw_body = await read_body(request)
+        metrics.BODY_BYTES.observe(len(raw_body))
+        logger.info("Received webhook: %d bytes", len(raw_body))
 
-        try:
-            # First try standard parsing
-            payload = json.loads(raw_text)
-        except json.JSONDecodeError:
-            # If that fails, try to repair the JSON
-            logger.info("Attempting to repair malformed JSON")
-            repaired_text = repair_json(raw_text)
-            payload = json.loads(repaired_text)
-            logger.info("JSON successfully repaired")
-        
-        # Log the full payload for testing
-        logger.info("Received webhook: %s", json.dumps(payload, indent=2))
-
-        # Extract the data from the payload
-        data = payload.get("data", payload)
-
-        # Create a filtered payload without the large 'payload' object
-        filtered_data = {
-            "to": data.get("to"),
-            "sender": data.get("sender"),
-            "subject": data.get("subject"),
-            "messageText": data.get("messageText", ""),
-            "messageTimestamp": data.get("messageTimestamp"),
-            "threadId": data.get("threadId"),
-            "messageId": data.get("messageId")
-        }
-
-        # Clean the filtered data to ensure it can be properly serialized
-        filtered_data = clean_json_data(filtered_data)
-        
-        # Truncate very long messages if needed
-        if len(filtered_data.get("messageText", "")) > 10000:
-            filtered_data["messageText"] = filtered_data["messageText"][:10000] + "... (truncated)"
-
-        # Log the full filtered data for testing
-        logger.info("Sending to Langflow: %s", json.dumps(filtered_data, indent=2))
-
-        response = requests.post(
-            f"{LANGFLOW_API_URL}/api/v1/webhook/email_ai_agent_ingest",
-            json=filtered_data,
-            timeout=10
-        )
+        with metrics.PARSE_SECONDS.time():
+            try:
+                # Fast path: pull out only the email fields without decoding the rest
+                filtered_data = extract_email_fields(raw_body)
+            except ValueError:
+                # Fall back to parsing (and if needed repairing) the whole body
+                logger.info("Fast field extraction failed, parsing full payload")
+                metrics.PARSE_FALLBACKS.inc()
+                payload = parse_payload(raw_body)
 
-        logger.info("Forwarded to Langflow, status: %d, response: %s", response.status_code, response.text)
+                # Log the full payload only when debugging or sampled
+                if should_log_payload(logger):
+                    logger.info("Received webhook: %s", LazyJSON(payload))
+
+                # Extract the data from the payload and drop the large 'payload' object
+                filtered_data = filter_email_fields(payload.get("data", payload))
+
+        # Drop redelivered copies before doing any more work
+        if DEDUP_ENABLED:
+            key = dedup_key(filtered_data)
+            if key is not None and not await dedup_cache.aclaim(key):
+                logger.info("Dropping duplicate webhook: %s", key)
+                metrics.DEDUP_DUPLICATES.inc()
+                outcome = "duplicate"
+                return {"status": "duplicate", "message": "Duplicate webhook ignored"}
+
+        # Truncate very long messages and clean the filtered data so it can be properly serialized
+        with metrics.SANITIZE_SECONDS.time():
+            filtered_data = sanitize_email_fields(filtered_data)
+        if isinstance(filtered_data["messageText"], str):
+            metrics.FORWARD_MESSAGE_CHARS.observe(len(filtered_data["messageText"]))
+
+        if coalescer.add(filtered_data):
+            # Buffered with the rest of its thread; delivered when the window closes
+            logger.info("Coalescing message into thread %s", filtered_data["threadId"])
+            outcome = "coalesced"
+            return {"status": "coalesced", "message": "Webhook received and batched with its thread"}
+
+        if INGEST_MODE == "queue":
+            # Durably queue the email and acknowledge right away; workers forward it to Langflow
+            item_id = await queue_forwarder.enqueue(filtered_data)
+            logger.info("Queued for Langflow as item %d", item_id)
+            outcome = "queued"
+            return {"status": "queued", "message": "Webhook received and queued"}
+
+        # Log the filtered data only when debugging or sampled
+        if should_log_payload(logger):
+            logger.info("Sending to Langflow: %s", LazyJSON(filtered_data))
+
+        response = await langflow_client.forward(filtered_data)
+
+        logger.info("Forwarded to Langflow, status: %d", response.status_code)
+        logger.debug("Langflow response: %s", response.text)
+        if response.status_code >= 500:
+            # Let a redelivery try again since Langflow didn't process this one
+            if key is not None:
+                await dedup_cache.arelease(key)
+            outcome = "langflow_error"
+            return JSONResponse(
+                status_code=502,
+                content={"status": "error", "message": f"Langflow returned {response.status_code}"}
+            )
+        outcome = "success"
         return {"status": "success", "message": "Webhook received and processed"}
 
+    except Overloaded as e:
+        logger.warning("Shedding webhook: %s", str(e))
+        outcome = "overloaded"
+        if key is not None:
+            await dedup_cache.arelease(key)
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"status": "error", "message": "Too many requests in flight, retry later"}
+        )
+
+    except CircuitOpen as e:
+        logger.warning("Shedding webhook: %s", str(e))
+        outcome = "circuit_open"
+        if key is not None:
+            await dedup_cache.arelease(key)
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"status": "error", "message": "Langflow is unavailable, retry later"}
+        )
+
+    except BodyTooLarge as e:
+        logger.warning("Rejecting webhook: %s", str(e))
+        outcome = "too_large"
+        return JSONResponse(status_code=413, content={"status": "error", "message": str(e)})
+
     except Exception as e:
         logger.error("Error processing webhook: %s", str(e), exc_info=True)
+        if key is not None:
+            await dedup_cache.arelease(key)
         return {"status": "error", "message": str(e)}
 
+    finally:
+        metrics.WEBHOOK_IN_FLIGHT.dec()
+        metrics.WEBHOOK_REQUESTS.inc(outcome)
+        metrics.WEBHOOK_REQUEST_SECONDS.observe(time.perf_counter() - request_start)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    logger.info("Health check called")
-    return {"status": "healthy"}
+    logger.debug("Health check called")
+    health = {"status": "healthy"}
+    if DEDUP_ENABLED:
+        health["dedup"] = dedup_cache.stats()
+    if QUEUE_ENABLED:
+        health["queue_depth"] = ingest_queue.depth()
+        health["dead_letters"] = ingest_queue.dead_letter_count()
+    return health
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 # Main entry point
 if __name__ == "__main__":